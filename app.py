@@ -1,9 +1,12 @@
 # Third party imports
 import dash_bootstrap_components as dbc
 import dash
-from components import navbar
+from components import figure_cache, instrumentation, navbar
 
 app = dash.Dash(__name__, use_pages=True, external_stylesheets=[dbc.themes.ZEPHYR], suppress_callback_exceptions=True)
+server = app.server  # WSGI entry point, e.g. gunicorn app:server
+instrumentation.register_route(app.server)
+figure_cache.register_route(app.server)
 nav = navbar.NavbarLogo()
 
 app.layout = dbc.Container([
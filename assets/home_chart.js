@@ -0,0 +1,146 @@
+// Clientside callbacks of the home page candlestick chart. The candles are shipped once by the server as base64
+// typed arrays (see pages/home.py:update_candles); scale, range and date marker changes only relayout them.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    home: (function () {
+        var DAY = 86400000;
+        var decoded = {key: null, trace: null};
+
+        function decode(base64, ArrayType) {
+            var bytes = atob(base64);
+            var buffer = new Uint8Array(bytes.length);
+            for (var i = 0; i < bytes.length; i++) {
+                buffer[i] = bytes.charCodeAt(i);
+            }
+            return new ArrayType(buffer.buffer);
+        }
+
+        function trace(candles) {
+            if (decoded.key !== candles.key) {
+                decoded = {
+                    key: candles.key,
+                    trace: {
+                        type: 'candlestick',
+                        x: decode(candles.x, Float64Array),
+                        open: decode(candles.open, Float64Array),
+                        high: decode(candles.high, Float64Array),
+                        low: decode(candles.low, Float64Array),
+                        close: decode(candles.close, Float64Array)
+                    }
+                };
+            }
+            return decoded.trace;
+        }
+
+        // the candles of a range option are strictly after this date (ms), as in pages/home.py:select_range
+        function lowerBound(xRange, end) {
+            if (xRange === 'Max') {
+                return -Infinity;
+            }
+            if (xRange === 'YTD') {
+                return Date.UTC(new Date(end).getUTCFullYear(), 0, 1) - 1;
+            }
+            return end + parseInt(xRange, 10) * DAY;
+        }
+
+        function firstAfter(x, bound) {
+            var low = 0, high = x.length;
+            while (low < high) {
+                var mid = (low + high) >>> 1;
+                if (x[mid] > bound) {
+                    high = mid;
+                } else {
+                    low = mid + 1;
+                }
+            }
+            return low;
+        }
+
+        return {
+            // ask the server for candles only if the shipped ones do not cover the selected range at full detail
+            request_candles: function (resolution, xRange, width, candles) {
+                if (candles && candles.resolution === resolution) {
+                    var covered = candles.full
+                        ? candles.history || candles.bound <= lowerBound(xRange, candles.end)
+                        : candles.range === String(xRange) && candles.width === width;
+                    if (covered) {
+                        return window.dash_clientside.no_update;
+                    }
+                }
+                return {resolution: resolution, range: String(xRange), width: width};
+            },
+
+            render_chart: function (candles, yScale, xRange, selectedDate) {
+                if (!candles || !candles.length) {
+                    return window.dash_clientside.no_update;
+                }
+                var data = trace(candles);
+                var x = data.x, n = x.length;
+                // live bars may have been appended after the shipped ones
+                var end = Math.max(candles.end, x[n - 1]);
+                var first = Math.min(firstAfter(x, lowerBound(xRange, end)), n - 1);
+                var spacing = n > 1 ? x[n - 1] - x[n - 2] : DAY;
+
+                var low = Infinity, high = -Infinity;
+                for (var i = first; i < n; i++) {
+                    low = Math.min(low, data.low[i]);
+                    high = Math.max(high, data.high[i]);
+                }
+                var log = yScale === 'log';
+                if (log) {
+                    low = Math.log10(low);
+                    high = Math.log10(high);
+                }
+                var margin = 0.05 * (high - low || Math.abs(high) || 1);
+
+                return {
+                    data: [data],
+                    layout: {
+                        title: {text: 'Candlestick price chart'},
+                        xaxis: {
+                            type: 'date',
+                            title: {text: 'Date'},
+                            rangeslider: {visible: false},
+                            range: [x[first] - spacing / 2, x[n - 1] + spacing / 2]
+                        },
+                        yaxis: {
+                            type: log ? 'log' : 'linear',
+                            title: {text: 'Price [USD]'},
+                            range: [low - margin, high + margin]
+                        },
+                        shapes: [{
+                            type: 'rect',
+                            yref: 'paper', y0: 0, y1: 0.1,
+                            xref: 'x', x0: selectedDate, x1: selectedDate,
+                            line: {color: 'blue', width: 5}
+                        }]
+                    }
+                };
+            },
+
+            // append the bars completed by the live feed, both to the graph and to the decoded candles, so that later
+            // relayouts keep them
+            extend_chart: function (live) {
+                if (!live || live.key !== decoded.key) {
+                    return window.dash_clientside.no_update;
+                }
+                var old = decoded.trace;
+                var x = decode(live.x, Float64Array);
+                var first = firstAfter(x, old.x[old.x.length - 1]);
+                if (first === x.length) {
+                    return window.dash_clientside.no_update;
+                }
+                var update = {}, extended = {type: 'candlestick'};
+                ['x', 'open', 'high', 'low', 'close'].forEach(function (name) {
+                    var values = (name === 'x' ? x : decode(live[name], Float64Array)).subarray(first);
+                    var merged = new old[name].constructor(old[name].length + values.length);
+                    merged.set(old[name]);
+                    merged.set(values, old[name].length);
+                    update[name] = [values];
+                    extended[name] = merged;
+                });
+                decoded = {key: decoded.key, trace: extended};
+                return [update, [0]];
+            }
+        };
+    })()
+});
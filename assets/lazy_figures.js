@@ -0,0 +1,48 @@
+// Lazy loading of the static figures served by components/figure_cache.py. Pages lay out empty graphs wrapped in a
+// .lazy-figure div carrying the figure URL; each is fetched when it approaches the viewport and drawn in place.
+// Requests revalidate through the browser cache, so a repeat visit costs a 304 per figure.
+(function () {
+    function draw(container, figure) {
+        var graph = container.querySelector('.js-plotly-plot');
+        // dcc.Graph loads plotly.js asynchronously: wait for its first (empty) plot
+        if (!graph || !window.Plotly) {
+            setTimeout(function () { draw(container, figure); }, 50);
+            return;
+        }
+        window.Plotly.react(graph, figure.data, figure.layout, figure.config || {});
+    }
+
+    function load(container) {
+        fetch(container.dataset.src)
+            .then(function (response) { return response.json(); })
+            .then(function (figure) { draw(container, figure); });
+    }
+
+    var visible = new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (entry.isIntersecting) {
+                visible.unobserve(entry.target);
+                load(entry.target);
+            }
+        });
+    }, {rootMargin: '300px'});
+
+    // pages are rendered by Dash after this script runs, and again on every navigation
+    function watch() {
+        document.querySelectorAll('.lazy-figure:not([data-watched])').forEach(function (container) {
+            container.dataset.watched = 'true';
+            visible.observe(container);
+        });
+    }
+
+    function start() {
+        new MutationObserver(watch).observe(document.body, {childList: true, subtree: true});
+        watch();
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', start);
+    } else {
+        start();
+    }
+})();
@@ -0,0 +1,59 @@
+"""
+Convergence and timing of the lattice pricers against BlackScholesModel, on a European put strike ladder.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_binomial_tree --strikes 50
+"""
+# Standard library imports
+import argparse
+import time
+
+# Third party imports
+import numpy as np
+
+# Local package imports
+from components.option_pricing.base import OptionType
+from components.option_pricing.binomial_tree import BinomialTreeModel
+from components.option_pricing.black_scholes import BlackScholesModel
+
+PARAMS = dict(spot_price=20000, days_to_maturity=180, risk_free_rate=0.05, volatility=0.75)
+
+
+def timed(func):
+    t0 = time.perf_counter()
+    result = func()
+    return time.perf_counter() - t0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--strikes", type=int, default=50)
+    parser.add_argument("--american-steps", type=int, default=2000)
+    args = parser.parse_args()
+    strikes = np.linspace(10000, 40000, args.strikes)
+    exact = BlackScholesModel(strike_price=strikes, **PARAMS).option_price(OptionType.PUT_OPTION)
+
+    print(f"European put, {args.strikes} strikes: max abs error vs Black-Scholes, time for the whole ladder")
+    print(f"{'steps':>6} | {'lattice':>9} | {'plain':>10} {'time':>8} | {'richardson':>10} {'time':>8}")
+    for steps in (100, 1000, 10000):
+        for lattice in ("binomial", "trinomial"):
+            row = []
+            for richardson in (False, True):
+                model = BinomialTreeModel(strike_price=strikes, number_of_time_steps=steps, lattice=lattice,
+                                          richardson=richardson, **PARAMS)
+                elapsed, price = timed(lambda: model.option_price(OptionType.PUT_OPTION))
+                row.append(f"{np.abs(price - exact).max():10.2e} {elapsed * 1e3:6.1f}ms")
+            print(f"{steps:>6} | {lattice:>9} | {row[0]} | {row[1]}")
+
+    steps = args.american_steps
+    ladder = BinomialTreeModel(strike_price=strikes, number_of_time_steps=steps, american=True, **PARAMS)
+    ladder_time, _ = timed(lambda: ladder.option_price(OptionType.PUT_OPTION))
+    loop_time, _ = timed(lambda: [
+        BinomialTreeModel(strike_price=x, number_of_time_steps=steps, american=True, **PARAMS)
+        .option_price(OptionType.PUT_OPTION) for x in strikes])
+    print(f"American put, {steps} steps: batched ladder {ladder_time:.2f} s, one tree per strike {loop_time:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
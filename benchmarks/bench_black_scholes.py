@@ -0,0 +1,61 @@
+"""
+Black-Scholes surface pricing: per-method BlackScholesModel calls versus the black_scholes_greeks batch API.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_black_scholes --spots 250 --strikes 200 --maturities 200
+"""
+# Standard library imports
+import argparse
+import time
+
+# Third party imports
+import numpy as np
+
+# Local package imports
+from components.option_pricing.black_scholes import BlackScholesModel, OptionType, black_scholes_greeks
+
+
+def per_method(S, X, T, r, v):
+    # one model per call, as the options page callbacks do
+    return (BlackScholesModel(S, X, T, r, v).option_price(OptionType.CALL_OPTION),
+            BlackScholesModel(S, X, T, r, v).option_price(OptionType.PUT_OPTION),
+            BlackScholesModel(S, X, T, r, v).delta_hedging(OptionType.CALL_OPTION),
+            BlackScholesModel(S, X, T, r, v).delta_hedging(OptionType.PUT_OPTION))
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - t0)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--spots", type=int, default=250)
+    parser.add_argument("--strikes", type=int, default=200)
+    parser.add_argument("--maturities", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    S = np.linspace(1, 40000, args.spots)[:, None, None]
+    X = np.linspace(1, 50000, args.strikes)[None, :, None]
+    T = np.arange(1, args.maturities + 1)[None, None, :]
+    r, v = 0.05, 0.75
+    points = args.spots * args.strikes * args.maturities
+
+    old_time, (call, put, call_delta, put_delta) = best_of(args.repeat, per_method, S, X, T, r, v)
+    new_time, greeks = best_of(args.repeat, black_scholes_greeks, S, X, T, r, v)
+    for name, old in [("call_price", call), ("put_price", put), ("call_delta", call_delta), ("put_delta", put_delta)]:
+        assert np.allclose(getattr(greeks, name), old, equal_nan=True), name
+
+    print(f"{points:.1e} points (spot x strike x maturity)")
+    print(f"  per-method: {old_time:7.3f} s  (2 prices + 2 deltas, {points * 4 / old_time:.2e} outputs/s)")
+    print(f"  batch:      {new_time:7.3f} s  (10 prices and Greeks, {points * 10 / new_time:.2e} outputs/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Student's t fits of growing samples of synthetic returns: the binned ECME fit, the ECME fit on raw values and
+scipy.stats.t.fit, with their times, parameters and log-likelihoods; and power-law tail estimates of Pareto samples.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_distribution_fit --returns 1000000
+"""
+# Standard library imports
+import argparse
+import time
+
+# Third party imports
+import numpy as np
+from scipy.stats import t
+
+# Local package imports
+from components.distribution_fit import fit_power_law, fit_student_t, hill_estimator
+
+TRUE_T = (3.0, 1e-4, 0.002)
+
+
+def timed(fit, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fit(*args, **kwargs)
+    return tuple(result), time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--returns", type=int, default=1_000_000, help="size of the largest sample")
+    parser.add_argument("--raw-returns", type=int, default=100_000, help="largest sample fitted on raw values")
+    parser.add_argument("--scipy-returns", type=int, default=100_000, help="largest sample fitted by scipy")
+    args = parser.parse_args()
+
+    sample = t.rvs(*TRUE_T, size=args.returns, random_state=0)
+    print(f"true (df, loc, scale): {TRUE_T}")
+    for size in (args.returns // 100, args.returns // 10, args.returns):
+        x = sample[:size]
+        fits = {"binned": timed(fit_student_t, x, bins=2 ** 14)}
+        if size <= args.raw_returns:
+            fits["raw"] = timed(fit_student_t, x, bins=0)
+        if size <= args.scipy_returns:
+            fits["scipy"] = timed(t.fit, x)
+        # a warm start from the fit of the sample minus its last 1%
+        previous = fit_student_t(x[:size - size // 100])
+        fits["warm"] = timed(fit_student_t, x, initial=previous)
+        # the best fit has the highest log-likelihood: report the others' shortfall
+        likelihoods = {name: t.logpdf(x, *params).sum() for name, (params, _) in fits.items()}
+        best = max(likelihoods.values())
+        for name, (params, elapsed) in fits.items():
+            print(f"{size:>8} {name:>6}: {elapsed * 1e3:8.1f} ms  df={params[0]:.4f} loc={params[1]:.3e} "
+                  f"scale={params[2]:.4e}  log-likelihood {likelihoods[name] - best:+.2e} from the best")
+
+    rng = np.random.default_rng(0)
+    for alpha in (2.5, 3.0, 4.0):
+        pareto = rng.pareto(alpha - 1, args.returns // 10) + 1  # density exponent alpha
+        t0 = time.perf_counter()
+        fit = fit_power_law(pareto)
+        elapsed = time.perf_counter() - t0
+        hill = hill_estimator(pareto, 1000)
+        print(f"Pareto alpha={alpha}: MLE {fit.alpha:.3f} (x_min {fit.x_min:.2f}, {elapsed * 1e3:.1f} ms), "
+              f"Hill(k=1000) {hill + 1:.3f}")
+
+
+if __name__ == "__main__":
+    main()
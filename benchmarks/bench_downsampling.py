@@ -0,0 +1,75 @@
+"""
+Figure JSON size and build time of the price charts, with and without server-side downsampling.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_downsampling --rows 2000000
+"""
+# Standard library imports
+import argparse
+import time
+
+# Third party imports
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Local package imports
+from components import tools
+from components.downsampling import candle_points, downsample_ohlc, line_points
+
+
+def synthetic_bars(rows, seed=0):
+    """Minute bars of a GBM price."""
+    rng = np.random.default_rng(seed)
+    close = 20000 * np.exp(np.cumsum(rng.normal(0, 1e-3, rows)))
+    spread = np.abs(rng.normal(0, 5e-4, rows)) * close
+    return pd.DataFrame({
+        "Date": pd.date_range("2018-01-01", periods=rows, freq="min"),
+        "Open": np.r_[close[0], close[:-1]],
+        "High": close + spread,
+        "Low": close - spread,
+        "Close": close,
+        "Volume": rng.random(rows),
+    })
+
+
+def candlestick(bars, max_points):
+    # the candles pages/home.py:update_candles ships for an "All time" range too long to send in full
+    bars = downsample_ohlc(bars, max_points)
+    return go.Figure(data=[go.Candlestick(x=bars["Date"], open=bars["Open"], close=bars["Close"],
+                                          high=bars["High"], low=bars["Low"])])
+
+
+def measure(build, *args):
+    t0 = time.perf_counter()
+    payload = build(*args).to_json()
+    return time.perf_counter() - t0, len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--width", type=int, default=1000, help="graph width in pixels")
+    args = parser.parse_args()
+    bars = synthetic_bars(args.rows)
+
+    cases = {
+        "candlestick": (candlestick, candle_points(args.width)),
+        "price_plot": (tools.price_plot, line_points(args.width)),
+        "log_price_plot": (tools.log_price_plot, line_points(args.width)),
+        "log_return_plot": (tools.log_return_plot, line_points(args.width)),
+        "instaneous_volatility_plot": (tools.instaneous_volatility_plot, line_points(args.width)),
+        "rolling_volatility_plot": (lambda df, n: tools.rolling_volatility_plot(df, 200, max_points=n),
+                                    line_points(args.width)),
+    }
+    print(f"{args.rows} bars, graph width {args.width}px")
+    for name, (build, points) in cases.items():
+        full_time, full_size = measure(build, bars, None)
+        time_, size = measure(build, bars, points)
+        print(f"{name:>27}: {full_size / 2 ** 20:8.2f} MiB {full_time * 1e3:8.0f} ms -> "
+              f"{size / 2 ** 20:8.3f} MiB {time_ * 1e3:8.0f} ms ({full_size / size:6.0f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
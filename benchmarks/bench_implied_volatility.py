@@ -0,0 +1,102 @@
+"""
+Implied volatility of a whole option chain: the vectorized solver versus one scipy.optimize.brentq call per quote.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_implied_volatility --quotes 100000
+
+The accuracy check runs on the committed fixture of synthetic quotes (benchmarks/fixtures/option_chain.csv), which
+can be regenerated with --write-fixture.
+"""
+# Standard library imports
+import argparse
+import os
+import time
+
+# Third party imports
+import numpy as np
+import pandas as pd
+from scipy.optimize import brentq
+
+# Local package imports
+from components.option_pricing.black_scholes import BlackScholesModel, OptionType, black_scholes_greeks
+from components.option_pricing.implied_volatility import implied_volatility
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "option_chain.csv")
+FIXTURE_QUOTES = 1000
+
+
+def synthetic_option_chain(quotes, seed=0, spot_price=20000.0, risk_free_rate=0.03):
+    """
+    Random calls and puts around a single spot price, with log-normal strikes, maturities up to two years and
+    volatilities between 5% and 200%, priced with Black-Scholes.
+    """
+    rng = np.random.default_rng(seed)
+    chain = pd.DataFrame({
+        "spot": spot_price,
+        "strike": np.round(spot_price * np.exp(rng.normal(0, 0.4, quotes)), 2),
+        "days_to_maturity": rng.integers(1, 730, quotes),
+        "risk_free_rate": risk_free_rate,
+        "is_call": rng.random(quotes) < 0.5,
+        "volatility": rng.uniform(0.05, 2.0, quotes),
+    })
+    greeks = black_scholes_greeks(chain.spot, chain.strike, chain.days_to_maturity, chain.risk_free_rate,
+                                  chain.volatility)
+    chain["price"] = np.where(chain.is_call, greeks.call_price, greeks.put_price)
+    # quotes whose price barely depends on the volatility cannot be inverted to any useful precision
+    return chain[greeks.vega > 1e-3].reset_index(drop=True)
+
+
+def solve(chain):
+    calls = chain.is_call.to_numpy()
+    args = [chain[c].to_numpy() for c in ("spot", "strike", "days_to_maturity", "risk_free_rate")]
+    sigma = np.empty(len(chain))
+    sigma[calls] = implied_volatility(chain.price[calls], *(a[calls] for a in args), OptionType.CALL_OPTION)
+    sigma[~calls] = implied_volatility(chain.price[~calls], *(a[~calls] for a in args), OptionType.PUT_OPTION)
+    return sigma
+
+
+def solve_loop(chain):
+    sigma = []
+    for quote in chain.itertuples():
+        option_type = OptionType.CALL_OPTION if quote.is_call else OptionType.PUT_OPTION
+
+        def error(v):
+            model = BlackScholesModel(quote.spot, quote.strike, quote.days_to_maturity, quote.risk_free_rate, v)
+            return model.option_price(option_type) - quote.price
+        sigma.append(brentq(error, 1e-6, 20.0, xtol=1e-10))
+    return np.array(sigma)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quotes", type=int, default=100_000)
+    parser.add_argument("--loop-quotes", type=int, default=1000, help="quotes solved one by one with brentq")
+    parser.add_argument("--write-fixture", action="store_true")
+    args = parser.parse_args()
+
+    if args.write_fixture:
+        os.makedirs(os.path.dirname(FIXTURE), exist_ok=True)
+        synthetic_option_chain(FIXTURE_QUOTES).to_csv(FIXTURE, index=False)
+    fixture = pd.read_csv(FIXTURE)
+    error = np.abs(solve(fixture) - fixture.volatility)
+    print(f"fixture: {len(fixture)} quotes, max abs volatility error {error.max():.2e}")
+
+    chain = synthetic_option_chain(args.quotes, seed=1)
+    t0 = time.perf_counter()
+    sigma = solve(chain)
+    elapsed = time.perf_counter() - t0
+    print(f"vectorized: {len(chain)} quotes in {elapsed * 1e3:7.1f} ms, "
+          f"max abs volatility error {np.nanmax(np.abs(sigma - chain.volatility)):.2e}, "
+          f"{np.isnan(sigma).sum()} unsolved")
+
+    subset = chain.iloc[:args.loop_quotes]
+    t0 = time.perf_counter()
+    solve_loop(subset)
+    loop_elapsed = time.perf_counter() - t0
+    print(f"brentq loop: {len(subset)} quotes in {loop_elapsed * 1e3:7.1f} ms "
+          f"(~{loop_elapsed * len(chain) / len(subset):.1f} s for the whole chain)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Import-time profile of the app boot: the cost of every module imported by `import app` (from python -X importtime),
+grouped by package, and the cost of building each page layout on its first request.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import_time --top 15
+"""
+# Standard library imports
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+FIRST_REQUEST = """
+import json, time
+t0 = time.perf_counter()
+import app
+print(f"boot {time.perf_counter() - t0:.3f}")
+import dash
+for name, page in dash.page_registry.items():
+    t0 = time.perf_counter()
+    layout = page["layout"]() if callable(page["layout"]) else page["layout"]
+    print(f"{name} {time.perf_counter() - t0:.3f}")
+"""
+
+
+def import_times(module, root):
+    """
+    :return: list of (module, self seconds, cumulative seconds, nesting depth), in import order
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=root,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="app", help="module to import")
+    parser.add_argument("--top", type=int, default=15, help="modules and packages listed")
+    args = parser.parse_args()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    rows = import_times(args.module, root)
+    total = sum(self_time for _, self_time, _, _ in rows)
+    print(f"import {args.module}: {total:.3f} s over {len(rows)} modules\n")
+
+    packages = defaultdict(float)
+    for name, self_time, _, _ in rows:
+        packages[name.split(".")[0]] += self_time
+    print("packages (self time):")
+    for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {seconds * 1e3:8.1f} ms  {package}")
+
+    print("\nproject modules (cumulative time, including what they import first):")
+    local = [row for row in rows if row[0].split(".")[0] in ("app", "components", "pages")]
+    for name, _, cumulative, _ in sorted(local, key=lambda row: -row[2])[:args.top]:
+        print(f"  {cumulative * 1e3:8.1f} ms  {name}")
+
+    print("\nfirst request (wall time, seconds):")
+    result = subprocess.run([sys.executable, "-c", FIRST_REQUEST], cwd=root, capture_output=True, text=True,
+                            check=True)
+    for line in result.stdout.splitlines():
+        name, seconds = line.rsplit(" ", 1)
+        print(f"  {float(seconds) * 1e3:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
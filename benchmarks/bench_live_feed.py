@@ -0,0 +1,64 @@
+"""
+Live feed throughput and memory: replay synthetic tick files of growing length as fast as possible, and report the
+ticks ingested per second and the peak memory, which should stay flat.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_live_feed --ticks 3000000
+"""
+# Standard library imports
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+REPLAY = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+from components.live_feed import LiveFeed, ReplaySource
+t0 = time.perf_counter()
+feed = LiveFeed(ReplaySource({path!r}, speed=0), {bars!r}).start()
+while feed.running:
+    time.sleep(0.01)
+print(feed.ticks / (time.perf_counter() - t0), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def write_ticks(path, ticks, seed=0, chunksize=500_000):
+    """
+    About 20 trades per second around a GBM price, written in chunks: the replay subprocesses are forked from this
+    one, and their peak RSS would otherwise include a whole tick frame held here.
+    """
+    rng = np.random.default_rng(seed)
+    timestamp, log_price = 1_600_000_000.0, np.log(20000)
+    for first in range(0, ticks, chunksize):
+        size = min(chunksize, ticks - first)
+        timestamps = timestamp + np.cumsum(rng.exponential(0.05, size))
+        log_prices = log_price + np.cumsum(rng.normal(0, 1e-4, size))
+        timestamp, log_price = timestamps[-1], log_prices[-1]
+        pd.DataFrame({"Timestamp": timestamps, "Price": np.exp(log_prices), "Size": rng.random(size)}).to_csv(
+            path, index=False, header=first == 0, mode="w" if first == 0 else "a")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ticks", type=int, default=3_000_000, help="ticks of the longest replay")
+    args = parser.parse_args()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for ticks in (args.ticks // 30, args.ticks // 3, args.ticks):
+            path = os.path.join(tmp, f"ticks_{ticks}.csv")
+            write_ticks(path, ticks)
+            code = REPLAY.format(root=root, path=path, bars=os.path.join(tmp, f"bars_{ticks}"))
+            rate, peak = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout.split()
+            print(f"{ticks:>9} ticks: {float(rate):10.0f} ticks/s, peak RSS {int(peak) / 1024:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Monte Carlo pricer scaling: wall time against the number of worker processes, and peak memory against the number of
+simulated paths (which should stay flat).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_monte_carlo --paths 10000000
+"""
+# Standard library imports
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+# Local package imports
+from components.option_pricing.black_scholes import BlackScholesModel
+from components.option_pricing.monte_carlo import MonteCarloModel
+
+PEAK_MEMORY = """
+import resource, sys
+sys.path.insert(0, {root!r})
+from components.option_pricing.monte_carlo import MonteCarloModel
+MonteCarloModel(20000, 25000, 180, 0.05, 0.75, {paths}, seed=0, workers=1).simulate()
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--paths", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    exact = BlackScholesModel(20000, 25000, 180, 0.05, 0.75).option_price()
+    print(f"Black-Scholes call: {exact:.4f}")
+    baseline = None
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        model = MonteCarloModel(20000, 25000, 180, 0.05, 0.75, args.paths, seed=0, workers=workers)
+        model.simulate()  # warm up the process pool
+        t0 = time.perf_counter()
+        result = model.simulate()
+        elapsed = time.perf_counter() - t0
+        baseline = baseline or elapsed
+        print(f"{workers:3d} workers: {elapsed:7.3f} s (speed-up {baseline / elapsed:4.1f}x) "
+              f"price {result.price:.4f} +/- {result.standard_error:.4f}")
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for paths in (10 ** 5, 10 ** 6, 10 ** 7):
+        code = PEAK_MEMORY.format(root=root, paths=paths)
+        peak = int(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout)
+        print(f"{paths:>9} paths: peak RSS {peak / 1024:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
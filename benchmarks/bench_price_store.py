@@ -0,0 +1,101 @@
+"""
+Cold start time and per-worker memory of the CSV loader versus the memory-mapped price store.
+
+Every measurement runs in a fresh interpreter, as a gunicorn worker would. Run from the repository root:
+
+    python -m benchmarks.bench_price_store --rows 1000000 --workers 4
+"""
+# Standard library imports
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+CSV_LOADER = """
+import pandas as pd
+df = pd.read_csv({csv!r})
+df["Date"] = pd.to_datetime(df["Date"], format="%Y-%m-%d")
+"""
+
+STORE_LOADER = """
+from components.price_store import load_prices
+df = load_prices({csv!r})
+"""
+
+WORKER = """
+import sys, time
+sys.path.insert(0, {root!r})
+import pandas
+t0 = time.perf_counter()
+{loader}
+elapsed = time.perf_counter() - t0
+float(df["Close"].sum())  # touch every page of the close column, as a figure builder would
+status = dict(line.split(":", 1) for line in open("/proc/self/status") if ":" in line)
+rollup = dict(line.split(":", 1) for line in open("/proc/self/smaps_rollup") if ":" in line)
+private = sum(int(rollup[k].split()[0]) for k in ("Private_Clean", "Private_Dirty"))
+print(elapsed, int(status["VmRSS"].split()[0]), private, int(rollup["Pss"].split()[0]))
+"""
+
+
+def synthetic_csv(path, rows, seed=0):
+    """
+    Write a Yahoo-like daily CSV with a GBM close price. Dates wrap around every 100k rows to stay within the
+    datetime64[ns] range: only the parsing cost matters here.
+    """
+    rng = np.random.default_rng(seed)
+    close = 400 * np.exp(np.cumsum(rng.normal(0, 0.04, rows)))
+    spread = np.abs(rng.normal(0, 0.02, rows)) * close
+    df = pd.DataFrame({
+        "Date": pd.date_range("1800-01-01", periods=100_000, freq="D").strftime("%Y-%m-%d")[np.arange(rows) % 100_000],
+        "Open": close * (1 + rng.normal(0, 0.01, rows)),
+        "High": close + spread,
+        "Low": close - spread,
+        "Close": close,
+        "Adj Close": close,
+        "Volume": rng.integers(1e6, 1e9, rows),
+    })
+    df.to_csv(path, index=False)
+    return path
+
+
+def run_workers(loader, workers):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = WORKER.format(root=root, loader=loader)
+    procs = [subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    # keep every worker alive until all have loaded, so shared pages are really shared while measuring
+    return [tuple(map(float, p.communicate()[0].split())) for p in procs]
+
+
+def report(name, results):
+    results = np.array(results)
+    elapsed, rss, private, pss = results.mean(axis=0)
+    print(f"{name:>6}: load {elapsed * 1e3:9.1f} ms | RSS {rss / 1024:8.1f} MiB | "
+          f"private {private / 1024:8.1f} MiB | PSS {pss / 1024:8.1f} MiB  (mean of {len(results)} workers)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--csv", help="CSV file to load (default: a synthetic one)")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows of the synthetic CSV")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent worker processes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv = args.csv or synthetic_csv(os.path.join(tmp, "prices.csv"), args.rows)
+        from components.price_store import convert_csv
+        t0 = time.perf_counter()
+        convert_csv(csv)
+        print(f"one-off conversion: {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+        report("csv", run_workers(CSV_LOADER.format(csv=csv), args.workers))
+        report("store", run_workers(STORE_LOADER.format(csv=csv), args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Latency of the GBM projection engine: one broadcasted log-space evaluation versus the former per-horizon loop, and the
+horizon slider of the Analytics page, uncached and cached, against a latency budget.
+
+The slider sweep calls the page's figure builder for --steps horizons twice: the first pass computes the projections
+and figures, the second is served from the caches. The exit status is 1 if the 95th percentile of the uncached slider
+steps exceeds the budget. Run from the repository root:
+
+    python -m benchmarks.bench_projection --horizons 730 --prices 1000
+"""
+# Standard library imports
+import argparse
+import sys
+import time
+
+# Third party imports
+import numpy as np
+
+# Local package imports
+from components.projection import PriceGrid, project
+from components.tools import projection_figures
+
+S0, MU, SIGMA = 30000.0, 1e-3, 0.035  # daily BTC-like parameters
+BUDGET_MS = 50.0
+
+
+def loop_densities(S0, mu, sigma, horizons, prices):
+    """Densities evaluated one horizon at a time, in price space, as lognormal_evolution_plot used to."""
+    return np.array([1 / (prices * sigma * np.sqrt(2 * np.pi * t))
+                     * np.exp(-(np.log(prices / S0) - mu * t) ** 2 / (2 * sigma ** 2 * t)) for t in horizons])
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--horizons", type=int, default=730, help="longest horizon, in days")
+    parser.add_argument("--prices", type=int, default=1000, help="points of the price grid")
+    parser.add_argument("--steps", type=int, default=200, help="slider positions swept, at most the figure cache size")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs, the best is kept")
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="milliseconds allowed to a slider step")
+    args = parser.parse_args()
+
+    horizons = np.arange(1, args.horizons + 1)
+    grid = PriceGrid.adaptive(S0, MU, SIGMA, args.horizons, points=args.prices)
+    loop = best_of(lambda: loop_densities(S0, MU, SIGMA, horizons, grid.prices), args.repeat)
+    # a new sigma at every run defeats the cache
+    sigmas = iter(SIGMA * (1 + 1e-9 * np.arange(args.repeat)))
+    engine = best_of(lambda: project(S0, MU, next(sigmas), horizons, grid), args.repeat)
+    print(f"{horizons.size} horizons x {args.prices} prices: loop {loop * 1e3:8.2f} ms | "
+          f"projection {engine * 1e3:8.2f} ms (densities, exceedance and quantiles)")
+
+    positions = np.unique(np.linspace(1, args.horizons, args.steps).astype(int))
+    for label in ("uncached", "cached"):
+        steps = np.array([best_of(lambda: projection_figures(S0, MU, SIGMA, int(horizon)), 1)
+                          for horizon in positions])
+        print(f"slider {label:>8}: median {np.median(steps) * 1e3:7.2f} ms | p95 {np.percentile(steps, 95) * 1e3:7.2f} "
+              f"ms | max {steps.max() * 1e3:7.2f} ms")
+        if label == "uncached" and np.percentile(steps, 95) * 1e3 > args.budget:
+            print(f"over the {args.budget:g} ms budget")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
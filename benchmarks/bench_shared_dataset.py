@@ -0,0 +1,81 @@
+"""
+Per-worker memory of the derived series (log returns and rolling prefix sums) kept in every process versus mapped
+from a shared dataset segment.
+
+Every worker is a fresh interpreter, as a gunicorn worker would be: it opens the price store, gets the derived series
+and a rolling volatility, then reports its memory while the other workers are alive. Run from the repository root:
+
+    python -m benchmarks.bench_shared_dataset --rows 2000000 --workers 4
+"""
+# Standard library imports
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Third party imports
+import numpy as np
+
+# Local package imports
+from benchmarks.bench_downsampling import synthetic_bars
+from components.price_store import write_store
+
+WORKER = """
+import os, sys, time
+sys.path.insert(0, {root!r})
+os.chdir({cache_root!r})
+from components import analytics_cache, shared_dataset
+from components.price_store import open_frame
+shared_dataset.SHARED_DIR = {shared!r}
+prices = open_frame({store!r})
+t0 = time.perf_counter()
+derived = analytics_cache.derived_series(prices)
+volatility = analytics_cache.rolling_stats(prices).volatility(200)
+elapsed = time.perf_counter() - t0
+del volatility  # a request's result, not kept by the worker
+time.sleep({hold})  # keep the mapping alive while the other workers measure
+rollup = dict(line.split(":", 1) for line in open("/proc/self/smaps_rollup") if ":" in line)
+private = sum(int(rollup[k].split()[0]) for k in ("Private_Clean", "Private_Dirty"))
+print(elapsed, private, int(rollup["Pss"].split()[0]))
+"""
+
+
+def run_workers(workers, hold, **paths):
+    code = WORKER.format(root=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), hold=hold, **paths)
+    procs = [subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    return np.array([tuple(map(float, p.communicate()[0].split())) for p in procs])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2_000_000, help="bars of the synthetic history")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent worker processes")
+    parser.add_argument("--hold", type=float, default=2.0, help="seconds every worker waits before measuring")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bars = synthetic_bars(args.rows)
+        store = os.path.join(tmp, "bars.store")
+        write_store(store, {name: bars[name].to_numpy() for name in bars.columns})
+        modes = {
+            # publishing fails in an unwritable directory: every worker keeps its own copies
+            "private": "/proc/btcdashboard-disabled",
+            "shared": os.path.join(tmp, "shared"),
+        }
+        for mode, shared in modes.items():
+            paths = {"cache_root": tmp, "shared": shared, "store": store}
+            # a first worker computes the series and writes the disk cache (and the segment)
+            t0 = time.perf_counter()
+            run_workers(1, 0, **paths)
+            print(f"{mode:>8}: first worker {time.perf_counter() - t0:.2f} s")
+            results = run_workers(args.workers, args.hold, **paths)
+            elapsed, private, pss = results.mean(axis=0)
+            print(f"{mode:>8}: derived series {elapsed * 1e3:8.1f} ms | private {private / 1024:8.1f} MiB | "
+                  f"PSS {pss / 1024:8.1f} MiB | total PSS {results[:, 2].sum() / 1024:8.1f} MiB "
+                  f"(mean of {args.workers} workers)")
+
+
+if __name__ == "__main__":
+    main()
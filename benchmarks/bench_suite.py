@@ -0,0 +1,238 @@
+"""
+Benchmark suite: throughput, peak memory and figure JSON size of the price loading, the analytics caches and figure
+builders, the home page callbacks and the Black & Scholes model, on synthetic histories from 3k to 10M bars.
+
+Every case is timed (best of --repeat runs, after a warm-up run unless it measures a cold computation), then run
+once more under tracemalloc for its peak memory. Results can be saved as a baseline and later runs compared with it:
+a case slower, hungrier or heavier than the baseline beyond the tolerances is flagged, and the exit status is 1.
+Caches and shared segments are written to a temporary directory, never to database/ or /dev/shm.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_suite --sizes 3000 100000 1000000 --save
+    python -m benchmarks.bench_suite --sizes 3000 100000 1000000
+    python -m benchmarks.bench_suite --sizes 10000000 --cases tools.price_plot home.candles --repeat 1
+"""
+# Standard library imports
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Third party imports
+import numpy as np
+import plotly.io as pio
+from plotly.utils import PlotlyJSONEncoder
+
+# Local package imports
+import app  # noqa: F401, the pages register with the Dash app
+from benchmarks.bench_downsampling import synthetic_bars
+from benchmarks.bench_price_store import synthetic_csv
+from components import analytics_cache, shared_dataset, tools
+from components.option_pricing.black_scholes import BlackScholesModel, OptionType
+from components.price_store import load_prices, store_path_for
+from pages.home import candles_payload, spot_price
+
+SIZES = (3_000, 100_000, 1_000_000)
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.10
+SIZE_TOLERANCE = 0.01
+MIN_SECONDS = 1e-3  # timing differences below this are noise
+# builders of the analytics page, run on warm analytics caches as when serving
+BUILDERS = ("price_plot", "log_price_plot", "log_return_plot", "instaneous_volatility_plot", "lognormal_evolution_plot",
+            "rolling_volatility_plot", "log_return_histogram", "log_log_return_histogram", "log_return_tails_power_law",
+            "volatility_forecast_plot")
+
+
+class Case:
+    """
+    One benchmark: run(data) returns the serialized payload (or None), cold cases drop the analytics caches first.
+    """
+
+    def __init__(self, name, run, cold=False):
+        self.name = name
+        self.run = run
+        self.cold = cold
+
+
+def _figure(builder):
+    return lambda data: pio.to_json(builder(data["bars"]), validate=False)
+
+
+def _cold_cache():
+    analytics_cache.clear_memory()
+    shutil.rmtree(analytics_cache.CACHE_DIR, ignore_errors=True)
+    shutil.rmtree(shared_dataset.SHARED_DIR, ignore_errors=True)
+
+
+def _load(data):
+    load_prices(data["csv"])
+
+
+def _derived(data):
+    analytics_cache.derived_series(data["bars"])
+
+
+def _online(data):
+    analytics_cache.online_stats(data["bars"])
+
+
+def _volatility(data):
+    analytics_cache.volatility_fit(data["bars"])
+
+
+def _black_scholes(data):
+    spots = data["spots"]
+    model = BlackScholesModel(spots, 25000, 180, 0.05, 0.75)
+    model.option_price(OptionType.CALL_OPTION)
+    model.option_price(OptionType.PUT_OPTION)
+    model.greeks()
+
+
+CASES = [
+    Case("data.load_prices.convert", _load, cold=True),
+    Case("data.load_prices.memmap", _load),
+    Case("analytics.derived_series", _derived, cold=True),
+    Case("analytics.online_stats", _online, cold=True),
+    Case("analytics.volatility_fit", _volatility, cold=True),
+    *(Case(f"tools.{name}", _figure(getattr(tools, name))) for name in BUILDERS),
+    Case("home.spot_price", lambda data: json.dumps(spot_price(data["bars"], data["day"]), cls=PlotlyJSONEncoder)),
+    Case("home.candles", lambda data: json.dumps(candles_payload(data["bars"], data["request"]))),
+    Case("options.black_scholes", _black_scholes),
+]
+
+
+def prepare(size, directory):
+    """Synthetic minute bars and their Yahoo-like CSV, with the inputs of the home page callbacks."""
+    bars = synthetic_bars(size)
+    csv = synthetic_csv(os.path.join(directory, f"prices-{size}.csv"), size)
+    return {
+        "bars": bars,
+        "csv": csv,
+        "day": str(bars["Date"].iloc[size // 2].date()),
+        "request": {"resolution": "1m", "range": "Max", "width": 1000},
+        "spots": np.linspace(1, 40000, size),
+    }
+
+
+def _reset(case, data):
+    if case.cold:
+        _cold_cache()
+        if case.name == "data.load_prices.convert":
+            shutil.rmtree(store_path_for(data["csv"]), ignore_errors=True)
+
+
+def measure(case, data, repeat):
+    """
+    :return: dict with the best time, the throughput in bars per second, the peak traced memory and the payload size
+    """
+    if not case.cold:
+        case.run(data)  # warm up the caches the case relies on, as a served app has
+    timings = []
+    for _ in range(repeat):
+        _reset(case, data)
+        t0 = time.perf_counter()
+        payload = case.run(data)
+        timings.append(time.perf_counter() - t0)
+    _reset(case, data)
+    tracemalloc.start()
+    case.run(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    seconds = min(timings)
+    return {
+        "seconds": seconds,
+        "throughput": len(data["bars"]) / seconds if seconds else float("inf"),
+        "peak_bytes": peak,
+        "json_bytes": len(payload) if payload is not None else None,
+    }
+
+
+def regressions(results, baseline, time_tolerance, memory_tolerance, size_tolerance):
+    """
+    :return: list of (case, measure, baseline value, value) worse than the baseline beyond the tolerances
+    """
+    flagged = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if (result["seconds"] > reference["seconds"] * (1 + time_tolerance)
+                and result["seconds"] - reference["seconds"] > MIN_SECONDS):
+            flagged.append((key, "seconds", reference["seconds"], result["seconds"]))
+        if result["peak_bytes"] > reference["peak_bytes"] * (1 + memory_tolerance):
+            flagged.append((key, "peak_bytes", reference["peak_bytes"], result["peak_bytes"]))
+        if result["json_bytes"] and reference["json_bytes"] and \
+                result["json_bytes"] > reference["json_bytes"] * (1 + size_tolerance):
+            flagged.append((key, "json_bytes", reference["json_bytes"], result["json_bytes"]))
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="bars of the synthetic histories")
+    parser.add_argument("--cases", nargs="+", help="run only the cases starting with these names")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case, the best is kept")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="save the results as the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    parser.add_argument("--size-tolerance", type=float, default=SIZE_TOLERANCE)
+    args = parser.parse_args()
+    cases = [case for case in CASES if not args.cases or case.name.startswith(tuple(args.cases))]
+
+    results = {}
+    root = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # the analytics caches are relative to the working directory
+        os.chdir(directory)
+        shared_dataset.SHARED_DIR = os.path.join(directory, "shared")
+        try:
+            for size in args.sizes:
+                data = prepare(size, directory)
+                for case in cases:
+                    result = results[f"{case.name}@{size}"] = measure(case, data, args.repeat)
+                    json_size = f"{result['json_bytes'] / 2 ** 10:9.1f} KiB" if result["json_bytes"] else " " * 13
+                    print(f"{case.name:>36} {size:>9}: {result['seconds'] * 1e3:10.2f} ms "
+                          f"{result['throughput']:12.3g} bars/s  peak {result['peak_bytes'] / 2 ** 20:8.1f} MiB "
+                          f"{json_size}", flush=True)
+                _cold_cache()
+        finally:
+            os.chdir(root)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+        baseline.update(results)
+        machine = {"python": sys.version.split()[0], "numpy": np.__version__, "platform": platform.platform(),
+                   "cpus": os.cpu_count()}
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": machine, "results": baseline}, f, indent=1, sort_keys=True)
+        print(f"\nbaseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nno baseline at {args.baseline}: run with --save first")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    flagged = regressions(results, baseline["results"], args.time_tolerance, args.memory_tolerance,
+                          args.size_tolerance)
+    print(f"\ncompared with the baseline of {baseline['machine']['platform']}, python {baseline['machine']['python']}")
+    for key, measure_name, reference, value in flagged:
+        print(f"REGRESSION {key} {measure_name}: {reference:.4g} -> {value:.4g} ({value / reference - 1:+.0%})")
+    if flagged:
+        sys.exit(1)
+    print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
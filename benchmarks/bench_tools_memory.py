@@ -0,0 +1,89 @@
+"""
+Peak memory allocated by every analytics figure builder, per bar of the history, checked against a budget.
+
+The builders run on a multi-million bar history with warm caches, as when serving: the series context, derived series
+and statistics are already computed, so what is measured is what one request allocates. A builder copying the history
+into a full-length frame or array shows as 8 bytes per bar or more; downsampled lines stay around one. Allocations
+not depending on the history length (e.g. simulated paths) are given a fixed allowance instead. The exit status is 1
+if a builder exceeds the budget. This is a manual gate, like the other benchmarks: run it after changing a builder,
+from the repository root:
+
+    python -m benchmarks.bench_tools_memory --rows 5000000
+    python -m benchmarks.bench_tools_memory --rows 2000000 --budget 10 --builders price_plot log_price_plot
+"""
+# Standard library imports
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+
+# Local package imports
+from benchmarks.bench_downsampling import synthetic_bars
+from benchmarks.bench_suite import BUILDERS
+from components import shared_dataset, tools
+
+# bytes per bar a request may allocate, derived from the full-length arrays it needs: one temporary float64 array (8)
+# and a boolean mask (1)
+BUDGET = 9.0
+BUDGETS = {
+    # the volatility it returns (8), the window counts it divides by (8) and the mask of short windows (1)
+    "rolling_volatility_plot": 17.0,
+}
+# bytes per bar added to every budget for what does not scale with whole arrays: the downsampled points (about one
+# byte per bar for the line plots) and the small buffers of pandas and plotly
+MARGIN = 2.0
+# bytes a request may allocate whatever the length of the history, on top of its budget per bar
+ALLOWANCES = {
+    # the Heston and exp-OU simulations, about six (horizon + 1) x paths float64 arrays of 2.8 MiB each at the default
+    # 180 days x 2000 paths (17 MiB), rounded up for the temporaries of the percentile bands
+    "volatility_forecast_plot": 20 * 2 ** 20,
+}
+
+
+def peak_bytes(builder, bars):
+    """Peak traced memory of one call of a builder, after a warm-up call."""
+    builder(bars)
+    tracemalloc.start()
+    try:
+        builder(bars)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5_000_000, help="bars of the synthetic history")
+    parser.add_argument("--builders", nargs="+", default=BUILDERS, help="builders of components.tools to measure")
+    parser.add_argument("--budget", type=float, help=f"bytes per bar allowed to every builder (default "
+                                                     f"{BUDGET + MARGIN:g}, more for {', '.join(BUDGETS)})")
+    args = parser.parse_args()
+
+    bars = synthetic_bars(args.rows)
+    over = []
+    root = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # the analytics caches are relative to the working directory
+        os.chdir(directory)
+        shared_dataset.SHARED_DIR = os.path.join(directory, "shared")
+        try:
+            for name in args.builders:
+                peak = peak_bytes(getattr(tools, name), bars)
+                budget = args.budget or BUDGETS.get(name, BUDGET) + MARGIN
+                per_bar = max(peak - ALLOWANCES.get(name, 0), 0) / args.rows
+                status = "ok" if per_bar <= budget else "OVER BUDGET"
+                if per_bar > budget:
+                    over.append(name)
+                allowance = f" + {ALLOWANCES[name] / 2 ** 20:g} MiB" if name in ALLOWANCES else ""
+                print(f"{name:>28}: peak {peak / 2 ** 20:8.1f} MiB {per_bar:6.2f} B/bar "
+                      f"(budget {budget:g}{allowance}) {status}", flush=True)
+        finally:
+            os.chdir(root)
+    if over:
+        print(f"\nover budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
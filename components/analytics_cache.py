@@ -0,0 +1,334 @@
+"""
+Derived series of a price history (log returns, moments, distribution fits), computed once per dataset
+version and persisted on disk.
+
+Entries are keyed by the fingerprint of the price store the frame was opened from (see price_store.open_frame), so
+any change to the store yields a new key and the stale entry is simply never read again.
+
+The log returns and their rolling prefix sums are also published as a shared dataset segment per series (see
+components.shared_dataset): the first worker process to need a dataset version computes (or loads) it and publishes
+it, the others map the same pages read-only instead of holding their own copies.
+"""
+# Standard library imports
+import dataclasses
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+# Third party imports
+import numpy as np
+from scipy.stats import kurtosis, norm, skew
+
+# Local package imports
+from components.distribution_fit import PowerLawFit, StudentTFit, fit_student_t, tail_fits
+from components.online_stats import OnlineReturnStats
+from components import shared_dataset
+from components.rolling import RollingStats
+from components.volatility_models import exp_ou_parameters, fit_volatility_model, heston_parameters
+
+CACHE_DIR = "database/analytics"
+CACHE_VERSION = 4
+KEEP_ENTRIES = 8  # cache files kept on disk, the oldest are pruned
+KEEP_IN_MEMORY = 4  # dataset versions (or series) kept in process, the least recently used are dropped
+
+
+class _LastUsed:
+    """
+    Mapping keeping its `size` most recently used entries: every new dataset version (e.g. each live feed append)
+    adds full-length arrays, the oldest versions are dropped rather than kept for the life of the process.
+    """
+
+    def __init__(self, size=KEEP_IN_MEMORY):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_memory = _LastUsed()
+_rolling = _LastUsed()
+_online = _LastUsed()
+_volatility = _LastUsed(2 * KEEP_IN_MEMORY)  # keyed per dataset version and model
+_calibrations = _LastUsed()  # Heston and exp-OU parameters, keyed per dataset version
+_t_fits = _LastUsed()  # last Student's t fit of every series, to warm start the fit of its next version
+
+
+@dataclasses.dataclass
+class DerivedSeries:
+    """Statistics of the log returns of a price history. log_returns is aligned with the prices (NaN first)."""
+    fingerprint: str
+    log_returns: np.ndarray
+    periods_per_year: float
+    count: int
+    mean: float
+    std: float
+    sample_std: float
+    skewness: float
+    kurtosis: float
+    norm_fit: tuple
+    t_fit: StudentTFit
+    left_tail: PowerLawFit
+    right_tail: PowerLawFit
+
+
+def periods_per_year(price_db):
+    """
+    Number of bars in a year, inferred from the median spacing of the dates (365 for daily prices), used to annualize
+    volatilities whatever the bar resolution.
+    """
+    spacing = np.median(np.diff(price_db["Date"].to_numpy().view(np.int64)))
+    return 365 * 24 * 3600 * 1e9 / spacing
+
+
+def fingerprint(price_db):
+    """
+    Identify the dataset version of a price frame: the store fingerprint when the frame is a whole store, a hash of
+    dates and close prices otherwise (e.g. for a slice of a store).
+    """
+    attrs = price_db.attrs
+    if attrs.get("fingerprint") and attrs.get("length") == len(price_db):
+        return attrs["fingerprint"]
+    digest = hashlib.blake2b(digest_size=16)
+    # hashed through the buffer protocol, without copying the columns to bytes
+    digest.update(np.ascontiguousarray(price_db["Date"].to_numpy()).view(np.int64))
+    digest.update(np.ascontiguousarray(price_db["Close"].to_numpy(np.float64)))
+    return digest.hexdigest()
+
+
+def compute_derived(price_db, key=None, t_initial=None):
+    """
+    Compute all the derived series of a price history, from scratch.
+
+    :param t_initial: (df, loc, scale) to start the Student's t fit from
+    """
+    close = price_db["Close"].to_numpy(np.float64)
+    log_returns = np.empty_like(close)
+    log_returns[:1] = np.nan
+    np.subtract(np.log(close[1:]), np.log(close[:-1]), out=log_returns[1:])
+    returns = log_returns[1:]
+
+    left_tail, right_tail = tail_fits(returns)
+    return DerivedSeries(
+        fingerprint=key or fingerprint(price_db),
+        log_returns=log_returns,
+        periods_per_year=periods_per_year(price_db),
+        count=returns.size,
+        mean=returns.mean(),
+        std=returns.std(),
+        sample_std=returns.std(ddof=1),
+        skewness=skew(returns),
+        kurtosis=kurtosis(returns),
+        norm_fit=norm.fit(returns),
+        t_fit=fit_student_t(returns, initial=t_initial),
+        left_tail=left_tail,
+        right_tail=right_tail,
+    )
+
+
+def _cache_file(key, cache_dir):
+    return os.path.join(cache_dir, f"derived-v{CACHE_VERSION}-{key}.pkl")
+
+
+def _prune(cache_dir, prefix="derived-"):
+    files = sorted((os.path.join(cache_dir, f) for f in os.listdir(cache_dir)
+                    if f.startswith(prefix) and f.endswith(".pkl")),
+                   key=os.path.getmtime)
+    for path in files[:-KEEP_ENTRIES]:
+        os.remove(path)
+
+
+def _write_pickle(path, value):
+    """Write a cache file atomically; return whether it could be written."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        return False  # a read-only deployment still benefits from the in-process cache
+
+
+def _segment_name(series):
+    return f"analytics-v{CACHE_VERSION}-{series}"
+
+
+def _share(series, derived):
+    """
+    Publish the log returns and rolling prefix sums of a derived series.
+
+    :return: the mapped Segment, or None when the segment cannot be written (the process keeps private copies)
+    """
+    rolling = RollingStats(derived.log_returns)
+    count, total, total_sq = rolling.prefix_sums()
+    meta = {"derived": dataclasses.replace(derived, log_returns=None), "shift": rolling.shift}
+    arrays = {"log_returns": derived.log_returns, "count": count, "sum": total, "sum_sq": total_sq}
+    try:
+        shared_dataset.publish(_segment_name(series), arrays, meta)
+    except OSError:
+        return None
+    segment = shared_dataset.attach(_segment_name(series))
+    # another process may have published another version of the series in between
+    if segment is None or segment.meta["derived"].fingerprint != derived.fingerprint:
+        return None
+    return segment
+
+
+def derived_series(price_db, cache_dir=CACHE_DIR):
+    """
+    Derived series of a price history, from the in-process cache, the shared segment, the disk cache or computed
+    (and then cached and shared). A new version of a series (e.g. grown by the live feed) starts its Student's t fit
+    from the previous one.
+    """
+    key = fingerprint(price_db)
+    derived = _memory.get(key)
+    if derived is not None:
+        return derived
+
+    series = _series_key(price_db["Date"].to_numpy().astype("datetime64[ns]", copy=False).view(np.int64))
+    segment = shared_dataset.attach(_segment_name(series))
+    if segment is None or segment.meta["derived"].fingerprint != key:
+        path = _cache_file(key, cache_dir)
+        try:
+            with open(path, "rb") as f:
+                derived = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            derived = compute_derived(price_db, key, _t_fits.get(series))
+            if _write_pickle(path, derived):
+                _prune(cache_dir)
+        segment = _share(series, derived)
+
+    if segment is not None:
+        # read-only views of the shared pages
+        arrays = segment.arrays
+        derived = dataclasses.replace(segment.meta["derived"], log_returns=arrays["log_returns"])
+        _rolling[key] = RollingStats.from_prefix_sums(arrays["count"], arrays["sum"], arrays["sum_sq"],
+                                                      segment.meta["shift"])
+    _memory[key] = derived
+    _t_fits[series] = derived.t_fit
+    return derived
+
+
+def rolling_stats(price_db):
+    """
+    Prefix sums of the log returns of a price history, for rolling statistics over any window. They take a single
+    O(n) pass to build, and are shared with the derived series when possible, kept in process otherwise.
+    """
+    key = fingerprint(price_db)
+    rolling = _rolling.get(key)
+    if rolling is None:
+        derived = derived_series(price_db)
+        rolling = _rolling.get(key)
+        if rolling is None:
+            rolling = _rolling[key] = RollingStats(derived.log_returns)
+    return rolling
+
+
+def _series_key(dates):
+    """Identify a price series independently of its length: its first date and its median bar spacing."""
+    spacing = np.median(np.diff(dates[:1000])) if dates.size > 1 else 0
+    return f"{dates[0] if dates.size else 0}-{spacing}"
+
+
+def online_stats(price_db, cache_dir=CACHE_DIR):
+    """
+    Online log-return statistics of a price history, resumed from the last state of the same series: when bars have
+    been appended since (e.g. by the live feed), only the new bars are consumed. States are checkpointed on disk, so
+    a restarted app resumes too.
+    """
+    dates = price_db["Date"].to_numpy().astype("datetime64[ns]", copy=False).view(np.int64)
+    close = price_db["Close"].to_numpy(np.float64)
+    key = _series_key(dates)
+    path = os.path.join(cache_dir, f"online-v{CACHE_VERSION}-{key}.pkl")
+
+    state = _online.get(key)
+    if state is None:
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+    # the state can be resumed if its last bar is still there, unchanged
+    resumable = (state is not None and 0 < state.bars <= dates.size and dates[state.bars - 1] == state.last_date
+                 and close[state.bars - 1] == state.last_close)
+    if not resumable:
+        state = OnlineReturnStats()
+    if state.bars < dates.size:
+        state.update_many(close[state.bars:], dates[state.bars:])
+        _write_pickle(path, state)
+    _online[key] = state
+    return state
+
+
+def clear_memory():
+    """Drop the in-process caches, e.g. to measure cold computations; the disk caches are kept."""
+    for cache in (_memory, _rolling, _online, _volatility, _calibrations, _t_fits):
+        cache.clear()
+
+
+def volatility_fit(price_db, model="gjr", cache_dir=CACHE_DIR):
+    """
+    GARCH-family fit (see components.volatility_models) of the log returns of a price history, cached in process and
+    on disk per dataset version and model.
+    """
+    key = fingerprint(price_db)
+    fit = _volatility.get((key, model))
+    if fit is not None:
+        return fit
+
+    path = os.path.join(cache_dir, f"volatility-v{CACHE_VERSION}-{model}-{key}.pkl")
+    try:
+        with open(path, "rb") as f:
+            fit = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        fit = fit_volatility_model(derived_series(price_db, cache_dir).log_returns, model)
+        if _write_pickle(path, fit):
+            _prune(cache_dir, "volatility-")
+
+    _volatility[key, model] = fit
+    return fit
+
+
+def volatility_calibration(price_db, cache_dir=CACHE_DIR):
+    """
+    Heston and exp-OU parameters (see components.volatility_models) calibrated on the GJR fit of a price history,
+    cached in process per dataset version: the calibration regresses over the whole fitted variance, which a request
+    only simulating from the parameters should not repeat.
+
+    :return: dict of the "heston" and "exp_ou" parameters
+    """
+    key = fingerprint(price_db)
+    calibration = _calibrations.get(key)
+    if calibration is None:
+        fit = volatility_fit(price_db, "gjr", cache_dir)
+        derived = derived_series(price_db, cache_dir)
+        year = derived.periods_per_year
+        calibration = _calibrations[key] = {"heston": heston_parameters(fit, derived.log_returns, year),
+                                            "exp_ou": exp_ou_parameters(fit, derived.log_returns, year)}
+    return calibration
@@ -1,5 +1,54 @@
-# Third party imports
-import pandas as pd
+# Standard library imports
+from functools import lru_cache
 
-BTCprice = pd.read_csv("database/BTC-USD.csv")
-BTCprice["Date"] = pd.to_datetime(BTCprice["Date"], format="%Y-%m-%d")
\ No newline at end of file
+DAILY_PRICES = "database/BTC-USD.csv"
+
+_frames = {}  # resolution -> frame of the last version of its bar store
+
+
+@lru_cache(maxsize=None)
+def daily_prices():
+    """
+    Yahoo finance daily history, loaded on first use so that importing the pages stays cheap.
+    """
+    # pandas and the price store are imported with the first data access, not at boot
+    from components.price_store import load_prices
+    return load_prices(DAILY_PRICES)
+
+
+def __getattr__(name):
+    # BTCprice keeps working as a module attribute, loaded when first accessed
+    if name == "BTCprice":
+        return daily_prices()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def resolution_options():
+    """
+    Resolutions that can be plotted: the ingested intraday bars plus the daily history.
+    """
+    from components.ingestion import available_resolutions
+    resolutions = available_resolutions()
+    return resolutions if "1d" in resolutions else resolutions + ["1d"]
+
+
+def get_prices(resolution="1d"):
+    """
+    Price history at a given bar resolution, memory-mapped from the ingested bar stores. Without ingested daily bars,
+    the "1d" resolution falls back on the Yahoo finance daily history.
+
+    A store frame is kept until its store changes: bars appended by the live feed are mapped by the next call.
+    """
+    from components.ingestion import available_resolutions, bars_path
+    from components.price_store import open_frame, read_meta
+    if resolution in available_resolutions():
+        path = bars_path(resolution)
+        meta = read_meta(path)
+        frame = _frames.get(resolution)
+        if frame is None or (frame.attrs.get("length"), frame.attrs.get("fingerprint")) != \
+                (meta["length"], meta.get("fingerprint")):
+            frame = _frames[resolution] = open_frame(path)
+        return frame
+    if resolution == "1d":
+        return daily_prices()
+    raise ValueError(f"No {resolution} bars have been ingested, see components/ingestion.py")
@@ -0,0 +1,60 @@
+# Third party imports
+import numpy as np
+import pandas as pd
+
+
+class DateIndex:
+    """
+    Binary-search index over the sorted Date column of a price frame.
+
+    The dates are kept as an int64 (nanoseconds) view of the column, so building the index copies nothing, and every
+    lookup is a searchsorted over it: O(log n) without any allocation proportional to the history length. Ranges are
+    returned as slices, which select views of the frame columns.
+    """
+
+    def __init__(self, dates):
+        """
+        :param dates: sorted datetime64 Series or array
+        """
+        self.values = np.asarray(dates).astype("datetime64[ns]", copy=False).view(np.int64)
+
+    def __len__(self):
+        return len(self.values)
+
+    @staticmethod
+    def _ns(date):
+        return pd.Timestamp(date).value
+
+    def asof(self, date):
+        """
+        :return: position of the last bar at or before date, -1 if date is before the first bar
+        """
+        return int(np.searchsorted(self.values, self._ns(date), side="right")) - 1
+
+    def after(self, date):
+        """
+        :return: slice of the bars strictly after date
+        """
+        return slice(int(np.searchsorted(self.values, self._ns(date), side="right")), len(self))
+
+    def last(self, n):
+        """
+        :return: slice of the last n bars
+        """
+        return slice(max(len(self) - n, 0), len(self))
+
+    def last_date(self):
+        return pd.Timestamp(self.values[-1])
+
+    def spot(self, close, day=None):
+        """
+        Close and previous close at a date, falling back on the last bar before it when the date has no bar.
+
+        :param close: array of close prices aligned with the dates
+        :param day: date to look up, defaults to the last bar
+        :return: (close, previous close), None if day is before the first bar
+        """
+        position = len(self) - 1 if day is None else self.asof(day)
+        if position < 0:
+            return None
+        return close[position], close[position - 1] if position > 0 else np.nan
@@ -0,0 +1,159 @@
+"""
+Distribution fits of log returns: Student's t by maximum likelihood with the ECME algorithm, and power-law tails with
+the Hill and continuous maximum-likelihood estimators.
+
+Long series are fitted on a fine histogram of the returns (bin centers weighted by their counts), a sufficient
+statistic up to the binning error, which for 2**14 bins is far below the sampling error of the fit itself.
+"""
+# Standard library imports
+from collections import namedtuple
+
+# Third party imports
+import numpy as np
+from scipy.optimize import brentq
+from scipy.special import digamma
+
+BINNED_ABOVE = 50_000  # longer samples are fitted on their histogram
+FIT_BINS = 2 ** 14
+MIN_DF, MAX_DF = 0.1, 1000.0  # Student's t degrees of freedom searched; MAX_DF is practically Gaussian
+TAIL_CANDIDATES = 50  # x_min candidates scanned by the power-law fit
+
+StudentTFit = namedtuple("StudentTFit", ["df", "loc", "scale"])
+PowerLawFit = namedtuple("PowerLawFit", ["alpha", "x_min", "tail_size", "ks_distance"])
+
+
+def _sample(x, bins):
+    """Valid values with unit weights, or the centers and counts of their histogram for long samples."""
+    x = np.asarray(x, dtype=np.float64)
+    x = x[np.isfinite(x)]
+    if bins is None:
+        bins = FIT_BINS if x.size > BINNED_ABOVE else 0
+    if not bins:
+        return x, np.ones_like(x)
+    counts, edges = np.histogram(x, bins=bins)
+    keep = counts > 0
+    return (0.5 * (edges[:-1] + edges[1:]))[keep], counts[keep].astype(np.float64)
+
+
+def _df_score(df, d, weights, total):
+    """Derivative of the Student's t log-likelihood with respect to the degrees of freedom, at given loc and scale."""
+    ratio = d / df
+    return (0.5 * total * (digamma(0.5 * (df + 1)) - digamma(0.5 * df) - 1 / df)
+            - 0.5 * weights @ np.log1p(ratio) + 0.5 * (df + 1) / df * (weights @ (ratio / (1 + ratio))))
+
+
+def fit_student_t(x, initial=None, bins=None, tolerance=1e-8, max_iterations=1000):
+    """
+    Maximum-likelihood Student's t fit, as scipy.stats.t.fit, with the ECME algorithm (Liu & Rubin, 1995): the
+    E-step weights every value by (df+1)/(df+d), d its squared standardized distance; loc and scale follow in closed
+    form, and df maximizes the observed likelihood, a root of its one-dimensional score.
+
+    :param x: 1D array of values (NaN and infinities are dropped)
+    :param initial: (df, loc, scale) to start from, e.g. the fit of a shorter version of the same series
+    :param bins: histogram bins to fit on, 0 for the raw values; by default the raw values up to BINNED_ABOVE
+    :param tolerance: relative change of the parameters at which the iterations stop
+    :return: StudentTFit(df, loc, scale)
+    """
+    values, weights = _sample(x, bins)
+    total = weights.sum()
+    if initial is None:
+        # weighted median: the mean of a heavy-tailed sample is a poor start
+        order = np.argsort(values)
+        loc = values[order][np.searchsorted(np.cumsum(weights[order]), 0.5 * total)]
+        scale = np.sqrt(weights @ (values - loc) ** 2 / total)
+        df = 5.0
+    else:
+        df, loc, scale = initial
+
+    for _ in range(max_iterations):
+        d = ((values - loc) / scale) ** 2
+        # E-step: expected precision of every value; CM-steps: loc and scale, then df
+        w = weights * (df + 1) / (df + d)
+        new_loc = w @ values / w.sum()
+        new_scale = np.sqrt(w @ (values - new_loc) ** 2 / total)
+        d = ((values - new_loc) / new_scale) ** 2
+        low, high = _df_score(MIN_DF, d, weights, total), _df_score(MAX_DF, d, weights, total)
+        if low * high < 0:
+            new_df = brentq(_df_score, MIN_DF, MAX_DF, args=(d, weights, total), xtol=1e-10)
+        else:
+            new_df = MAX_DF if high > 0 else MIN_DF
+        change = max(abs(new_df - df) / df, abs(new_loc - loc) / scale, abs(new_scale - scale) / scale)
+        df, loc, scale = new_df, new_loc, new_scale
+        if change < tolerance:
+            break
+    return StudentTFit(float(df), float(loc), float(scale))
+
+
+def hill_estimator(x, tail_size):
+    """
+    Hill estimator of the tail index of the largest values: alpha = k / sum(log(x_(i) / x_(k+1))), over the k largest
+    relative to the next one. The survival function of the tail decays as x**-alpha.
+
+    :param x: 1D array of positive values (e.g. the absolute negative returns for the left tail)
+    :param tail_size: number k of largest values used
+    """
+    x = np.asarray(x, dtype=np.float64)
+    top = -np.partition(-x[np.isfinite(x)], tail_size)[:tail_size + 1]
+    top.sort()
+    return tail_size / np.log(top[1:] / top[0]).sum()
+
+
+def fit_power_law(x, x_min=None, candidates=TAIL_CANDIDATES, min_tail=50):
+    """
+    Continuous power-law fit of the tail of positive values, p(x) ~ x**-alpha for x >= x_min, by maximum likelihood
+    (Clauset, Shalizi & Newman, 2009). Without x_min, it is chosen among quantiles of the data as the one minimizing
+    the Kolmogorov-Smirnov distance between the tail and its fit; sums of logs over every tail come from one
+    cumulative sum of the sorted values.
+
+    :param x: 1D array of values, the positive ones are used
+    :param x_min: lower bound of the tail, chosen by KS distance when None
+    :param candidates: number of x_min candidates scanned
+    :param min_tail: smallest tail considered
+    :return: PowerLawFit(alpha, x_min, tail_size, ks_distance); the survival function decays as x**(1-alpha)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    x = np.sort(x[np.isfinite(x) & (x > 0)])[::-1]
+    log_x = np.log(x)
+    log_sums = np.cumsum(log_x)  # sum of the logs of the k largest values, at k-1
+
+    if x_min is not None:
+        sizes = np.array([np.searchsorted(-x, -x_min, side="right")])
+    else:
+        sizes = np.unique(np.geomspace(min_tail, max(x.size, min_tail), candidates).astype(np.int64))
+        sizes = sizes[sizes <= x.size]
+
+    best = None
+    for k in sizes:
+        if k < 2:
+            continue
+        lower = x[k - 1]
+        alpha = 1 + k / (log_sums[k - 1] - k * log_x[k - 1])
+        # KS distance between the empirical and the fitted survival functions of the tail
+        empirical = np.arange(1, k + 1) / k
+        fitted = (x[:k] / lower) ** (1 - alpha)
+        distance = max(np.abs(empirical - fitted).max(), np.abs(empirical - 1 / k - fitted).max())
+        if best is None or distance < best.ks_distance:
+            best = PowerLawFit(float(alpha), float(lower), int(k), float(distance))
+    return best
+
+
+def tail_fits(log_returns):
+    """
+    Power-law fits of the left (losses, as positive values) and right tails of log returns.
+
+    :return: (left PowerLawFit, right PowerLawFit)
+    """
+    log_returns = np.asarray(log_returns, dtype=np.float64)
+    return fit_power_law(-log_returns), fit_power_law(log_returns)
+
+
+if __name__ == "__main__":
+    import time
+    from scipy.stats import t
+
+    sample = t.rvs(3, loc=1e-3, scale=0.02, size=200_000, random_state=0)
+    for name, fit in (("ECME binned", lambda: fit_student_t(sample)), ("ECME", lambda: fit_student_t(sample, bins=0)),
+                      ("scipy", lambda: t.fit(sample))):
+        t0 = time.perf_counter()
+        print(name, fit(), f"{time.perf_counter() - t0:.3f} s")
+    print("tails", tail_fits(sample))
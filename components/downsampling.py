@@ -0,0 +1,162 @@
+"""
+Server-side downsampling of the traces sent to the browser.
+
+Lines are reduced with MinMaxLTTB: a vectorized min-max preselection of a few candidate points per bucket, followed by
+Largest-Triangle-Three-Buckets on the candidates only. Candles are re-aggregated in time buckets, which preserves
+open/high/low/close exactly. Both cut a trace to about as many points as the graph has pixels.
+"""
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Local package imports
+from components.ingestion import aggregate
+
+DEFAULT_WIDTH = 1000  # px, a full-width graph on a laptop screen
+LINE_POINTS_PER_PX = 2
+CANDLE_PX = 3  # a candle needs a body and two margins to stay readable
+MINMAX_RATIO = 4
+BLOCK_SIZE = 2 ** 16  # values reduced at a time by the min-max preselection
+
+
+def line_points(width=None):
+    """Number of points worth sending for a line trace drawn on a graph `width` pixels wide."""
+    return int((width or DEFAULT_WIDTH) * LINE_POINTS_PER_PX)
+
+
+def candle_points(width=None):
+    """Number of candles that can be told apart on a graph `width` pixels wide."""
+    return max(int((width or DEFAULT_WIDTH) / CANDLE_PX), 1)
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.view(np.int64)
+    return x.astype(np.float64, copy=False)
+
+
+def minmax_indices(y, n_buckets):
+    """
+    Indices of the minimum and maximum of `n_buckets` equally populated buckets, sorted, NaNs ignored.
+    """
+    n = y.size
+    size = -(-n // n_buckets)
+    if not np.isnan(y).any():
+        # buckets as a view of the whole ones plus the remainder: no padded copy, and no NaN-skipping copies
+        whole = n // size
+        buckets = y[:whole * size].reshape(whole, size)
+        offsets = np.arange(whole) * size
+        # argmin/argmax copy a read-only input (e.g. a shared segment) whole: reduce it a block at a time
+        rows = max(BLOCK_SIZE // size, 1)
+        extremes = [np.concatenate([buckets[i:i + rows].argmin(axis=1) for i in range(0, whole, rows)]) + offsets,
+                    np.concatenate([buckets[i:i + rows].argmax(axis=1) for i in range(0, whole, rows)]) + offsets]
+        if whole * size < n:
+            rest = y[whole * size:]
+            extremes.append([whole * size + rest.argmin(), whole * size + rest.argmax()])
+        return np.unique(np.concatenate(extremes))
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, size)
+    valid = ~np.isnan(buckets).all(axis=1)
+    offsets = np.arange(n_buckets)[valid] * size
+    low = np.nanargmin(buckets[valid], axis=1) + offsets
+    high = np.nanargmax(buckets[valid], axis=1) + offsets
+    return np.unique(np.concatenate([low, high]))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: keep the first and last points and, in each of the n_out - 2 buckets in between,
+    the point forming the largest triangle with the point kept in the previous bucket and the mean of the next one.
+
+    :return: sorted indices of the kept points
+    """
+    n = y.size
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    # mean of every bucket, the last "next bucket" being the last point
+    counts = ends - starts
+    mean_x = np.add.reduceat(x[:n - 1], starts) / counts
+    mean_y = np.add.reduceat(y[:n - 1], starts) / counts
+    next_x = np.r_[mean_x[1:], x[-1]]
+    next_y = np.r_[mean_y[1:], y[-1]]
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[a] - next_x[i]) * (by - y[a]) - (x[a] - bx) * (next_y[i] - y[a]))
+        a = start + np.argmax(area)
+        kept[i + 1] = a
+    return kept
+
+
+def line_indices(x, y, n_out):
+    """
+    Indices of the points to plot for a line, about n_out of them (MinMaxLTTB). NaN points are dropped.
+    """
+    y = _as_float(y)
+    n = y.size
+    if n <= n_out:
+        return np.arange(n)
+
+    missing = np.isnan(y)
+    first = int(missing.argmin())
+    if not missing[first:].any():
+        # NaNs at most at the start (e.g. the first return, a rolling window filling up): work on a view
+        y = y[first:]
+        candidates = None if y.size > MINMAX_RATIO * n_out else np.arange(y.size)
+    else:
+        candidates = np.flatnonzero(~missing) - first
+        y = y[first:]
+    del missing
+    if candidates is None:
+        selected = minmax_indices(y, MINMAX_RATIO * n_out // 2)
+        candidates = np.unique(np.r_[0, selected, y.size - 1])
+    elif candidates.size > MINMAX_RATIO * n_out:
+        selected = minmax_indices(y[candidates], MINMAX_RATIO * n_out // 2)
+        candidates = np.unique(np.r_[candidates[0], candidates[selected], candidates[-1]])
+    # only the candidates' x are needed, e.g. converted from datetime64
+    candidates += first
+    return candidates[lttb_indices(_as_float(np.asarray(x)[candidates]), y[candidates - first], n_out)]
+
+
+def downsample_line(df, x, y, n_out):
+    """
+    Rows of a frame to plot as a line of column y against column x.
+
+    :param n_out: target number of points; None disables downsampling
+    """
+    if n_out is None or len(df) <= n_out:
+        return df
+    return df.iloc[line_indices(df[x].to_numpy(), df[y].to_numpy(), n_out)]
+
+
+def downsample_ohlc(df, n_out):
+    """
+    Re-aggregate candles into time buckets so that at most about n_out candles remain. Bucket lengths are a multiple
+    of the original bar spacing, so every candle keeps the first open, the highest high, the lowest low and the last
+    close of the bars it covers.
+
+    :param df: frame with Date, Open, High, Low, Close (and optionally Volume) columns, sorted by date
+    :param n_out: target number of candles; None disables downsampling
+    """
+    if n_out is None or len(df) <= n_out:
+        return df
+
+    dates = df["Date"].to_numpy().astype("datetime64[ns]").view(np.int64)
+    spacing = max(int(np.median(np.diff(dates))) // 10 ** 9, 1)
+    span = (dates[-1] - dates[0]) // 10 ** 9
+    seconds = spacing * int(np.ceil(span / spacing / n_out))
+
+    bars = {name: df[name].to_numpy() for name in ("Open", "High", "Low", "Close")}
+    bars["Date"] = dates
+    bars["Volume"] = df["Volume"].to_numpy(np.float64) if "Volume" in df else np.zeros(len(df))
+    candles = aggregate(bars, seconds)
+    candles["Date"] = candles["Date"].view("datetime64[ns]")
+    return pd.DataFrame(candles)
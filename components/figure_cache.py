@@ -0,0 +1,120 @@
+"""
+Cache of pre-serialized figures, served by URL with ETags.
+
+Static figures are registered with a builder and the price history they are built from. The first request for a
+dataset version builds the figure and keeps its JSON, already compressed with gzip (and brotli when installed); the
+ETag is the dataset fingerprint plus a hash of the JSON, so browsers revalidate with If-None-Match and get a 304
+until the data changes. Pages embed placeholders that assets/lazy_figures.js fills from these URLs when they scroll
+into view, so the page layout stays small.
+"""
+# Standard library imports
+import gzip
+import hashlib
+import threading
+
+# Third party imports
+import plotly.io as pio
+from dash import dcc, html
+from flask import Response, abort, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional: gzip is served instead
+    brotli = None
+
+# Local package imports
+from components.instrumentation import record
+from components.lazy_loading import import_object
+
+URL_PREFIX = "/figures/"
+PLACEHOLDER_HEIGHT = 450  # px reserved for a figure before it loads, plotly's default height
+
+_figures = {}  # name -> (builder, dataset)
+_blobs = {}  # name -> FigureBlob of the last dataset version
+_lock = threading.Lock()
+
+
+class FigureBlob:
+    """
+    JSON of a figure for one dataset version, with its compressed encodings and ETag.
+    """
+
+    def __init__(self, version, figure):
+        self.version = version
+        self.json = pio.to_json(figure, validate=False).encode()
+        self.etag = f"{version[:16]}-{hashlib.blake2b(self.json, digest_size=8).hexdigest()}"
+        self.encoded = {"gzip": gzip.compress(self.json, compresslevel=6)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(self.json, quality=5)
+
+
+def register_figure(name, builder, dataset):
+    """
+    Register a static figure.
+
+    :param name: URL-safe name, unique in the app
+    :param builder: function price_db -> figure (plotly Figure or dict), or its "module:function" path, imported
+                    on the first request so that registering figures does not import their dependencies
+    :param dataset: function returning the price history the figure is built from; its fingerprint versions the
+                    cached JSON
+    """
+    _figures[name] = builder, dataset
+
+
+def figure_blob(name):
+    """
+    Serialized figure for the current version of its dataset, built on first use.
+
+    :return: FigureBlob
+    """
+    # the analytics stack (scipy, fits) is imported by the first figure request, not at boot
+    from components.analytics_cache import fingerprint
+
+    builder, dataset = _figures[name]
+    if isinstance(builder, str):
+        builder = import_object(builder)
+    price_db = dataset()
+    version = fingerprint(price_db)
+    blob = _blobs.get(name)
+    if blob is None or blob.version != version:
+        with _lock:
+            blob = _blobs.get(name)
+            if blob is None or blob.version != version:
+                blob = _blobs[name] = FigureBlob(version, builder(price_db))
+                record(f"figures.{name}", size=len(blob.json))
+    return blob
+
+
+def _serve(name):
+    if name not in _figures:
+        abort(404)
+    blob = figure_blob(name)
+    # no-cache: browsers keep the figure but revalidate it on every visit
+    headers = {"ETag": f'"{blob.etag}"', "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(blob.etag):
+        return Response(status=304, headers=headers)
+    for encoding in ("br", "gzip"):
+        if encoding in blob.encoded and encoding in request.accept_encodings:
+            headers["Content-Encoding"] = encoding
+            return Response(blob.encoded[encoding], mimetype="application/json", headers=headers)
+    return Response(blob.json, mimetype="application/json", headers=headers)
+
+
+def register_route(server, path=URL_PREFIX):
+    """
+    Serve the registered figures at <path><name> from the Flask server of the app.
+
+    :param server: Flask server (app.server)
+    """
+    server.add_url_rule(f"{path}<name>", "figures", _serve)
+
+
+def lazy_graph(name, **graph_kwargs):
+    """
+    Placeholder for a registered figure: an empty dcc.Graph of the figure's height, which assets/lazy_figures.js
+    fills from the figure URL when it enters the viewport.
+    """
+    placeholder = {"data": [], "layout": {"height": PLACEHOLDER_HEIGHT, "xaxis": {"visible": False},
+                                          "yaxis": {"visible": False}}}
+    return html.Div(dcc.Graph(figure=placeholder, **graph_kwargs), className="lazy-figure",
+                    **{"data-src": URL_PREFIX + name})
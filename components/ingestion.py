@@ -0,0 +1,226 @@
+"""
+Streaming ingestion of minute or tick price files into multi-resolution OHLCV bars.
+
+The source file is read in chunks and never held in memory: each chunk is aggregated into 1 minute bars, which are
+cascaded into the coarser resolutions. Only the last, still open bar of every resolution is carried over to the next
+chunk. Completed bars are appended to one columnar store per resolution (database/bars/<resolution>.store).
+
+The stores only hold closed bars: a bar is closed by the first data of the next one, so the open bar of every
+resolution at the end of a file (or of a live stream) is never stored. Each resolution resumes after its own last
+stored bar, so a later ingestion or live feed carrying on from the same data completes that bar instead of appending
+it twice.
+
+Run from the repository root:
+
+    python -m components.ingestion path/to/btc_ticks.csv
+"""
+# Standard library imports
+import argparse
+import os
+import shutil
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Local package imports
+from components.price_store import append_store, open_store, read_meta
+
+BARS_ROOT = "database/bars"
+RESOLUTIONS = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+BAR_COLUMNS = ("Date", "Open", "High", "Low", "Close", "Volume")
+TIME_COLUMNS = ("Date", "Timestamp", "Time", "Datetime")
+
+
+def bars_path(resolution, root=BARS_ROOT):
+    return os.path.join(root, f"{resolution}.store")
+
+
+def resume_time(resolution, root=BARS_ROOT):
+    """End of the last bar stored at a resolution (epoch ns): the bars starting earlier have already been stored."""
+    path = bars_path(resolution, root)
+    if not os.path.isdir(path):
+        return np.iinfo(np.int64).min
+    meta = read_meta(path)
+    if meta["length"] == 0:
+        return np.iinfo(np.int64).min
+    last = open_store(path, meta)["Date"][-1].astype("datetime64[ns]").view(np.int64)
+    return int(last) + RESOLUTIONS[resolution] * 10 ** 9
+
+
+def available_resolutions(root=BARS_ROOT):
+    """
+    List the resolutions for which bars have been ingested, from the finest to the coarsest.
+    """
+    return [res for res in RESOLUTIONS if os.path.isdir(bars_path(res, root))]
+
+
+def aggregate(bars, seconds):
+    """
+    Aggregate time-sorted bars (or ticks, with open=high=low=close) into buckets of a given length.
+
+    :param bars: dict with the BAR_COLUMNS as keys, "Date" as int64 epoch nanoseconds
+    :param seconds: bucket length in seconds
+    :return: dict with the same keys, one row per non-empty bucket, labelled by the bucket start
+    """
+    bucket = np.int64(seconds * 10 ** 9)
+    keys = bars["Date"] // bucket
+    if keys.size == 0:
+        return {name: values[:0] for name, values in bars.items()}
+    if np.any(keys[1:] < keys[:-1]):
+        raise ValueError("Bars must be sorted by time")
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], keys.size] - 1
+    return {
+        "Date": keys[starts] * bucket,
+        "Open": bars["Open"][starts],
+        "High": np.maximum.reduceat(bars["High"], starts),
+        "Low": np.minimum.reduceat(bars["Low"], starts),
+        "Close": bars["Close"][ends],
+        "Volume": np.add.reduceat(bars["Volume"], starts),
+    }
+
+
+def _concat(first, second):
+    return {name: np.concatenate([first[name], second[name]]) for name in BAR_COLUMNS}
+
+
+def _split_last(bars):
+    """Split the completed bars from the last one, which may still receive data."""
+    return {name: values[:-1] for name, values in bars.items()}, {name: values[-1:] for name, values in bars.items()}
+
+
+class BarAggregator:
+    """
+    Incremental aggregation of a time-sorted stream into bars of one resolution.
+
+    The open bar is kept aside and merged with the first bar of the next update, so chunk boundaries never split a bar.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.pending = None
+
+    def update(self, bars):
+        """
+        :param bars: a chunk of finer bars or ticks, sorted by time and later than any previous chunk
+        :return: the bars completed by this chunk
+        """
+        bars = aggregate(bars, self.seconds)
+        if bars["Date"].size == 0:
+            return bars
+        if self.pending is not None:
+            bars = aggregate(_concat(self.pending, bars), self.seconds)
+        completed, self.pending = _split_last(bars)
+        return completed
+
+
+
+def _parse_time(values, time_unit):
+    if pd.api.types.is_numeric_dtype(values):
+        return pd.to_datetime(values, unit=time_unit).to_numpy().view(np.int64)
+    return pd.to_datetime(values).to_numpy().astype("datetime64[ns]").view(np.int64)
+
+
+def _chunk_to_bars(chunk, time_unit):
+    """Normalize a chunk of an OHLCV file or of a tick file (price, volume/size columns) to bar columns."""
+    time_column = next((c for c in TIME_COLUMNS if c in chunk.columns), None)
+    if time_column is None:
+        raise ValueError(f"No time column found among {list(chunk.columns)}")
+    dates = _parse_time(chunk[time_column], time_unit)
+
+    if "Close" in chunk.columns:
+        prices = {name: chunk[name].to_numpy(np.float64) for name in ("Open", "High", "Low", "Close")}
+    elif "Price" in chunk.columns:
+        price = chunk["Price"].to_numpy(np.float64)
+        prices = dict.fromkeys(("Open", "High", "Low", "Close"), price)
+    else:
+        raise ValueError("Expected either OHLC columns or a Price column")
+
+    volume_column = next((c for c in ("Volume", "Size", "Amount") if c in chunk.columns), None)
+    volume = chunk[volume_column].to_numpy(np.float64) if volume_column else np.zeros(len(chunk))
+    return {"Date": dates, **prices, "Volume": volume}
+
+
+class PriceIngestor:
+    """
+    Cascade of BarAggregator, from the finest to the coarsest resolution, appending completed bars to the stores.
+
+    Each store is only appended the bars starting after its last stored bar (see resume_time): data already ingested
+    at the finer resolutions can be fed again to complete the open bars of the coarser ones.
+    """
+
+    def __init__(self, root=BARS_ROOT, resolutions=tuple(RESOLUTIONS)):
+        seconds = [RESOLUTIONS[res] for res in resolutions]
+        if any(b % a for a, b in zip(seconds, seconds[1:])):
+            raise ValueError("Each resolution must be a multiple of the previous one")
+        self.root = root
+        self.resolutions = list(resolutions)
+        self.aggregators = [BarAggregator(s) for s in seconds]
+        self.resume = {resolution: resume_time(resolution, root) for resolution in self.resolutions}
+        self.rows = dict.fromkeys(self.resolutions, 0)
+
+    def _write(self, resolution, bars):
+        """Append the bars starting after the last stored one, and return them."""
+        first = np.searchsorted(bars["Date"], self.resume[resolution])
+        if first:
+            bars = {name: values[first:] for name, values in bars.items()}
+        if bars["Date"].size:
+            columns = {name: bars[name] for name in BAR_COLUMNS}
+            columns["Date"] = columns["Date"].view("datetime64[ns]")
+            append_store(bars_path(resolution, self.root), columns)
+            self.rows[resolution] += bars["Date"].size
+        return bars
+
+    def update(self, bars):
+        """
+        :return: dict resolution -> bars completed by this chunk and appended to the store
+        """
+        completed = {}
+        for resolution, aggregator in zip(self.resolutions, self.aggregators):
+            # the coarser resolutions aggregate every completed bar, stored before or not
+            bars = aggregator.update(bars)
+            completed[resolution] = self._write(resolution, bars)
+        return completed
+
+
+def ingest(path, root=BARS_ROOT, resolutions=tuple(RESOLUTIONS), chunksize=1_000_000, time_unit="s",
+           overwrite=True):
+    """
+    Stream a minute/tick CSV file into per-resolution bar stores.
+
+    :param path: CSV file, sorted by time, with a time column and either OHLC(V) or Price(/Size) columns
+    :param root: directory holding the bar stores
+    :param resolutions: resolutions to build, each a multiple of the previous one
+    :param chunksize: rows read and aggregated at a time; bounds the memory used
+    :param time_unit: unit of numeric timestamps (e.g. "s" or "ms")
+    :param overwrite: drop the existing stores of the requested resolutions before ingesting; otherwise the file
+                      is appended from the end of every store
+    :return: dict resolution -> number of bars written, the open bars at the end of the file excluded
+    """
+    if overwrite:
+        for resolution in resolutions:
+            shutil.rmtree(bars_path(resolution, root), ignore_errors=True)
+    os.makedirs(root, exist_ok=True)
+
+    ingestor = PriceIngestor(root, resolutions)
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        ingestor.update(_chunk_to_bars(chunk, time_unit))
+    return ingestor.rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate a minute/tick CSV file into multi-resolution bars.")
+    parser.add_argument("path")
+    parser.add_argument("--root", default=BARS_ROOT)
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    parser.add_argument("--time-unit", default="s")
+    args = parser.parse_args()
+    for res, rows in ingest(args.path, args.root, chunksize=args.chunksize, time_unit=args.time_unit).items():
+        print(f"{res}: {rows} bars")
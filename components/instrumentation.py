@@ -0,0 +1,373 @@
+"""
+Low-overhead instrumentation of the app: wall time, CPU time, allocated memory and response size of the Dash
+callbacks and of the instrumented functions, kept in fixed-bucket histograms, and the hit rates of the registered
+caches.
+
+register_route serves them as JSON at /instrumentation and in the Prometheus text format at /metrics, and measures
+every callback request. Memory is only measured while tracemalloc is tracing (INSTRUMENT_MEMORY=1 starts it), since
+tracing slows every allocation down. When INSTRUMENT_PROFILE=1, a request can also be profiled, with cProfile or
+pyinstrument when installed, by sending the X-Profile header or the profile cookie set by
+/instrumentation/profile?mode=cprofile; the last profiles are listed at /instrumentation/profiles.
+
+These routes expose the internals of the app and profiling slows requests down: they only answer, and only profile
+the requests of, the clients listed in INSTRUMENT_CLIENTS (comma-separated addresses, the loopback ones by default).
+"""
+# Standard library imports
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+
+# Third party imports
+from flask import Response, abort, g, jsonify, request
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # pyinstrument is optional: requests are profiled with cProfile instead
+    Profiler = None
+
+SECONDS_BUCKETS = tuple(0.0005 * 2 ** i for i in range(17))  # 0.5 ms to 33 s
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(11))  # 1 KiB to 1 GiB
+PROFILES_KEPT = 20
+PROFILE_LINES = 40
+CALLBACK_PATH = "/_dash-update-component"
+LOOPBACK_CLIENTS = "127.0.0.1,::1"
+
+_lock = threading.Lock()
+_timers = {}
+_caches = {}
+_profiles = deque(maxlen=PROFILES_KEPT)
+_active = threading.local()  # innermost running Measurement of every thread
+_clients = frozenset(LOOPBACK_CLIENTS.split(","))  # addresses allowed to read the instrumentation, set by register_route
+_profiling = False  # whether requests can be profiled, set by register_route
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram, as exported to Prometheus: observation counts per bucket upper bound, plus their number,
+    sum, maximum and last value. Recording an observation is a bisection over the bounds.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.last = value
+
+    def quantile(self, q):
+        """
+        :return: q-quantile of the observations, interpolated linearly inside its bucket
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "last": self.last,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+        }
+
+
+class CallStats:
+    """Histograms of the wall time, CPU time, allocated memory and response size of an instrumented call."""
+
+    def __init__(self):
+        self.wall = Histogram(SECONDS_BUCKETS)
+        self.cpu = Histogram(SECONDS_BUCKETS)
+        self.memory = Histogram(BYTES_BUCKETS)
+        self.size = Histogram(BYTES_BUCKETS)
+
+    def histograms(self):
+        return {"wall_seconds": self.wall, "cpu_seconds": self.cpu, "memory_bytes": self.memory,
+                "response_bytes": self.size}
+
+    def as_dict(self):
+        return {name: histogram.as_dict() for name, histogram in self.histograms().items() if histogram.count}
+
+
+class Measurement:
+    """
+    Wall time, CPU time of the current thread and, while tracemalloc is tracing, peak memory allocated since start.
+    The tracemalloc peak is process-wide: concurrent requests inflate each other's memory. Measurements nest within a
+    thread: an inner one resets the peak for itself, after handing the peak reached so far to the enclosing one, and
+    hands its own peak back when it stops.
+    """
+
+    def __init__(self):
+        self.memory = None
+        self.peak = 0
+        self.parent = getattr(_active, "measurement", None)
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                # the peak is reset for this measurement: the enclosing one keeps the peak reached so far
+                self.parent.peak = max(self.parent.peak, peak)
+            tracemalloc.reset_peak()
+            self.memory = current
+        _active.measurement = self
+        self.cpu = time.thread_time()
+        self.wall = time.perf_counter()
+
+    def stop(self):
+        """
+        :return: (wall seconds, CPU seconds, allocated bytes or None)
+        """
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        _active.measurement = self.parent
+        memory = None
+        if self.memory is not None and tracemalloc.is_tracing():
+            peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, peak)
+            memory = max(peak - self.memory, 0)
+        return wall, cpu, memory
+
+
+def record(name, wall=None, cpu=None, memory=None, size=None):
+    """
+    Record the measures of one call under a name; the ones left to None are not observed.
+    """
+    with _lock:
+        stats = _timers.get(name)
+        if stats is None:
+            stats = _timers[name] = CallStats()
+        for histogram, value in ((stats.wall, wall), (stats.cpu, cpu), (stats.memory, memory), (stats.size, size)):
+            if value is not None:
+                histogram.observe(value)
+
+
+def timed(name):
+    """
+    Decorator recording the wall time, CPU time and allocated memory of every call of a function under a name.
+
+    :param name: key of the timer in the snapshot
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            measurement = Measurement()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                wall, cpu, memory = measurement.stop()
+                record(name, wall, cpu, memory)
+        return wrapper
+    return decorator
+
+
+def register_cache(name, cached_function=None):
+    """
+    Report the hits and misses of a functools.lru_cache wrapped function. Without the function, return a decorator
+    to put on top of lru_cache.
+
+    :param name: key of the cache in the snapshot
+    :param cached_function: function exposing cache_info()
+    :return: the function itself
+    """
+    if cached_function is None:
+        return lambda func: register_cache(name, func)
+    _caches[name] = cached_function
+    return cached_function
+
+
+def snapshot():
+    """
+    :return: dict with the statistics of all the timers and caches
+    """
+    with _lock:
+        timers = {name: stats.as_dict() for name, stats in _timers.items()}
+    caches = {}
+    for name, cached_function in _caches.items():
+        info = cached_function.cache_info()
+        lookups = info.hits + info.misses
+        caches[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+        }
+    return {"timers": timers, "caches": caches}
+
+
+def _label(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_bound(bound):
+    return f"{bound:.6g}"
+
+
+def prometheus_metrics(prefix="dashboard"):
+    """
+    :return: the timers and caches in the Prometheus text exposition format
+    """
+    with _lock:
+        histograms = {}
+        for name, stats in sorted(_timers.items()):
+            for metric, histogram in stats.histograms().items():
+                if histogram.count:
+                    histograms.setdefault(metric, []).append(
+                        (name, histogram.bounds, list(histogram.counts), histogram.total, histogram.count))
+    lines = []
+    for metric, series in histograms.items():
+        lines.append(f"# TYPE {prefix}_{metric} histogram")
+        for name, bounds, counts, total, count in series:
+            label = f'name="{_label(name)}"'
+            cumulative = 0
+            for bound, bucket in zip(bounds + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else _format_bound(bound)
+                lines.append(f'{prefix}_{metric}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{prefix}_{metric}_sum{{{label}}} {total!r}")
+            lines.append(f"{prefix}_{metric}_count{{{label}}} {count}")
+    caches = snapshot()["caches"]
+    for metric, key, kind in (("cache_hits_total", "hits", "counter"), ("cache_misses_total", "misses", "counter"),
+                              ("cache_size", "size", "gauge")):
+        if caches:
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+        for name, info in sorted(caches.items()):
+            lines.append(f'{prefix}_{metric}{{cache="{_label(name)}"}} {info[key]}')
+    return "\n".join(lines) + "\n"
+
+
+def callback_name(output):
+    """
+    Readable name of a Dash callback from its output specification, e.g. "..a.children...b.figure@1f2e.." -> the
+    first output "a.children".
+    """
+    return output.strip(".").split("...")[0].split("@")[0]
+
+
+def _trusted_client():
+    return request.remote_addr in _clients
+
+
+def _trusted(view):
+    """Answer 403 Forbidden to the clients not listed in INSTRUMENT_CLIENTS."""
+    @wraps(view)
+    def wrapper():
+        if not _trusted_client():
+            abort(403)
+        return view()
+    return wrapper
+
+
+def _profile_mode():
+    if not _profiling or not _trusted_client():
+        return None
+    mode = request.headers.get("X-Profile") or request.cookies.get("profile")
+    if mode == "pyinstrument" and Profiler is not None:
+        return mode
+    return "cprofile" if mode else None
+
+
+def _start_request():
+    if request.path != CALLBACK_PATH:
+        return
+    body = request.get_json(silent=True) or {}
+    g.instrumented = callback_name(body.get("output", "unknown"))
+    g.profiler = None
+    mode = _profile_mode()
+    if mode == "pyinstrument":
+        g.profiler = Profiler(async_mode="disabled")
+        g.profiler.start()
+    elif mode == "cprofile":
+        g.profiler = cProfile.Profile()
+        try:
+            g.profiler.enable()
+        except ValueError:  # python >= 3.12 allows one profiler at a time: concurrent requests are not profiled
+            g.profiler = None
+    _active.measurement = None  # outermost in its thread, even if an earlier request was not finished
+    g.measurement = Measurement()
+
+
+def _finish_request(response):
+    name = g.pop("instrumented", None)
+    if name is None:
+        return response
+    wall, cpu, memory = g.measurement.stop()
+    size = response.calculate_content_length()
+    record(f"callback.{name}", wall, cpu, memory, size)
+    profiler = g.pop("profiler", None)
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        _profiles.append((name, time.time(), wall, stream.getvalue()))
+    elif profiler is not None:
+        profiler.stop()
+        _profiles.append((name, time.time(), wall, profiler.output_text()))
+    return response
+
+
+def _profiles_text():
+    blocks = [f"=== callback.{name} at {time.strftime('%H:%M:%S', time.localtime(stamp))}, {wall * 1e3:.1f} ms\n"
+              f"{text}" for name, stamp, wall, text in reversed(_profiles)]
+    return Response("\n".join(blocks) or "No profiled requests.\n", mimetype="text/plain")
+
+
+def _toggle_profile():
+    mode = request.args.get("mode", "off")
+    response = Response(f"Profiling of callback requests: {mode}\n", mimetype="text/plain")
+    if mode in ("cprofile", "pyinstrument"):
+        response.set_cookie("profile", mode, samesite="Strict")
+    else:
+        response.delete_cookie("profile")
+    return response
+
+
+def register_route(server, path="/instrumentation", metrics_path="/metrics"):
+    """
+    Serve the snapshot as JSON and the Prometheus metrics from the Flask server of the app, to the clients listed in
+    INSTRUMENT_CLIENTS, and measure every callback request. The profiling routes are only served when
+    INSTRUMENT_PROFILE=1.
+
+    :param server: Flask server (app.server)
+    :param path: URL of the JSON snapshot, the profiling toggle (<path>/profile) and the profiles (<path>/profiles)
+    :param metrics_path: URL of the Prometheus metrics
+    """
+    global _clients, _profiling
+    if os.environ.get("INSTRUMENT_MEMORY") == "1" and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _clients = frozenset(address.strip() for address in
+                         os.environ.get("INSTRUMENT_CLIENTS", LOOPBACK_CLIENTS).split(",") if address.strip())
+    _profiling = os.environ.get("INSTRUMENT_PROFILE") == "1"
+    server.add_url_rule(path, "instrumentation", _trusted(lambda: jsonify(snapshot())))
+    if _profiling:
+        server.add_url_rule(f"{path}/profile", "instrumentation_profile", _trusted(_toggle_profile))
+        server.add_url_rule(f"{path}/profiles", "instrumentation_profiles", _trusted(_profiles_text))
+    server.add_url_rule(metrics_path, "metrics",
+                        _trusted(lambda: Response(prometheus_metrics(), mimetype="text/plain; version=0.0.4")))
+    server.before_request(_start_request)
+    server.after_request(_finish_request)
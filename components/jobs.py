@@ -0,0 +1,366 @@
+"""
+Background jobs: expensive computations run in a local process pool, instead of blocking the Flask thread serving a
+Dash callback.
+
+A job is a function named by its import path ("package.module:function"), so that the worker processes only import
+what it needs, called with picklable arguments. Jobs are identified by a hash of the path, the arguments and the
+version of the data they read (e.g. a price store fingerprint): identical requests share one computation while it is
+pending or running, and its result while it is cached, for a time-to-live, until the data changes.
+A running job reports its progress, and is stopped when cancelled, through report_progress.
+
+background_callback wires a job into a page: a callback submits it when the inputs change, a dcc.Interval polls it
+and updates a progress bar until the result is written to the output, and a button cancels it. Jobs live in the
+server process that submitted them: a poll served by another process (e.g. another gunicorn worker) finds the job
+unknown there and submits it again, under the same key. A job nobody has polled for WATCH_TIMEOUT seconds (its tabs
+were closed) is cancelled.
+"""
+# Standard library imports
+import hashlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Third party imports
+import dash_bootstrap_components as dbc
+from dash import Input, Output, State, callback, dcc, html, no_update
+from dash.exceptions import PreventUpdate
+
+# Local package imports
+from components.instrumentation import record
+from components.lazy_loading import import_object
+
+JOB_WORKERS = os.cpu_count() or 1
+RESULT_TTL = 600  # seconds a finished job is kept
+MAX_JOBS = 256  # finished jobs kept, the oldest are evicted first
+POLL_INTERVAL_MS = 300
+# seconds a pending or running job is kept without polls: browsers throttle the timers of hidden tabs down to one a
+# minute, which must not cancel their jobs
+WATCH_TIMEOUT = 90
+
+# shared state of a worker process, set by the pool initializer
+_progress = None
+_cancelled = None
+_current = None  # run id of the job running in this worker process
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Raised by report_progress in a job that has been cancelled."""
+
+
+def _initialize(progress, cancelled):
+    global _progress, _cancelled
+    _progress, _cancelled = progress, cancelled
+
+
+def _run(run, path, args, kwargs):
+    global _current
+    _current = run
+    try:
+        return import_object(path)(*args, **kwargs)
+    finally:
+        _current = None
+
+
+def report_progress(fraction):
+    """
+    Report the progress of the job running in this process, in [0, 1], and stop it with JobCancelled if it has been
+    cancelled. Outside of a job (e.g. when the same function is called synchronously) it does nothing.
+    """
+    if _current is None:
+        return
+    if _current in _cancelled:
+        raise JobCancelled(_current)
+    _progress[_current] = fraction
+
+
+def job_key(path, args, kwargs, version=None):
+    """Hash identifying a job by its function path, its arguments and the version of the data it reads."""
+    payload = pickle.dumps((path, args, sorted(kwargs.items()), version), protocol=pickle.HIGHEST_PROTOCOL)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class Job:
+    """
+    A submitted job: its future, the number of clients waiting for it, when it was last polled and when it finished.
+    Its progress and cancellation are shared with the worker under its run id, unique to each submission, so that a
+    cancelled run still winding down does not stop a new run of the same job.
+    """
+
+    def __init__(self, key, path, run, future):
+        self.key = key
+        self.path = path
+        self.run = run
+        self.future = future
+        self.watchers = 1
+        self.submitted = self.polled = time.monotonic()
+        self.finished = None
+        self.abandoned = False  # cancelled for lack of polls
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        self.finished = time.monotonic()
+        # the job ran in another process: only its wall time, queueing included, is seen from here
+        record(f"job.{self.path}", wall=self.finished - self.submitted)
+
+    @property
+    def state(self):
+        future = self.future
+        if future.cancelled():
+            return "cancelled"
+        if not future.done():
+            return "running" if future.running() else "pending"
+        error = future.exception()
+        if error is None:
+            return "done"
+        return "cancelled" if isinstance(error, JobCancelled) else "failed"
+
+
+class JobManager:
+    """
+    Local process-pool job manager. The pool (spawned processes, safe next to the server threads) and the shared
+    progress and cancellation maps are started with the first job.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, ttl=RESULT_TTL, max_jobs=MAX_JOBS):
+        """
+        :param workers: processes of the pool
+        :param ttl: seconds a finished job (and its result) is kept
+        :param max_jobs: finished jobs kept at most
+        """
+        self.workers = workers
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._progress = None
+        self._cancelled = None
+        self._runs = itertools.count()
+
+    def _pool(self):
+        if self._executor is None:
+            context = multiprocessing.get_context("spawn")
+            self._sync = context.Manager()
+            self._progress, self._cancelled = self._sync.dict(), self._sync.dict()
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_initialize,
+                                                 initargs=(self._progress, self._cancelled))
+            threading.Thread(target=self._watch, name="job-watch", daemon=True).start()
+        return self._executor
+
+    def _watch(self):
+        """Cancel the jobs left without polls, until shutdown."""
+        while self._executor is not None:
+            time.sleep(WATCH_TIMEOUT / 6)
+            with self._lock:
+                now = time.monotonic()
+                abandoned = [job for job in self._jobs.values()
+                             if job.finished is None and not job.abandoned and now - job.polled > WATCH_TIMEOUT]
+                for job in abandoned:
+                    job.abandoned = True
+            for job in abandoned:
+                self._cancel(job)
+
+    def _forget(self, run):
+        """Drop the progress and cancellation of a finished run."""
+        self._progress.pop(run, None)
+        self._cancelled.pop(run, None)
+
+    def _evict(self):
+        """Drop the finished jobs past their time-to-live, then the oldest ones beyond max_jobs; under the lock."""
+        now = time.monotonic()
+        finished = [key for key, job in self._jobs.items() if job.finished is not None]
+        expired = [key for key in finished if now - self._jobs[key].finished > self.ttl]
+        expired += [key for key in finished if key not in expired][:max(len(finished) - self.max_jobs, 0)]
+        for key in expired:
+            del self._jobs[key]
+
+    def submit(self, path, *args, version=None, **kwargs):
+        """
+        Run import_object(path)(*args, **kwargs) in the pool, unless the same job is already pending, running or done.
+
+        :param version: picklable version of the data the job reads, part of its key but not passed to it
+        :return: key of the job
+        """
+        key = job_key(path, args, kwargs, version)
+        with self._lock:
+            pool = self._pool()
+            self._evict()
+            job = self._jobs.get(key)
+            if job is not None and not job.abandoned and job.state not in ("cancelled", "failed"):
+                job.watchers += 1
+                job.polled = time.monotonic()
+                self._jobs.move_to_end(key)
+                return key
+            run = f"{key}-{next(self._runs)}"
+            self._progress[run] = 0.0
+            job = self._jobs[key] = Job(key, path, run, pool.submit(_run, run, path, args, kwargs))
+            job.future.add_done_callback(lambda future: self._forget(run))
+        return key
+
+    def status(self, key):
+        """
+        Poll a job, which keeps it from being cancelled as abandoned.
+
+        :return: dict with the state ("pending", "running", "done", "failed", "cancelled" or "unknown" for evicted,
+                 abandoned or never submitted jobs), the progress in [0, 1] and the error message of a failed job
+        """
+        # under the lock of submit and _evict, so as not to see a job being replaced or evicted
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.abandoned:
+                return {"state": "unknown", "progress": 0.0, "error": None}
+            job.polled = time.monotonic()
+            state = job.state
+            return {
+                "state": state,
+                "progress": 1.0 if state == "done" else self._progress.get(job.run, 0.0),
+                "error": repr(job.future.exception()) if state == "failed" else None,
+            }
+
+    def result(self, key, timeout=None):
+        """
+        :return: result of a job, waiting for it up to timeout seconds
+        """
+        with self._lock:
+            future = self._jobs[key].future
+        return future.result(timeout)
+
+    def cancel(self, key):
+        """
+        Cancel a job: a pending one is dropped, a running one stops at its next report_progress.
+        """
+        job = self._jobs.get(key)
+        if job is not None:
+            self._cancel(job)
+
+    def _cancel(self, job):
+        if not job.future.done() and not job.future.cancel():
+            self._cancelled[job.run] = True
+
+    def release(self, key):
+        """
+        Stop waiting for a job, cancelling it if no other client is.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return
+            job.watchers = max(job.watchers - 1, 0)
+            if job.watchers:
+                return
+        self.cancel(key)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._sync.shutdown()
+            self._executor = None
+
+
+def manager():
+    """The job manager of this server process, created on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+    return _manager
+
+
+def job_controls(name):
+    """
+    Components polling a background callback, to put in the page layout next to its output: a store holding the job
+    key, the polling interval, a progress bar and a cancel button.
+    """
+    return html.Div([
+        dcc.Store(id=f"{name}-job"),
+        dcc.Interval(id=f"{name}-poll", interval=POLL_INTERVAL_MS, disabled=True),
+        dbc.Row([
+            dbc.Col(dbc.Progress(id=f"{name}-progress", value=0, striped=True, animated=True), align="center"),
+            dbc.Col(dbc.Button("Cancel", id=f"{name}-cancel", size="sm", color="secondary", outline=True),
+                    width="auto"),
+        ], className="g-2"),
+    ])
+
+
+def background_callback(name, output, inputs, path, version=None):
+    """
+    Compute an output as a background job: whenever the inputs change, the job import_object(path)(*input values) is
+    submitted (and the previous one released), then polled by the job_controls(name) components until its result is
+    written to the output. A poll finding the job unknown (submitted by another server process, evicted or abandoned)
+    submits it again. Nothing is submitted while an input is empty (None), e.g. a cleared or invalid number.
+
+    :param name: prefix of the ids of the job_controls components
+    :param output: dash Output receiving the result
+    :param inputs: list of dash Inputs, whose values are the arguments of the job
+    :param path: "package.module:function" of the job
+    :param version: function of the input values returning the version of the data the job reads, so that a result
+                    computed from older data is not served from the job cache
+    """
+    job, poll, progress, cancel = (f"{name}-{suffix}" for suffix in ("job", "poll", "progress", "cancel"))
+
+    @callback(
+        [Output(job, "data"),
+         Output(poll, "disabled"),
+         Output(progress, "value"),
+         Output(progress, "label")],
+        inputs,
+        State(job, "data"),
+    )
+    def submit_job(args):
+        return manager().submit(path, *args, version=None if version is None else version(*args))
+
+    def submit(*values):
+        *args, previous = values
+        if any(value is None for value in args):
+            raise PreventUpdate
+        key = submit_job(args)
+        if previous and previous != key:
+            manager().release(previous)
+        return key, False, 100, ""
+
+    @callback(
+        [output,
+         Output(job, "data", allow_duplicate=True),
+         Output(poll, "disabled", allow_duplicate=True),
+         Output(progress, "value", allow_duplicate=True),
+         Output(progress, "label", allow_duplicate=True)],
+        Input(poll, "n_intervals"),
+        State(job, "data"),
+        [State(value.component_id, value.component_property) for value in inputs],
+        prevent_initial_call=True,
+    )
+    def update(n_intervals, key, *args):
+        status = manager().status(key)
+        if status["state"] == "unknown":
+            if any(value is None for value in args):
+                return no_update, no_update, True, 100, ""
+            # the key changes with the version of the data, if it has moved since
+            return no_update, submit_job(args), False, 100, ""
+        if status["state"] in ("pending", "running"):
+            # without progress reports the bar stays full and animated
+            value = status["progress"] * 100 or 100
+            return no_update, no_update, False, value, f"{value:.0f}%" if status["progress"] else ""
+        if status["state"] == "done":
+            return manager().result(key), no_update, True, 0, ""
+        return no_update, no_update, True, 100, status["error"] or status["state"]
+
+    @callback(
+        [Output(poll, "disabled", allow_duplicate=True),
+         Output(progress, "label", allow_duplicate=True)],
+        Input(cancel, "n_clicks"),
+        State(job, "data"),
+        prevent_initial_call=True,
+    )
+    def cancel_job(n_clicks, key):
+        # stop polling here: a poll served by a process not running the job would submit it again
+        if key:
+            manager().release(key)
+        return True, "cancelled"
@@ -0,0 +1,28 @@
+"""
+Helpers keeping the app boot cheap: page layouts built on their first request, and objects named by import path,
+whose module is only imported when they are first needed.
+"""
+# Standard library imports
+import importlib
+from functools import lru_cache, wraps
+
+
+def memoized_layout(build):
+    """
+    Decorator turning a function building a page layout into a Dash page layout: the layout is built on the first
+    request and reused afterwards. Dash calls it with the URL query parameters, which are ignored.
+    """
+    cached = lru_cache(maxsize=None)(build)
+
+    @wraps(build)
+    def layout(**_query_parameters):
+        return cached()
+    return layout
+
+
+def import_object(path):
+    """
+    Object named by "package.module:attribute", importing its module if needed.
+    """
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
@@ -0,0 +1,319 @@
+"""
+Live price feed: an asyncio service streaming ticks from a pluggable source into the bar stores, and into the
+in-memory ring buffers the dashboard reads its live updates from.
+
+Replay a recorded tick or minute file, 60 times faster than it was recorded, from the repository root:
+
+    python -m components.live_feed path/to/btc_ticks.csv --speed 60
+
+The bar stores have a single writer: the feed holds an exclusive lock file in the stores directory while it runs.
+When the BTC_LIVE_SOURCE environment variable names a recorded file, the app starts the same service on its first
+live update, in the one server process that gets the lock (BTC_LIVE_SPEED sets the replay speed, 1 by default); the
+other processes only read the stores, and take over if the writer exits. With several server processes, prefer
+running the command above and BTC_LIVE_SOURCE=external: every server process then only reads the stores.
+"""
+# Standard library imports
+import argparse
+import asyncio
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, a single server process is assumed
+    fcntl = None
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Local package imports
+from components.ingestion import BARS_ROOT, BAR_COLUMNS, RESOLUTIONS, PriceIngestor, _chunk_to_bars, bars_path
+from components.price_store import open_store, read_meta
+from components.ring_buffer import RingBuffer
+
+WINDOW_BARS = 10_000  # completed bars kept in memory per resolution
+BATCH_SECONDS = 0.1  # wall time covered by one replayed batch of ticks
+BAR_DTYPES = {name: np.int64 if name == "Date" else np.float64 for name in BAR_COLUMNS}
+LOCK_FILE = "live-feed.lock"
+LOCK_RETRY_SECONDS = 10.0  # how often a reading process checks whether the writer has exited
+EXTERNAL = "external"  # BTC_LIVE_SOURCE value of a feed run by another process, e.g. this module's command
+
+_feed = None
+_feed_lock = threading.Lock()
+_lock_tried = float("-inf")  # monotonic time of the last attempt to take the writer lock
+
+
+class PriceSource(ABC):
+    """
+    Asynchronous source of ticks (or bars) for the live feed.
+    """
+
+    @abstractmethod
+    def stream(self):
+        """
+        :return: async iterator of time-sorted chunks: dicts with the BAR_COLUMNS as keys, "Date" as int64 epoch
+                 nanoseconds (ticks have open=high=low=close)
+        """
+
+
+class ReplaySource(PriceSource):
+    """
+    Replays a recorded tick or minute CSV file (see components.ingestion for the accepted columns), reading it in
+    chunks and releasing the ticks in batches at the pace they were recorded, sped up by a factor.
+    """
+
+    def __init__(self, path, speed=1.0, chunksize=100_000, time_unit="s"):
+        """
+        :param path: CSV file, sorted by time
+        :param speed: replay speed factor; None or 0 replays as fast as possible
+        :param chunksize: rows read at a time
+        :param time_unit: unit of numeric timestamps (e.g. "s" or "ms")
+        """
+        self.path = path
+        self.speed = speed
+        self.chunksize = chunksize
+        self.time_unit = time_unit
+
+    async def stream(self):
+        reader = pd.read_csv(self.path, chunksize=self.chunksize)
+        origin = None  # event time and wall time of the first tick
+        while True:
+            # parsing runs in a thread, so the event loop keeps serving while the next chunk is read
+            chunk = await asyncio.to_thread(next, reader, None)
+            if chunk is None:
+                return
+            ticks = _chunk_to_bars(chunk, self.time_unit)
+            if not self.speed:
+                yield ticks
+                continue
+            if origin is None:
+                origin = ticks["Date"][0], time.monotonic()
+
+            # seconds after the start at which every tick is due, and the batch each one is released in
+            due = (ticks["Date"] - origin[0]) / (1e9 * self.speed)
+            batch = (due // BATCH_SECONDS).astype(np.int64)
+            bounds = np.flatnonzero(np.r_[True, batch[1:] != batch[:-1], True])
+            for first, end in zip(bounds[:-1], bounds[1:]):
+                delay = origin[1] + due[end - 1] - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield {name: values[first:end] for name, values in ticks.items()}
+
+
+def acquire_writer_lock(root=BARS_ROOT):
+    """
+    Take the exclusive lock of the process writing to the bar stores, without waiting. The lock is released when the
+    returned file is closed, or when the process exits.
+
+    :return: the open lock file, None if another process holds the lock
+    """
+    os.makedirs(root, exist_ok=True)
+    lock_file = open(os.path.join(root, LOCK_FILE), "a")
+    if fcntl is None:
+        return lock_file
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+class StoreBars:
+    """
+    Bars of one resolution read from their store, with the since() of the RingBuffer the feed fills.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _columns(self):
+        if not os.path.isdir(self.path):
+            return None
+        meta = read_meta(self.path)
+        return open_store(self.path, meta) if meta["length"] else None
+
+    def since(self, key, value):
+        """
+        Bars whose key column is strictly greater than a value, read from the store whatever their age.
+
+        :return: dict column name -> array, "Date" as int64 epoch nanoseconds
+        """
+        columns = self._columns()
+        if columns is None:
+            return {name: np.empty(0, dtype) for name, dtype in BAR_DTYPES.items()}
+        keys = columns[key]
+        if key == "Date":
+            keys = keys.view(np.int64)
+        first = int(np.searchsorted(keys, value, side="right"))
+        bars = {name: np.array(values[first:]) for name, values in columns.items()}
+        bars["Date"] = bars["Date"].view(np.int64)
+        return bars
+
+    def last(self):
+        """
+        :return: dict column name -> value of the last stored bar, None if there is none
+        """
+        columns = self._columns()
+        return None if columns is None else {name: values[-1] for name, values in columns.items()}
+
+
+class StoreFeed:
+    """
+    Read-only live feed of the server processes that do not write the bar stores: the bars and the spot price come
+    from the stores, as appended by the writing process.
+    """
+
+    def __init__(self, root=BARS_ROOT, resolutions=tuple(RESOLUTIONS)):
+        self.resolutions = resolutions
+        self.bars = {resolution: StoreBars(bars_path(resolution, root)) for resolution in resolutions}
+
+    def spot(self):
+        """
+        :return: (close of the last stored bar of the finest resolution, close of the last bar of the coarsest one),
+                 either None if not available yet
+        """
+        price, reference = (self.bars[resolution].last() for resolution in (self.resolutions[0],
+                                                                           self.resolutions[-1]))
+        return (None if price is None else float(price["Close"]),
+                None if reference is None else float(reference["Close"]))
+
+
+class LiveFeed:
+    """
+    Asyncio service consuming a PriceSource.
+
+    Every chunk of ticks goes through a PriceIngestor, which appends the completed bars of every resolution to the
+    price stores; the same bars are pushed into one RingBuffer per resolution, so the memory used is bounded whatever
+    the length of the stream. The bars still open are never stored, when the stream ends or the feed is stopped or
+    killed: a restarted feed replays the ticks from the start of the earliest open bar and completes them, and every
+    store is only appended the bars after its last one (see PriceIngestor).
+    """
+
+    def __init__(self, source: PriceSource, root=BARS_ROOT, resolutions=tuple(RESOLUTIONS), window=WINDOW_BARS):
+        """
+        :param source: PriceSource to consume
+        :param root: directory holding the bar stores
+        :param resolutions: resolutions to build, each a multiple of the previous one
+        :param window: completed bars kept in memory per resolution
+        """
+        os.makedirs(root, exist_ok=True)
+        self.source = source
+        self.ingestor = PriceIngestor(root, resolutions)
+        self.bars = {resolution: RingBuffer(window, BAR_DTYPES) for resolution in resolutions}
+        # the coarsest open bar starts the earliest: the ticks before it are in every store already
+        self.resume = min(self.ingestor.resume.values())
+        self.ticks = 0
+        self.last_tick = None
+        self.lock_file = None  # writer lock (see acquire_writer_lock), held as long as the feed object lives
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def process(self, ticks):
+        """
+        Ingest a chunk of time-sorted ticks.
+        """
+        first = np.searchsorted(ticks["Date"], self.resume)
+        if first == ticks["Date"].size:
+            return
+        ticks = {name: values[first:] for name, values in ticks.items()}
+        self.ticks += ticks["Date"].size
+        self.last_tick = {name: values[-1] for name, values in ticks.items()}
+        self._push(self.ingestor.update(ticks))
+
+    def _push(self, completed):
+        for resolution, bars in completed.items():
+            if bars["Date"].size:
+                self.bars[resolution].extend(bars)
+
+    async def run(self):
+        async for ticks in self.source.stream():
+            self.process(ticks)
+            if self._stopped.is_set():
+                break
+
+    def start(self):
+        """
+        Run the service in a background thread with its own event loop.
+        """
+        self._thread = threading.Thread(target=asyncio.run, args=(self.run(),), name="live-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def spot(self):
+        """
+        :return: (last traded price, close of the last completed bar of the coarsest resolution), either None if
+                 not available yet
+        """
+        price = None if self.last_tick is None else float(self.last_tick["Close"])
+        reference = self.bars[self.ingestor.resolutions[-1]].last()
+        return price, None if reference is None else float(reference["Close"])
+
+
+def configured():
+    """Whether the app has a live source, i.e. whether BTC_LIVE_SOURCE is set."""
+    return bool(os.environ.get("BTC_LIVE_SOURCE"))
+
+
+def current_feed():
+    """
+    The live feed of this server process. The process that gets the writer lock starts the feed on first use from
+    the BTC_LIVE_SOURCE replay file; the others read the stores, and try the lock again on later calls, so one of
+    them takes over if the writer exits. Starting it lazily from a request keeps the reloader process of the debug
+    server from running a second feed.
+
+    :return: the LiveFeed or a StoreFeed, None if no source is configured
+    """
+    global _feed, _lock_tried
+    if not configured():
+        return None
+    source = os.environ["BTC_LIVE_SOURCE"]
+    with _feed_lock:
+        if source == EXTERNAL:
+            _feed = _feed or StoreFeed()
+        elif not isinstance(_feed, LiveFeed) and time.monotonic() - _lock_tried >= LOCK_RETRY_SECONDS:
+            _lock_tried = time.monotonic()
+            lock_file = acquire_writer_lock()
+            if lock_file is None:
+                _feed = _feed or StoreFeed()
+            else:
+                speed = float(os.environ.get("BTC_LIVE_SPEED", 1.0))
+                _feed = LiveFeed(ReplaySource(source, speed))
+                _feed.lock_file = lock_file
+                _feed.start()
+    return _feed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded tick/minute CSV file into the bar stores.")
+    parser.add_argument("path")
+    parser.add_argument("--root", default=BARS_ROOT)
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor, 0 for as fast as possible")
+    parser.add_argument("--time-unit", default="s")
+    args = parser.parse_args()
+
+    lock_file = acquire_writer_lock(args.root)
+    if lock_file is None:
+        parser.exit(1, f"Another process is writing to the bar stores of {args.root}\n")
+    feed = LiveFeed(ReplaySource(args.path, args.speed, time_unit=args.time_unit), args.root)
+    feed.lock_file = lock_file
+    feed.start()
+    try:
+        while feed.running:
+            time.sleep(1)
+            price, _ = feed.spot()
+            print(f"{feed.ticks} ticks, last price {price}")
+    except KeyboardInterrupt:
+        feed.stop()
@@ -0,0 +1,423 @@
+"""
+Online statistics of log returns, updated bar by bar.
+
+Every estimator keeps a small state that a new bar updates in O(1), instead of recomputing over the whole history.
+The states are plain picklable objects, so they can be checkpointed to disk and resumed when new bars arrive. Each
+estimator also has an update_many method, vectorized with numpy, to build the state from a long history at once.
+"""
+# Third party imports
+import numpy as np
+from scipy.signal import lfilter
+
+# Local package imports
+from components.ring_buffer import RingBuffer
+
+EWMA_DECAY = 0.94  # RiskMetrics decay factor for daily returns
+HISTOGRAM_BINS = 100
+MIN_HALF_RANGE = 1e-4  # half width of the first histogram range around a null first return
+
+
+def _valid(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values[~np.isnan(values)]
+
+
+class RunningMoments:
+    """
+    Count, mean and central moments up to the fourth of a stream, with Welford's update extended to the higher moments
+    (Terriberry). Batches are merged with the pairwise formulas of Chan and Pébay, which are exact and stable.
+
+    NaN values are skipped.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sums of the powers of the deviations from the mean
+        self.m3 = 0.0
+        self.m4 = 0.0
+
+    def update(self, x):
+        """
+        Add one value in O(1).
+        """
+        if np.isnan(x):
+            return
+        n1 = self.count
+        self.count = n = n1 + 1
+        delta = x - self.mean
+        delta_n = delta / n
+        delta_n2 = delta_n * delta_n
+        term = delta * delta_n * n1
+        self.mean += delta_n
+        self.m4 += term * delta_n2 * (n * n - 3 * n + 3) + 6 * delta_n2 * self.m2 - 4 * delta_n * self.m3
+        self.m3 += term * delta_n * (n - 2) - 3 * delta_n * self.m2
+        self.m2 += term
+
+    def update_many(self, values):
+        """
+        Add a batch of values: its moments are computed with numpy and merged into the state.
+        """
+        values = _valid(values)
+        if values.size == 0:
+            return
+        batch = RunningMoments()
+        batch.count = values.size
+        batch.mean = values.mean()
+        deviations = values - batch.mean
+        squares = deviations * deviations
+        batch.m2 = squares.sum()
+        batch.m3 = squares @ deviations
+        batch.m4 = squares @ squares
+        self.merge(batch)
+
+    def merge(self, other):
+        """
+        Merge the moments of another stream into this one.
+        """
+        na, nb = self.count, other.count
+        if nb == 0:
+            return
+        if na == 0:
+            self.count, self.mean, self.m2, self.m3, self.m4 = nb, other.mean, other.m2, other.m3, other.m4
+            return
+        n = na + nb
+        delta = other.mean - self.mean
+        delta2 = delta * delta
+        m4 = (self.m4 + other.m4 + delta2 * delta2 * na * nb * (na * na - na * nb + nb * nb) / n ** 3
+              + 6 * delta2 * (na * na * other.m2 + nb * nb * self.m2) / n ** 2
+              + 4 * delta * (na * other.m3 - nb * self.m3) / n)
+        m3 = (self.m3 + other.m3 + delta2 * delta * na * nb * (na - nb) / n ** 2
+              + 3 * delta * (na * other.m2 - nb * self.m2) / n)
+        self.m2 += other.m2 + delta2 * na * nb / n
+        self.m3, self.m4 = m3, m4
+        self.mean += delta * nb / n
+        self.count = n
+
+    @property
+    def variance(self):
+        """Population variance (ddof=0)."""
+        return self.m2 / self.count if self.count else np.nan
+
+    @property
+    def sample_variance(self):
+        """Sample variance (ddof=1)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def sample_std(self):
+        return np.sqrt(self.sample_variance)
+
+    @property
+    def skewness(self):
+        """Biased sample skewness, as scipy.stats.skew."""
+        return np.sqrt(self.count) * self.m3 / self.m2 ** 1.5 if self.m2 else np.nan
+
+    @property
+    def kurtosis(self):
+        """Biased excess kurtosis, as scipy.stats.kurtosis."""
+        return self.count * self.m4 / (self.m2 * self.m2) - 3 if self.m2 else np.nan
+
+
+class EWMAVolatility:
+    """
+    Exponentially weighted moving average of the squared returns (RiskMetrics):
+    var_t = decay*var_(t-1) + (1-decay)*r_t**2, started from the first squared return. NaN returns are skipped.
+    """
+
+    def __init__(self, decay=EWMA_DECAY):
+        """
+        :param decay: weight of the previous variance, in (0, 1)
+        """
+        self.decay = decay
+        self.variance = np.nan
+        self.count = 0
+
+    def update(self, log_return):
+        """
+        Add one return in O(1).
+        """
+        if np.isnan(log_return):
+            return
+        square = log_return * log_return
+        self.variance = square if self.count == 0 else self.decay * self.variance + (1 - self.decay) * square
+        self.count += 1
+
+    def update_many(self, log_returns):
+        """
+        Add a batch of returns, running the recursion as a linear filter.
+
+        :return: the variance after each return, aligned with the input (NaN where the return is NaN)
+        """
+        log_returns = np.asarray(log_returns, dtype=np.float64)
+        valid = ~np.isnan(log_returns)
+        squares = log_returns[valid] ** 2
+        variances = np.full(log_returns.size, np.nan)
+        if squares.size == 0:
+            return variances
+        # y_t = decay*y_(t-1) + (1-decay)*x_t, with the previous variance as initial condition
+        coefficients = [1 - self.decay], [1, -self.decay]
+        if self.count == 0:
+            rest, _ = lfilter(*coefficients, squares[1:], zi=[self.decay * squares[0]])
+            filtered = np.r_[squares[0], rest]
+        else:
+            filtered, _ = lfilter(*coefficients, squares, zi=[self.decay * self.variance])
+        self.variance = filtered[-1]
+        self.count += squares.size
+        variances[valid] = filtered
+        return variances
+
+    def volatility(self, annualization=1.0):
+        return np.sqrt(self.variance) * annualization
+
+
+class RollingWindow:
+    """
+    Mean and sample standard deviation of the last `window` returns, held in a RingBuffer.
+
+    Running sums of the returns (shifted by the first one, against cancellation) and of their squares are updated
+    with the value entering and the one leaving the window; they are recomputed exactly from the buffer once every
+    `window` updates, so rounding errors cannot accumulate, at an amortized O(1) cost.
+    """
+
+    def __init__(self, window, min_periods=None):
+        """
+        :param window: window length in bars
+        :param min_periods: minimum number of valid returns for a statistic, NaN below (default: window)
+        """
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.buffer = RingBuffer(window, {"value": np.float64, "valid": np.bool_})
+        self.shift = None
+        self.count = 0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self._updates = 0
+
+    def _recompute(self):
+        rows = self.buffer.to_arrays()
+        centered = rows["value"][rows["valid"]] - self.shift
+        self.count = centered.size
+        self.sum = centered.sum()
+        self.sum_sq = centered @ centered
+        self._updates = 0
+
+    def update(self, log_return):
+        """
+        Add the return of one bar (NaN counts as a bar without return) in O(1) amortized.
+        """
+        valid = not np.isnan(log_return)
+        if valid and self.shift is None:
+            self.shift = log_return
+        if len(self.buffer) == self.window:
+            oldest = self.buffer.first()
+            if oldest["valid"]:
+                x = oldest["value"] - self.shift
+                self.count -= 1
+                self.sum -= x
+                self.sum_sq -= x * x
+        self.buffer.extend({"value": np.array([log_return if valid else 0.0]), "valid": np.array([valid])})
+        if valid:
+            x = log_return - self.shift
+            self.count += 1
+            self.sum += x
+            self.sum_sq += x * x
+        self._updates += 1
+        if self._updates >= self.window:
+            self._recompute()
+
+    def update_many(self, log_returns):
+        """
+        Add the returns of several bars: only the last `window` ones are kept, and the sums are recomputed.
+        """
+        log_returns = np.asarray(log_returns, dtype=np.float64)[-self.window:]
+        if log_returns.size == 0:
+            return
+        valid = ~np.isnan(log_returns)
+        if self.shift is None and valid.any():
+            self.shift = log_returns[valid][0]
+        self.buffer.extend({"value": np.where(valid, log_returns, 0.0), "valid": valid})
+        if self.shift is not None:
+            self._recompute()
+
+    @property
+    def mean(self):
+        return self.shift + self.sum / self.count if self.count >= max(self.min_periods, 1) else np.nan
+
+    @property
+    def sample_std(self):
+        if self.count < max(self.min_periods, 2):
+            return np.nan
+        variance = (self.sum_sq - self.sum * self.sum / self.count) / (self.count - 1)
+        return np.sqrt(max(variance, 0.0))
+
+    def volatility(self, annualization=1.0):
+        return self.sample_std * annualization
+
+
+class FixedBinHistogram:
+    """
+    Counts of a stream over a fixed number of equally spaced bins: a value is binned in O(1) by its offset from the
+    lower edge, so the counts (and the figure built from them) have a constant size whatever the length of the stream.
+
+    A value outside the edges widens the range: the bins are merged by pairs and the range doubled away from the
+    opposite edge, until the value falls inside, so every value stays counted in the bins. NaN values are skipped.
+    """
+
+    def __init__(self, low, high, bins):
+        """
+        :param low: lower edge of the first bin
+        :param high: upper edge of the last bin, included in it as in np.histogram
+        :param bins: number of bins
+        """
+        if high <= low:
+            low, high = low - 0.5, low + 0.5  # degenerate range, as np.histogram
+        self.low = float(low)
+        self.high = float(high)
+        self.width = (self.high - self.low) / bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    @classmethod
+    def from_values(cls, values, bins):
+        """
+        Histogram over the range of a batch of values (as np.histogram), filled with them.
+        """
+        values = _valid(values)
+        histogram = cls(values.min(), values.max(), bins) if values.size else cls(0.0, 0.0, bins)
+        histogram.update_many(values)
+        return histogram
+
+    @property
+    def edges(self):
+        return np.linspace(self.low, self.high, self.counts.size + 1)
+
+    @property
+    def centers(self):
+        return self.low + (np.arange(self.counts.size) + 0.5) * self.width
+
+    @property
+    def count(self):
+        """Values counted."""
+        return int(self.counts.sum())
+
+    @property
+    def density(self):
+        """Counts normalized by the width of the bins and by the values counted, integrating to 1."""
+        return self.counts / (max(self.count, 1) * self.width)
+
+    def _double(self, upward):
+        """Merge the bins by pairs, from the edge kept, and double the range beyond the other edge."""
+        bins = self.counts.size
+        counts = self.counts if upward else self.counts[::-1]
+        merged = np.zeros(bins, dtype=np.int64)
+        merged[:(bins + 1) // 2] = np.add.reduceat(counts, np.arange(0, bins, 2))
+        self.counts = merged if upward else merged[::-1].copy()
+        if upward:
+            self.high = self.low + 2 * (self.high - self.low)
+        else:
+            self.low = self.high - 2 * (self.high - self.low)
+        self.width = (self.high - self.low) / bins
+
+    def _cover(self, low, high):
+        """Widen the range until it covers [low, high]."""
+        while low < self.low:
+            self._double(upward=False)
+        while high > self.high:
+            self._double(upward=True)
+
+    def update(self, x):
+        """
+        Add one value in O(1), amortized over the widenings of the range.
+        """
+        if np.isnan(x):
+            return
+        self._cover(x, x)
+        self.counts[min(int((x - self.low) / self.width), self.counts.size - 1)] += 1
+
+    def update_many(self, values):
+        """
+        Add a batch of values.
+        """
+        values = _valid(values)
+        if values.size == 0:
+            return
+        self._cover(values.min(), values.max())
+        index = np.minimum(((values - self.low) / self.width).astype(np.int64), self.counts.size - 1)
+        self.counts += np.bincount(index, minlength=self.counts.size)
+
+
+class OnlineReturnStats:
+    """
+    Online state of the log returns of a price series: running moments, EWMA volatility, rolling windows and a
+    histogram, plus the last bar consumed (date and close), from which the next log return is computed and a grown
+    series is resumed.
+
+    The histogram bins span the range of the first returns added, and are widened by later returns outside of it (see
+    FixedBinHistogram). A first return added alone gets a range as wide as itself on both sides.
+    """
+
+    def __init__(self, windows=(), decay=EWMA_DECAY, bins=HISTOGRAM_BINS):
+        """
+        :param windows: lengths (in bars) of the rolling windows to keep
+        :param decay: decay factor of the EWMA volatility
+        :param bins: number of bins of the histogram
+        """
+        self.moments = RunningMoments()
+        self.ewma = EWMAVolatility(decay)
+        self.windows = {window: RollingWindow(window) for window in windows}
+        self.bins = bins
+        self.histogram = None
+        self.bars = 0
+        self.last_date = None
+        self.last_close = None
+
+    def update(self, close, date=None):
+        """
+        Add one bar in O(1).
+
+        :param close: close price of the bar
+        :param date: date of the bar (epoch ns), recorded to recognize the series when resuming
+        """
+        log_return = np.nan if self.last_close is None else np.log(close / self.last_close)
+        self.moments.update(log_return)
+        self.ewma.update(log_return)
+        for window in self.windows.values():
+            window.update(log_return)
+        if self.histogram is None and not np.isnan(log_return):
+            # not np.histogram's unit range around a single value, which would hold every return in a few bins
+            half = max(abs(log_return), MIN_HALF_RANGE)
+            self.histogram = FixedBinHistogram(log_return - half, log_return + half, self.bins)
+        if self.histogram is not None:
+            self.histogram.update(log_return)
+        self.bars += 1
+        self.last_close = close
+        self.last_date = date
+
+    def update_many(self, close, dates=None):
+        """
+        Add a batch of bars.
+
+        :param close: 1D array of close prices
+        :param dates: 1D array of dates (epoch ns), aligned with close
+        """
+        close = np.asarray(close, dtype=np.float64)
+        if close.size == 0:
+            return
+        log_close = np.log(close)
+        previous = np.nan if self.last_close is None else np.log(self.last_close)
+        log_returns = np.diff(log_close, prepend=previous)
+        self.moments.update_many(log_returns)
+        self.ewma.update_many(log_returns)
+        for window in self.windows.values():
+            window.update_many(log_returns)
+        if self.histogram is None and np.isfinite(log_returns).any():
+            self.histogram = FixedBinHistogram.from_values(log_returns, self.bins)
+        elif self.histogram is not None:
+            self.histogram.update_many(log_returns)
+        self.bars += close.size
+        self.last_close = close[-1]
+        self.last_date = None if dates is None else int(dates[-1])
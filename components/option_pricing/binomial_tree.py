@@ -0,0 +1,166 @@
+# Third party imports
+import numpy as np
+from scipy.special import gammaln
+
+# Local package imports
+from components.option_pricing.base import OptionPriceModel, OptionType
+from components.option_pricing.black_scholes import BlackScholesModel
+
+
+class BinomialTreeModel(OptionPriceModel):
+    """
+    Class implementing European and American option pricing on a recombining lattice.
+
+    Lattices:
+    - binomial: Cox-Ross-Rubinstein tree, u = exp(sigma*sqrt(dt)), d = 1/u;
+    - trinomial: Boyle tree, u = exp(sigma*sqrt(2*dt)), with a middle (unchanged price) branch.
+
+    Backward induction runs in place over a single array holding one time slice of option values per strike, so a
+    tree with N steps uses O(N) memory, and a whole strike ladder is priced in one pass (one row per strike).
+    Richardson extrapolation 2*P(N) - P(N/2) cancels the leading O(1/N) discretization error. It is combined with
+    Black-Scholes smoothing of the last step (Broadie-Detemple): the payoff kink otherwise makes the error oscillate
+    with the strike position relative to the nodes, and the extrapolation would amplify it.
+    """
+
+    def __init__(self, spot_price: float, strike_price, days_to_maturity: int = 100, risk_free_rate: float = 0.001,
+                 volatility: float = 0.5, number_of_time_steps: int = 1000, american: bool = False,
+                 lattice: str = "binomial", richardson: bool = False):
+        """
+        Initializes variables used in the lattice.
+
+        :param spot_price: current underlying spot price
+        :param strike_price: strike price, or 1D array of strike prices priced together
+        :param days_to_maturity: time periods (days) to maturity/exercise date
+        :param risk_free_rate: annual returns on risk-free assets (assumed constant until maturity)
+        :param volatility: annual volatility of the underlying asset (assumed constant until maturity)
+        :param number_of_time_steps: number of steps of the lattice
+        :param american: allow early exercise at every node
+        :param lattice: "binomial" or "trinomial"
+        :param richardson: smooth the last step and extrapolate from N and N/2 steps
+        """
+        if lattice not in ("binomial", "trinomial"):
+            raise ValueError("lattice must be 'binomial' or 'trinomial'")
+        self.S = spot_price
+        self.X = strike_price
+        self.T = days_to_maturity / 365
+        self.r = risk_free_rate
+        self.sigma = volatility
+        self.number_of_time_steps = number_of_time_steps
+        self.american = american
+        self.lattice = lattice
+        self.richardson = richardson
+
+    def _call_option_price(self):
+        """
+        Compute the lattice price of call options.
+        """
+        return self._price(OptionType.CALL_OPTION)
+
+    def _put_option_price(self):
+        """
+        Compute the lattice price of put options.
+        """
+        return self._price(OptionType.PUT_OPTION)
+
+    def _price(self, option_type):
+        if self.T <= 0:
+            # expired: the payoff, as in black_scholes (the lattice would have null time steps)
+            X = np.asarray(self.X, dtype=np.float64)
+            payoff = self.S - X if option_type is OptionType.CALL_OPTION else X - self.S
+            return np.maximum(payoff, 0.0) if np.ndim(self.X) else float(max(payoff, 0.0))
+        price = self._lattice_price(option_type, self.number_of_time_steps, smooth=self.richardson)
+        if self.richardson:
+            price = 2 * price - self._lattice_price(option_type, max(self.number_of_time_steps // 2, 2), smooth=True)
+        return price if np.ndim(self.X) else price.item()
+
+    def _lattice(self, steps):
+        """
+        :return: the branch probabilities (from the lowest to the highest child), the one-step discount factor, the
+                 up factor u and the node index shift of the highest branch; node j of slice i has price
+                 S*u**(2j - i) on the binomial lattice and S*u**(j - i) on the trinomial one
+        """
+        dt = self.T / steps
+        discount = np.exp(-self.r * dt)
+        if self.lattice == "binomial":
+            u = np.exp(self.sigma * np.sqrt(dt))
+            p_up = (np.exp(self.r * dt) - 1 / u) / (u - 1 / u)
+            return [1 - p_up, p_up], discount, u, 1
+        u = np.exp(self.sigma * np.sqrt(2 * dt))
+        a, b = np.exp(self.sigma * np.sqrt(dt / 2)), np.exp(-self.sigma * np.sqrt(dt / 2))
+        p_up = ((np.exp(self.r * dt / 2) - b) / (a - b)) ** 2
+        p_down = ((a - np.exp(self.r * dt / 2)) / (a - b)) ** 2
+        return [p_down, 1 - p_up - p_down, p_up], discount, u, 2
+
+    def _lattice_price(self, option_type, steps, smooth=False):
+        probabilities, discount, u, moves = self._lattice(steps)
+        # prices of all the nodes of the lattice, from the lowest to the highest: S*u**k for k in [-steps, steps]
+        powers = self.S * u ** np.arange(-steps, steps + 1, dtype=np.float64)
+        step = 2 if moves == 1 else 1
+
+        def node_prices(i):
+            return powers[steps - i:steps + i + 1:step, np.newaxis]
+
+        strikes = np.atleast_1d(np.asarray(self.X, dtype=np.float64))[np.newaxis, :]
+        sign = 1.0 if option_type is OptionType.CALL_OPTION else -1.0
+        def exercise_value(i):
+            return sign * (node_prices(i) - strikes)
+
+        if smooth:
+            # the values one step before maturity are the European prices over the last step
+            leaf = steps - 1
+            values = BlackScholesModel(node_prices(leaf), strikes, 365 * self.T / steps, self.r,
+                                       self.sigma).option_price(option_type)
+            if self.american:
+                values = np.maximum(values, exercise_value(leaf))
+        else:
+            leaf = steps
+            values = np.maximum(exercise_value(leaf), 0.0)
+
+        if not self.american:
+            weights = self._terminal_probabilities(probabilities, moves, leaf)
+            return discount ** leaf * (weights @ values)
+        return self._backward_induction(values, [p * discount for p in probabilities], moves, leaf, exercise_value)
+
+    @staticmethod
+    def _terminal_probabilities(probabilities, moves, steps):
+        """
+        Risk-neutral probabilities of the nodes after a number of steps. They do not depend on the strike, so European prices of a
+        whole strike ladder are a single matrix-vector product.
+        """
+        if moves == 1:
+            # binomial pmf in log space, to stay finite for thousands of steps
+            j = np.arange(steps + 1)
+            log_pmf = gammaln(steps + 1) - gammaln(j + 1) - gammaln(steps - j + 1)
+            log_pmf += j * np.log(probabilities[1]) + (steps - j) * np.log(probabilities[0])
+            return np.exp(log_pmf)
+        weights, spare, term = np.zeros(2 * steps + 1), np.zeros(2 * steps + 1), np.empty(2 * steps + 1)
+        weights[0] = 1.0
+        for i in range(steps):
+            n = 2 * i + 1
+            # child j of slice i + 1 collects the down, middle and up branches of parents j, j - 1 and j - 2
+            np.multiply(weights[:n], probabilities[0], out=spare[:n])
+            spare[n:n + 2] = 0.0
+            spare[1:n + 1] += np.multiply(weights[:n], probabilities[1], out=term[:n])
+            spare[2:n + 2] += np.multiply(weights[:n], probabilities[2], out=term[:n])
+            weights, spare = spare, weights
+        return weights
+
+    @staticmethod
+    def _backward_induction(values, probabilities, moves, steps, exercise_value):
+        """
+        American backward induction over a single (nodes, strikes) array: every slice is written in place over the
+        lowest children, so memory stays O(N) per strike. Strikes are the contiguous axis, so each vectorized step
+        processes the whole ladder at once.
+        """
+        accumulator, term = np.empty_like(values), np.empty_like(values)
+        for i in range(steps - 1, -1, -1):
+            n = moves * i + 1
+            acc = accumulator[:n]
+            np.multiply(values[moves:moves + n], probabilities[moves], out=acc)
+            for k in range(1, moves):
+                acc += np.multiply(values[k:k + n], probabilities[k], out=term[:n])
+            new = values[:n]
+            new *= probabilities[0]
+            new += acc
+            np.maximum(new, exercise_value(i), out=new)
+        return values[0]
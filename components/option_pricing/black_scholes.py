@@ -1,6 +1,9 @@
+# Standard library imports
+from dataclasses import dataclass
+
 # Third party imports
 import numpy as np
-from scipy.stats import norm
+from scipy.special import ndtr
 
 # Local package imports
 from components.option_pricing.base import OptionPriceModel, OptionType
@@ -37,6 +40,13 @@ class BlackScholesModel(OptionPriceModel):
         self.r = risk_free_rate
         self.sigma = volatility
 
+    def _d1_d2(self):
+        """
+        Compute d1 and d2, element-wise. Expired elements (T == 0) get +/-inf, so that N(d1) and N(d2) are the
+        exercise indicators.
+        """
+        return _d1_d2(self.S, self.X, self.T, self.r, self.sigma)
+
     def _call_option_price(self):
         """
         Compute price for Black&Scholes Call option.
@@ -44,13 +54,8 @@ class BlackScholesModel(OptionPriceModel):
          - N(d1): Delta edging -> fraction of the stock to hold for risk neutralization
          - N(d2): probability of option exercise
         """
-        if self.T == 0:
-            return np.maximum(self.X-self.S, 0)
-
-        d1 = (np.log(self.S / self.X) + (self.r + 0.5 * self.sigma ** 2) * self.T) / (self.sigma * np.sqrt(self.T))
-        d2 = (np.log(self.S / self.X) + (self.r - 0.5 * self.sigma ** 2) * self.T) / (self.sigma * np.sqrt(self.T))
-
-        return self.S * norm.cdf(d1, 0.0, 1.0) - self.X * np.exp(-self.r * self.T) * norm.cdf(d2, 0.0, 1.0)
+        d1, d2 = self._d1_d2()
+        return self.S * ndtr(d1) - self.X * np.exp(-self.r * self.T) * ndtr(d2)
 
     def _put_option_price(self):
         """
@@ -59,13 +64,8 @@ class BlackScholesModel(OptionPriceModel):
          - N(d1): Delta edging -> fraction of the stock to hold for risk neutralization
          - N(d2): probability of option exercise
         """
-        if self.T == 0:
-            return np.maximum(-self.X+self.S, 0)
-
-        d1 = (np.log(self.S / self.X) + (self.r + 0.5 * self.sigma ** 2) * self.T) / (self.sigma * np.sqrt(self.T))
-        d2 = (np.log(self.S / self.X) + (self.r - 0.5 * self.sigma ** 2) * self.T) / (self.sigma * np.sqrt(self.T))
-
-        return self.X * np.exp(-self.r * self.T) * norm.cdf(-d2, 0.0, 1.0) - self.S * norm.cdf(-d1, 0.0, 1.0)
+        d1, d2 = self._d1_d2()
+        return self.X * np.exp(-self.r * self.T) * ndtr(-d2) - self.S * ndtr(-d1)
 
     def delta_hedging(self, option_type: OptionType = OptionType.CALL_OPTION):
         """
@@ -74,7 +74,7 @@ class BlackScholesModel(OptionPriceModel):
         if option_type is OptionType.CALL_OPTION:
             return self._delta_hedging_call()
         elif option_type == OptionType.PUT_OPTION:
-            return self._delta_hedgin_put()
+            return self._delta_hedging_put()
         else:
             return -1
 
@@ -82,21 +82,130 @@ class BlackScholesModel(OptionPriceModel):
         """
         :return: N(d1)
         """
-        if self.T == 0:
-            return 1
-
-        d1 = (np.log(self.S / self.X) + (self.r + 0.5 * self.sigma ** 2) * self.T) / (self.sigma * np.sqrt(self.T))
-        return norm.cdf(d1, 0.0, 1.0)
+        d1, _ = self._d1_d2()
+        return ndtr(d1)
 
     def _delta_hedging_put(self):
         """
-        :return: 1-N(-d1)
+        :return: N(d1) - 1
         """
-        if self.T == 0:
-            return 1
+        d1, _ = self._d1_d2()
+        return ndtr(d1) - 1
 
-        d1 = (np.log(self.S / self.X) + (self.r + 0.5 * self.sigma ** 2) * self.T) / (self.sigma * np.sqrt(self.T))
-        return 1-norm.cdf(1-d1, 0.0, 1.0)
+    def greeks(self):
+        """
+        Compute prices and Greeks of both the call and the put in a single pass, see black_scholes_greeks.
+        """
+        return _greeks(self.S, self.X, self.T, self.r, self.sigma)
+
+
+@dataclass
+class BlackScholesGreeks:
+    """
+    Prices and sensitivities of European call and put options. Vega and rho are per unit (not per percent) change of
+    volatility and rate; theta is the time decay per year.
+    """
+    call_price: np.ndarray
+    put_price: np.ndarray
+    call_delta: np.ndarray
+    put_delta: np.ndarray
+    gamma: np.ndarray
+    vega: np.ndarray
+    call_theta: np.ndarray
+    put_theta: np.ndarray
+    call_rho: np.ndarray
+    put_rho: np.ndarray
+
+
+def _d1_d2(S, X, T, r, sigma):
+    expired = np.asarray(T) <= 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma_sqrt_T = sigma * np.sqrt(np.where(expired, 1.0, T))
+        d1 = (np.log(S / X) + (r + 0.5 * sigma ** 2) * T) / sigma_sqrt_T
+    d1 = np.where(expired, np.where(np.asarray(S) > X, np.inf, -np.inf), d1)
+    d2 = np.where(expired, d1, d1 - sigma_sqrt_T)
+    return d1, d2
+
+
+def _greeks(S, X, T, r, sigma):
+    """
+    Prices and Greeks with T in years. Inputs are not broadcast up front: terms depending on a few parameters only
+    (e.g. sqrt(T) or exp(-rT) on a surface grid) are computed on their small shapes and shared between the outputs.
+    """
+    S, X, T, r, sigma = (np.asarray(a, dtype=np.float64) for a in (S, X, T, r, sigma))
+    expired = T <= 0
+    any_expired = expired.any()
+    if any_expired:
+        T = np.where(expired, 0.0, T)
+    sqrt_T = np.sqrt(T)
+    sigma_sqrt_T = sigma * sqrt_T
+    discounted_X = X * np.exp(-r * T)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = np.asarray(np.log(S / X) + (r + 0.5 * sigma * sigma) * T)
+        d1 /= sigma_sqrt_T
+    d2 = d1 - sigma_sqrt_T
+    if any_expired:
+        # at maturity, N(d1) = N(d2) = 1 if the call is in the money, 0 otherwise
+        itm = np.where(S > X, np.inf, -np.inf)
+        d1 = np.where(expired, itm, d1)
+        d2 = np.where(expired, itm, d2)
+
+    # d1 is not needed past N(d1): reuse its buffer for the normal pdf n(d1)
+    N_d1 = ndtr(d1)
+    N_d2 = ndtr(d2)
+    d1 *= d1
+    d1 *= -0.5
+    n_d1 = np.exp(d1, out=d1)
+    n_d1 *= 1 / np.sqrt(2 * np.pi)
+
+    call_price = S * N_d1
+    X_N_d2 = discounted_X * N_d2
+    call_price -= X_N_d2
+    S_n_d1 = S * n_d1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gamma = n_d1 / S
+        gamma /= sigma_sqrt_T
+        call_theta = S_n_d1 * (-0.5 * sigma / sqrt_T)
+    call_theta -= r * X_N_d2
+    call_rho = T * X_N_d2
+    put_theta = call_theta + r * discounted_X
+    if any_expired:
+        # expired options are worth their payoff and no longer decay: null gamma and thetas, for calls and puts alike
+        gamma = np.where(expired, 0.0, gamma)
+        call_theta = np.where(expired, 0.0, call_theta)
+        put_theta = np.where(expired, 0.0, put_theta)
+
+    return BlackScholesGreeks(
+        call_price=call_price,
+        put_price=call_price - S + discounted_X,  # put-call parity
+        call_delta=N_d1,
+        put_delta=N_d1 - 1,
+        gamma=gamma,
+        vega=S_n_d1 * sqrt_T,
+        call_theta=call_theta,
+        put_theta=put_theta,
+        call_rho=call_rho,
+        put_rho=call_rho - T * discounted_X,
+    )
+
+
+def black_scholes_greeks(spot_price, strike_price, days_to_maturity=100, risk_free_rate=0.001, volatility=0.5):
+    """
+    Price European calls and puts and compute their Greeks over broadcastable arrays of parameters, in one pass.
+
+    E.g. a spot x strike x maturity surface is priced with spot_price[:, None, None], strike_price[None, :, None] and
+    days_to_maturity[None, None, :]. Expired options (days_to_maturity == 0) are handled element-wise and get their
+    intrinsic value.
+
+    :param spot_price: underlying spot prices
+    :param strike_price: strike prices
+    :param days_to_maturity: time periods (days) to maturity/exercise date
+    :param risk_free_rate: annual returns on risk-free assets
+    :param volatility: annual volatilities of the underlying asset
+    :return: a BlackScholesGreeks of arrays with the broadcast shape of the inputs
+    """
+    return _greeks(spot_price, strike_price, np.asarray(days_to_maturity) / 365, risk_free_rate, volatility)
 
 
 if __name__ == "__main__":
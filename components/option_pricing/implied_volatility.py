@@ -0,0 +1,104 @@
+# Third party imports
+import numpy as np
+from scipy.special import ndtr
+
+# Local package imports
+from components.option_pricing.base import OptionType
+
+SQRT_2PI = np.sqrt(2 * np.pi)
+MIN_VOLATILITY = 1e-6
+MAX_VOLATILITY = 20.0
+
+
+def _initial_guess(call_price, S, K, T):
+    """
+    Corrado-Miller rational approximation of the implied volatility, from the call price and the discounted strike K.
+    Where its square root is not real (far from the money), start from the inflection point of the price in sigma
+    instead (Manaster-Koehler), from which Newton iterations converge monotonically.
+    """
+    excess = call_price - 0.5 * (S - K)
+    radicand = excess * excess - (S - K) ** 2 / np.pi
+    corrado_miller = SQRT_2PI / (S + K) * (excess + np.sqrt(np.maximum(radicand, 0.0)))
+    manaster_koehler = np.sqrt(2 * np.abs(np.log(S / K)))
+    sigma_sqrt_T = np.where(radicand > 0, corrado_miller, manaster_koehler)
+    return np.clip(sigma_sqrt_T / np.sqrt(T), MIN_VOLATILITY, MAX_VOLATILITY)
+
+
+def implied_volatility(option_price, spot_price, strike_price, days_to_maturity=100, risk_free_rate=0.001,
+                       option_type: OptionType = OptionType.CALL_OPTION, tolerance=1e-10, max_iterations=100):
+    """
+    Invert the Black-Scholes formula for a whole option chain at once.
+
+    Every quote starts from a rational approximation, then takes safeguarded Halley steps: each quote keeps a bracket
+    [low, high] around its root and falls back on bisection whenever a step would leave it. Quotes are dropped from
+    the working set as soon as they converge, so later iterations only process the hard ones.
+
+    :param option_price: market prices
+    :param spot_price: underlying spot prices
+    :param strike_price: strike prices
+    :param days_to_maturity: time periods (days) to maturity/exercise date
+    :param risk_free_rate: annual returns on risk-free assets
+    :param option_type: OptionType of all the quotes (puts are converted to calls by put-call parity)
+    :param tolerance: absolute tolerance on the volatility
+    :param max_iterations: maximum number of Halley/bisection steps
+    :return: array of annual implied volatilities, with the broadcast shape of the inputs; NaN for prices outside the
+             no-arbitrage bounds or expired options
+    """
+    price, S, X, T, r = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (
+        option_price, spot_price, strike_price, np.asarray(days_to_maturity) / 365, risk_free_rate)))
+    shape = price.shape
+    price, S, X, T, r = (a.ravel() for a in (price, S, X, T, r))
+
+    K = X * np.exp(-r * T)
+    call_price = price if option_type is OptionType.CALL_OPTION else price + S - K
+    result = np.full(price.size, np.nan)
+    # a call is worth between its discounted intrinsic value and the spot price
+    valid = (T > 0) & (call_price > np.maximum(S - K, 0.0)) & (call_price < S)
+
+    index = np.flatnonzero(valid)
+    C, S, K, T = call_price[index], S[index], K[index], T[index]
+    sqrt_T = np.sqrt(T)
+    log_moneyness = np.log(S / K)
+    sigma = _initial_guess(C, S, K, T)
+    low = np.full(index.size, MIN_VOLATILITY)
+    high = np.full(index.size, MAX_VOLATILITY)
+
+    for _ in range(max_iterations):
+        if index.size == 0:
+            break
+        sigma_sqrt_T = sigma * sqrt_T
+        d1 = log_moneyness / sigma_sqrt_T + 0.5 * sigma_sqrt_T
+        d2 = d1 - sigma_sqrt_T
+        error = S * ndtr(d1) - K * ndtr(d2) - C
+        vega = S * sqrt_T * np.exp(-0.5 * d1 * d1) / SQRT_2PI
+        vomma = vega * d1 * d2 / sigma
+
+        # the call price increases with sigma: the root is below sigma if the price is too high
+        high = np.where(error > 0, sigma, high)
+        low = np.where(error < 0, sigma, low)
+        with np.errstate(divide="ignore", over="ignore", invalid="ignore"):
+            newton = error / vega
+            candidate = sigma - newton / (1 - 0.5 * newton * vomma / vega)
+        bisect = ~np.isfinite(candidate) | (candidate <= low) | (candidate >= high)
+        candidate = np.where(bisect, 0.5 * (low + high), candidate)
+
+        # stop on an exact price, on a negligible step, or once the bracket itself is below the tolerance
+        done = (error == 0) | (np.abs(candidate - sigma) < tolerance) | (high - low < tolerance)
+        sigma = candidate
+        result[index[done]] = sigma[done]
+
+        keep = ~done
+        index, C, S, K, T, sqrt_T, log_moneyness, sigma, low, high = (
+            a[keep] for a in (index, C, S, K, T, sqrt_T, log_moneyness, sigma, low, high))
+
+    return result.reshape(shape)
+
+
+if __name__ == "__main__":
+    from components.option_pricing.black_scholes import black_scholes_greeks
+
+    strikes = np.linspace(10000, 40000, 7)
+    volatilities = np.linspace(0.5, 1.1, 7)
+    prices = black_scholes_greeks(20000, strikes, 180, 0.05, volatilities)
+    print(implied_volatility(prices.call_price, 20000, strikes, 180, 0.05))
+    print(implied_volatility(prices.put_price, 20000, strikes, 180, 0.05, OptionType.PUT_OPTION))
@@ -0,0 +1,214 @@
+# Standard library imports
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+# Third party imports
+import numpy as np
+
+# Local package imports
+from components.option_pricing.base import OptionPriceModel, OptionType
+
+CHUNK_BYTES = 8 * 2 ** 20  # memory used by the paths of one chunk
+
+_executors = {}
+
+
+@dataclass
+class MonteCarloResult:
+    """Discounted price estimate, with its standard error and the number of simulated paths."""
+    price: float
+    standard_error: float
+    paths: int
+
+
+class EuropeanPayoff:
+    """Plain vanilla payoff, only depending on the price at maturity."""
+    path_dependent = False
+
+    def __call__(self, paths, strike_price, option_type):
+        return _vanilla(paths[:, -1], strike_price, option_type)
+
+
+class AsianPayoff:
+    """Payoff on the arithmetic average of the prices at the monitoring dates (the simulation steps)."""
+    path_dependent = True
+
+    def __call__(self, paths, strike_price, option_type):
+        return _vanilla(paths.mean(axis=1), strike_price, option_type)
+
+
+class BarrierPayoff:
+    """
+    Vanilla payoff knocked out (or in) when the price crosses a barrier at any monitoring date.
+
+    :param barrier: barrier level
+    :param kind: one of "up-and-out", "up-and-in", "down-and-out", "down-and-in"
+    """
+    path_dependent = True
+    KINDS = ("up-and-out", "up-and-in", "down-and-out", "down-and-in")
+
+    def __init__(self, barrier, kind="up-and-out"):
+        if kind not in self.KINDS:
+            raise ValueError(f"Barrier kind must be one of {self.KINDS}")
+        self.barrier = barrier
+        self.kind = kind
+
+    def __call__(self, paths, strike_price, option_type):
+        if self.kind.startswith("up"):
+            crossed = paths.max(axis=1) >= self.barrier
+        else:
+            crossed = paths.min(axis=1) <= self.barrier
+        active = crossed if self.kind.endswith("in") else ~crossed
+        return _vanilla(paths[:, -1], strike_price, option_type) * active
+
+
+def _vanilla(prices, strike_price, option_type):
+    if option_type is OptionType.CALL_OPTION:
+        return np.maximum(prices - strike_price, 0)
+    return np.maximum(strike_price - prices, 0)
+
+
+def _simulate_chunk(args):
+    """
+    Simulate one chunk of GBM paths and return the sufficient statistics of the (discounted) payoff Y and of the
+    control variate C (the discounted terminal price), so that chunks can be combined exactly in any order.
+    """
+    seed, paths, model, option_type = args
+    rng = np.random.default_rng(seed)
+    steps = model.number_of_steps
+    dt = model.T / steps
+    drift = (model.r - 0.5 * model.sigma ** 2) * dt
+    diffusion = model.sigma * np.sqrt(dt)
+
+    draws = paths // 2 if model.antithetic else paths
+    increments = rng.standard_normal((draws, steps))
+    if model.antithetic:
+        increments = np.concatenate([increments, -increments])
+    increments *= diffusion
+    increments += drift
+    np.cumsum(increments, axis=1, out=increments)
+    prices = np.exp(increments, out=increments)
+    prices *= model.S
+
+    discount = np.exp(-model.r * model.T)
+    payoff = model.payoff(prices, model.X, option_type) * discount
+    control = prices[:, -1] * discount
+    if model.antithetic:
+        # average each path with its antithetic twin: the pairs are the independent samples
+        payoff = 0.5 * (payoff[:draws] + payoff[draws:])
+        control = 0.5 * (control[:draws] + control[draws:])
+    return np.array([payoff.size, payoff.sum(), control.sum(), payoff @ payoff, control @ control, payoff @ control])
+
+
+def _executor(workers):
+    if workers not in _executors:
+        _executors[workers] = ProcessPoolExecutor(max_workers=workers)
+    return _executors[workers]
+
+
+class MonteCarloModel(OptionPriceModel):
+    """
+    Class implementing Monte Carlo option pricing on Geometric Brownian Motion paths.
+
+    Paths are simulated in chunks of bounded memory, each with its own random stream spawned from a single seed: the
+    result does not depend on the number of worker processes the chunks are spread on. Variance is reduced with
+    antithetic variates and with the discounted terminal price as control variate (its expectation is the spot price).
+    """
+
+    def __init__(self, spot_price: float, strike_price: float, days_to_maturity: int = 100,
+                 risk_free_rate: float = 0.001, volatility: float = 0.5, number_of_simulations: int = 1_000_000,
+                 number_of_steps: int = None, payoff=None, antithetic: bool = True, control_variate: bool = True,
+                 seed: int = None, workers: int = None):
+        """
+        Initializes variables used in the Monte Carlo simulation.
+
+        :param spot_price: current underlying spot price
+        :param strike_price: strike price at maturity for option contract
+        :param days_to_maturity: time periods (days) to maturity/exercise date
+        :param risk_free_rate: annual returns on risk-free assets (assumed constant until maturity)
+        :param volatility: annual volatility of the underlying asset (assumed constant until maturity)
+        :param number_of_simulations: number of simulated paths
+        :param number_of_steps: monitoring dates per path; defaults to 1 for European payoffs, daily otherwise
+        :param payoff: EuropeanPayoff (default), AsianPayoff or BarrierPayoff instance
+        :param antithetic: simulate every path together with its mirrored twin
+        :param control_variate: correct the estimate with the discounted terminal price
+        :param seed: seed of the random streams, for reproducible prices
+        :param workers: processes the chunks are spread on, defaults to the number of CPUs
+        """
+        self.S = spot_price
+        self.X = strike_price
+        self.T = days_to_maturity / 365
+        self.r = risk_free_rate
+        self.sigma = volatility
+        self.payoff = payoff or EuropeanPayoff()
+        if number_of_steps is None:
+            number_of_steps = max(int(days_to_maturity), 1) if self.payoff.path_dependent else 1
+        self.number_of_steps = number_of_steps
+        self.number_of_simulations = number_of_simulations
+        self.antithetic = antithetic
+        self.control_variate = control_variate
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+
+    def _chunks(self):
+        paths = max(CHUNK_BYTES // (8 * self.number_of_steps), 2) // 2 * 2
+        sizes = [paths] * (self.number_of_simulations // paths)
+        if self.number_of_simulations % paths:
+            remainder = self.number_of_simulations % paths
+            sizes.append(remainder + remainder % 2 if self.antithetic else remainder)
+        return sizes
+
+    def simulate(self, option_type: OptionType = OptionType.CALL_OPTION, progress=None):
+        """
+        Run the simulation for a given option type.
+
+        :param progress: optional function called with the fraction of simulated paths after every chunk
+        :return: a MonteCarloResult with the price and its standard error
+        """
+        sizes = self._chunks()
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+        tasks = [(seed, size, self, option_type) for seed, size in zip(seeds, sizes)]
+        if self.workers == 1 or len(tasks) == 1:
+            chunks = map(_simulate_chunk, tasks)
+        else:
+            chunks = _executor(self.workers).map(_simulate_chunk, tasks)
+        stats = 0
+        for done, chunk in enumerate(chunks, 1):
+            stats = stats + chunk
+            if progress is not None:
+                progress(done / len(tasks))
+
+        n, sum_y, sum_c, sum_yy, sum_cc, sum_yc = stats
+        mean_y, mean_c = sum_y / n, sum_c / n
+        var_y = (sum_yy - n * mean_y ** 2) / (n - 1)
+        if not self.control_variate:
+            return MonteCarloResult(mean_y, np.sqrt(var_y / n), sum(sizes))
+
+        var_c = (sum_cc - n * mean_c ** 2) / (n - 1)
+        cov_yc = (sum_yc - n * mean_y * mean_c) / (n - 1)
+        beta = cov_yc / var_c if var_c > 0 else 0.0
+        price = mean_y - beta * (mean_c - self.S)
+        variance = max(var_y - beta * cov_yc, 0.0)
+        return MonteCarloResult(price, np.sqrt(variance / n), sum(sizes))
+
+    def _call_option_price(self):
+        """
+        Compute the Monte Carlo estimate of the call option price.
+        """
+        return self.simulate(OptionType.CALL_OPTION).price
+
+    def _put_option_price(self):
+        """
+        Compute the Monte Carlo estimate of the put option price.
+        """
+        return self.simulate(OptionType.PUT_OPTION).price
+
+
+if __name__ == "__main__":
+    from components.option_pricing.black_scholes import BlackScholesModel
+
+    print(BlackScholesModel(20000, 25000, 180, 0.05, 0.75).option_price(OptionType.CALL_OPTION))
+    print(MonteCarloModel(20000, 25000, 180, 0.05, 0.75, seed=0).simulate(OptionType.CALL_OPTION))
+    print(MonteCarloModel(20000, 25000, 180, 0.05, 0.75, 100_000, payoff=AsianPayoff(), seed=0).simulate())
+    print(MonteCarloModel(20000, 25000, 180, 0.05, 0.75, 100_000, payoff=BarrierPayoff(35000), seed=0).simulate())
@@ -0,0 +1,212 @@
+# Standard library imports
+import hashlib
+import json
+import os
+import shutil
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+STORE_VERSION = 2
+STORE_SUFFIX = ".store"
+META_FILE = "meta.json"
+DATE_COLUMN = "Date"
+
+
+def store_path_for(csv_path):
+    """
+    Return the directory holding the columnar copy of a CSV price file, e.g. database/BTC-USD.store
+    """
+    root, _ = os.path.splitext(csv_path)
+    return root + STORE_SUFFIX
+
+
+def _column_file(name):
+    return name.lower().replace(" ", "_") + ".bin"
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {"path": os.path.basename(csv_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def read_meta(store_path):
+    with open(os.path.join(store_path, META_FILE)) as f:
+        return json.load(f)
+
+
+def write_store(store_path, columns, source=None):
+    """
+    Write a set of equally long columns to a store directory, one raw little-endian binary file per column.
+
+    The store is written in a sibling temporary directory and renamed in place, so readers never observe a half
+    written store and processes that already memory-mapped the previous files keep reading them undisturbed.
+
+    :param store_path: destination directory
+    :param columns: mapping column name -> 1D array; datetime64 columns are stored as int64 epoch nanoseconds
+    :param source: optional signature of the file the columns were extracted from
+    """
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) != 1:
+        raise ValueError("All the columns of a price store must have the same length")
+
+    tmp_path = f"{store_path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    meta = {"version": STORE_VERSION, "length": lengths.pop(), "columns": [], "source": source}
+    digest = hashlib.blake2b(digest_size=16)
+    for name, values in columns.items():
+        values = np.asarray(values)
+        kind = "datetime" if np.issubdtype(values.dtype, np.datetime64) else "numeric"
+        if kind == "datetime":
+            values = values.astype("datetime64[ns]").view(np.int64)
+        values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder("<"))
+        values.tofile(os.path.join(tmp_path, _column_file(name)))
+        digest.update(values.tobytes())
+        meta["columns"].append({"name": name, "file": _column_file(name), "dtype": values.dtype.str, "kind": kind})
+
+    meta["fingerprint"] = digest.hexdigest()
+    _write_meta(tmp_path, meta)
+
+    old_path = f"{store_path}.old-{os.getpid()}"
+    if os.path.isdir(store_path):
+        os.replace(store_path, old_path)
+    try:
+        os.replace(tmp_path, store_path)
+    except OSError:
+        # another process published the same store concurrently: keep theirs
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return store_path
+
+
+def _write_meta(store_path, meta):
+    tmp_meta = os.path.join(store_path, f"{META_FILE}.tmp-{os.getpid()}")
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_meta, os.path.join(store_path, META_FILE))
+
+
+def append_store(store_path, columns):
+    """
+    Append rows to a store, creating it if needed.
+
+    Column files only grow and the row count in meta.json is replaced atomically after the data is written, so
+    concurrent readers keep seeing a consistent (possibly shorter) store.
+
+    :param store_path: store directory
+    :param columns: mapping column name -> 1D array, with the same names and order as the existing store
+    :return: the new number of rows
+    """
+    if not os.path.isdir(store_path):
+        write_store(store_path, columns)
+        return len(next(iter(columns.values())))
+
+    meta = read_meta(store_path)
+    names = [column["name"] for column in meta["columns"]]
+    if list(columns) != names:
+        raise ValueError(f"Columns {list(columns)} do not match the store columns {names}")
+
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) != 1:
+        raise ValueError("All the columns of a price store must have the same length")
+
+    # chained hash: the fingerprint of the appended store only depends on the previous one and the new rows
+    digest = hashlib.blake2b(bytes.fromhex(meta.get("fingerprint", "")), digest_size=16)
+    for column in meta["columns"]:
+        values = np.asarray(columns[column["name"]])
+        if column["kind"] == "datetime":
+            values = values.astype("datetime64[ns]").view(np.int64)
+        data = np.ascontiguousarray(values, dtype=column["dtype"]).tobytes()
+        path = os.path.join(store_path, column["file"])
+        with open(path, "r+b") as f:
+            # drop any tail left over by an interrupted append
+            f.truncate(meta["length"] * np.dtype(column["dtype"]).itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(data)
+        digest.update(data)
+
+    meta["length"] += lengths.pop()
+    meta["fingerprint"] = digest.hexdigest()
+    _write_meta(store_path, meta)
+    return meta["length"]
+
+
+def open_store(store_path, meta=None):
+    """
+    Memory-map every column of a store read-only. Pages are backed by the OS page cache and therefore shared by
+    all the processes mapping the same store.
+
+    :param meta: the store metadata, if already read
+    :return: dict column name -> read-only np.memmap (datetime columns are exposed as datetime64[ns] views)
+    """
+    meta = meta or read_meta(store_path)
+    length = meta["length"]
+    columns = {}
+    for column in meta["columns"]:
+        path = os.path.join(store_path, column["file"])
+        if length == 0:
+            values = np.empty(0, dtype=column["dtype"])
+        else:
+            values = np.memmap(path, dtype=column["dtype"], mode="r", shape=(length,))
+        if column["kind"] == "datetime":
+            values = values.view("datetime64[ns]")
+        columns[column["name"]] = values
+    return columns
+
+
+def convert_csv(csv_path, store_path=None):
+    """
+    Parse a Yahoo finance style CSV once and persist it as a columnar store.
+    """
+    store_path = store_path or store_path_for(csv_path)
+    df = pd.read_csv(csv_path)
+    df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format="%Y-%m-%d")
+    columns = {name: df[name].to_numpy() for name in df.columns}
+    return write_store(store_path, columns, source=_source_signature(csv_path))
+
+
+def is_stale(csv_path, store_path=None):
+    """
+    Check whether the store is missing or was built from a different version of the CSV file.
+    """
+    store_path = store_path or store_path_for(csv_path)
+    try:
+        meta = read_meta(store_path)
+    except (OSError, ValueError):
+        return True
+    return meta.get("version") != STORE_VERSION or meta.get("source") != _source_signature(csv_path)
+
+
+def to_frame(columns):
+    """
+    Wrap memory-mapped columns in a DataFrame without copying them.
+    """
+    return pd.DataFrame(columns, copy=False)
+
+
+def open_frame(store_path):
+    """
+    Open a store as a read-only DataFrame. The store fingerprint (a hash of its content) and length are recorded in
+    DataFrame.attrs, so that derived results can be cached per dataset version.
+    """
+    meta = read_meta(store_path)
+    df = to_frame(open_store(store_path, meta))
+    df.attrs.update(fingerprint=meta.get("fingerprint"), length=meta["length"])
+    return df
+
+
+def load_prices(csv_path, store_path=None):
+    """
+    Load a price history through its columnar store, (re)building the store only if the CSV changed.
+
+    :param csv_path: path to the source CSV file
+    :param store_path: optional store directory, defaults to the CSV path with a .store suffix
+    :return: a read-only DataFrame with the same columns and dtypes as pd.read_csv + pd.to_datetime
+    """
+    store_path = store_path or store_path_for(csv_path)
+    if is_stale(csv_path, store_path):
+        convert_csv(csv_path, store_path)
+    return open_frame(store_path)
@@ -0,0 +1,149 @@
+"""
+Projection of a price under the Geometric Brownian Motion: lognormal densities, quantile fan bands and exceedance
+probabilities over a grid of horizons and prices.
+
+Everything is evaluated in log space, where the GBM is a Gaussian of mean log(S0) + mu t and standard deviation
+sigma sqrt(t): the standardized log prices of the whole horizon x price grid are computed in one broadcasted pass, and
+the density, survival function and quantiles follow from them. mu and sigma are the mean and standard deviation of the
+log returns per bar, horizons are in bars. Price grids are log-spaced and adapt to the spot price and the volatility,
+so the mass of the distribution is covered whatever the price level. Projections are cached per (S0, mu, sigma,
+horizons, grid) and their arrays are read-only.
+"""
+# Standard library imports
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Third party imports
+import numpy as np
+from scipy.special import ndtr, ndtri
+
+# Local package imports
+from components.instrumentation import register_cache
+
+GRID_POINTS = 400
+GRID_WIDTH = 4.0  # standard deviations of the log price covered on both sides, at the longest horizon
+FAN_LEVELS = (0.05, 0.25, 0.5, 0.75, 0.95)
+SQRT_2PI = np.sqrt(2 * np.pi)
+
+
+def _read_only(values):
+    values.flags.writeable = False
+    return values
+
+
+def log_moments(log_S0, mu, sigma, horizons):
+    """
+    Mean and standard deviation of the log price of the GBM after some horizons.
+
+    :param log_S0: log of the starting price
+    :param mu: mean log return per bar
+    :param sigma: standard deviation of the log returns per bar
+    :param horizons: horizons in bars, scalar or array
+    :return: (mean, std), broadcast like horizons
+    """
+    horizons = np.asarray(horizons, dtype=np.float64)
+    return log_S0 + mu * horizons, sigma * np.sqrt(horizons)
+
+
+@dataclass(frozen=True)
+class PriceGrid:
+    """
+    Log-spaced grid of prices between low and high, hashable so that projections can be cached per grid.
+    """
+    low: float
+    high: float
+    points: int = GRID_POINTS
+
+    @classmethod
+    def adaptive(cls, S0, mu, sigma, horizon, width=GRID_WIDTH, points=GRID_POINTS):
+        """
+        Grid covering the spot price and `width` standard deviations around the expected log price at the horizon.
+        """
+        mean, std = log_moments(np.log(S0), mu, sigma, max(horizon, 1))
+        low = min(np.log(S0), mean) - width * std
+        high = max(np.log(S0), mean) + width * std
+        return cls(float(np.exp(low)), float(np.exp(high)), int(points))
+
+    @property
+    def prices(self):
+        return np.geomspace(self.low, self.high, self.points)
+
+
+@dataclass(frozen=True)
+class Projection:
+    """
+    GBM projection over a grid: arrays of shape (horizons, prices) for the density and exceedance, (levels, horizons)
+    for the quantiles.
+    """
+    S0: float
+    horizons: np.ndarray
+    prices: np.ndarray
+    log_mean: np.ndarray
+    log_std: np.ndarray
+    density: np.ndarray
+    exceedance: np.ndarray  # P(S_t > price)
+    levels: np.ndarray
+    quantiles: np.ndarray
+
+    def exceedance_probability(self, price):
+        """
+        P(S_t > price) at every horizon, exact rather than read off the grid.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (np.log(price) - self.log_mean) / self.log_std
+        # at null horizons z is infinite, or undefined at S0 itself, which is not exceeded
+        return np.where(np.isnan(z), 0.0, ndtr(-z))
+
+
+def project(S0, mu, sigma, horizons, grid=None, levels=FAN_LEVELS):
+    """
+    Densities, exceedance probabilities and quantiles of the GBM price at the given horizons, in one evaluation.
+
+    :param S0: starting price
+    :param mu: mean log return per bar
+    :param sigma: standard deviation of the log returns per bar
+    :param horizons: horizons in bars, a zero horizon gives a point mass at S0 (null density)
+    :param grid: PriceGrid of the densities, defaults to one adapted to the longest horizon
+    :param levels: probability levels of the quantiles
+    :return: Projection, cached per arguments
+    """
+    horizons = tuple(float(horizon) for horizon in np.atleast_1d(horizons))
+    if grid is None:
+        grid = PriceGrid.adaptive(S0, mu, sigma, max(horizons))
+    return _project(float(S0), float(mu), float(sigma), horizons, grid, tuple(float(level) for level in levels))
+
+
+@register_cache("projection")
+@lru_cache(maxsize=128)
+def _project(S0, mu, sigma, horizons, grid, levels):
+    horizons = np.array(horizons)
+    levels = np.array(levels)
+    prices = grid.prices
+    log_prices = np.log(prices)
+    mean, std = log_moments(np.log(S0), mu, sigma, horizons)
+
+    # standardized log prices of the whole grid: z[h, p] = (log(price_p) - mean_h) / std_h
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (log_prices - mean[:, None]) / std[:, None]
+        density = np.exp(-0.5 * z * z) / (SQRT_2PI * std[:, None] * prices)
+    # null horizons are a point mass at S0: infinite z, undefined at S0 itself
+    density[std == 0] = 0.0
+    exceedance = ndtr(-z)
+    exceedance[np.isnan(z)] = 0.0
+    quantiles = np.exp(mean + std * ndtri(levels)[:, None])
+
+    arrays = dict(horizons=horizons, prices=prices, log_mean=mean, log_std=std, density=density,
+                  exceedance=exceedance, levels=levels, quantiles=quantiles)
+    return Projection(S0, **{name: _read_only(values) for name, values in arrays.items()})
+
+
+if __name__ == "__main__":
+    import time
+    projection = project(30000, 1e-3, 0.035, np.arange(0, 366))
+    t0 = time.perf_counter()
+    for horizon in range(1, 366):
+        project(30000, 1e-3, 0.035, np.arange(0, horizon + 1))
+    print(f"uncached projections: {(time.perf_counter() - t0) / 365 * 1e3:.2f} ms each")
+    print("median in a year:", projection.quantiles[FAN_LEVELS.index(0.5), -1])
+    print("P(S > 60000) in a year:", projection.exceedance_probability(60000)[-1])
+    print("density integral in a year:", np.trapz(projection.density[-1], projection.prices))
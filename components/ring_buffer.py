@@ -0,0 +1,117 @@
+# Standard library imports
+import threading
+
+# Third party imports
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity columnar buffer keeping the most recent rows of a stream.
+
+    Every column is a preallocated array written in place with wraparound, so the memory used never grows with the
+    length of the stream. Writes and reads are guarded by a lock: one thread can extend the buffer while others read
+    consistent copies of it.
+    """
+
+    def __init__(self, capacity, dtypes):
+        """
+        :param capacity: maximum number of rows kept
+        :param dtypes: mapping column name -> numpy dtype
+        """
+        self.capacity = capacity
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in dtypes.items()}
+        self.start = 0  # position of the oldest row
+        self.size = 0
+        self.total = 0  # rows ever appended
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def __getstate__(self):
+        # the lock cannot be pickled: a checkpointed buffer gets a new one
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def extend(self, rows):
+        """
+        Append rows, overwriting the oldest ones once the buffer is full.
+
+        :param rows: mapping column name -> 1D array, with all the columns of the buffer
+        """
+        length = len(next(iter(rows.values())))
+        with self._lock:
+            self.total += length
+            if length >= self.capacity:
+                # only the last capacity rows survive
+                for name, column in self.columns.items():
+                    column[:] = rows[name][length - self.capacity:]
+                self.start, self.size = 0, self.capacity
+                return
+            end = (self.start + self.size) % self.capacity
+            first = min(length, self.capacity - end)
+            for name, column in self.columns.items():
+                values = rows[name]
+                column[end:end + first] = values[:first]
+                column[:length - first] = values[first:]
+            overflow = max(self.size + length - self.capacity, 0)
+            self.start = (self.start + overflow) % self.capacity
+            self.size += length - overflow
+
+    def _ordered(self, skip=0):
+        """Copies of the rows from the oldest to the newest, skipping the first ones; to be called under the lock."""
+        first = (self.start + skip) % self.capacity
+        count = self.size - skip
+        if first + count <= self.capacity:
+            return {name: column[first:first + count].copy() for name, column in self.columns.items()}
+        return {name: np.concatenate([column[first:], column[:first + count - self.capacity]])
+                for name, column in self.columns.items()}
+
+    def to_arrays(self):
+        """
+        :return: dict column name -> array of the buffered rows, from the oldest to the newest
+        """
+        with self._lock:
+            return self._ordered()
+
+    def since(self, key, value):
+        """
+        Rows whose (sorted) key column is strictly greater than a value, e.g. the bars after the last one a client has.
+
+        :return: dict column name -> array
+        """
+        with self._lock:
+            # the key column is sorted in ring order: search the older segment, then the wrapped around one
+            keys = self.columns[key]
+            end = self.start + self.size
+            older = keys[self.start:min(end, self.capacity)]
+            newer = keys[:max(end - self.capacity, 0)]
+            skip = int(np.searchsorted(older, value, side="right"))
+            if skip == len(older):
+                skip += int(np.searchsorted(newer, value, side="right"))
+            return self._ordered(skip)
+
+    def first(self):
+        """
+        :return: dict column name -> value of the oldest row, None if the buffer is empty
+        """
+        with self._lock:
+            if self.size == 0:
+                return None
+            return {name: column[self.start] for name, column in self.columns.items()}
+
+    def last(self):
+        """
+        :return: dict column name -> value of the newest row, None if the buffer is empty
+        """
+        with self._lock:
+            if self.size == 0:
+                return None
+            position = (self.start + self.size - 1) % self.capacity
+            return {name: column[position] for name, column in self.columns.items()}
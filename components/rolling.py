@@ -0,0 +1,150 @@
+"""
+Rolling statistics of log returns from prefix sums.
+
+The cumulative sums of the (centered) log returns and of their squares are computed once; the sample standard
+deviation over any window is then a difference of two prefix sums, O(n) for a whole series and independent of the
+window size. Returns are centered on the first bars' mean before summing, to avoid the catastrophic cancellation of
+the naive sum-of-squares formula on long histories.
+"""
+# Third party imports
+import numpy as np
+
+
+class RollingStats:
+    """
+    Prefix sums of log returns, with O(1) amortized appends.
+
+    Missing returns (NaN, e.g. the first bar) are skipped: windows count the valid returns they contain, as pandas'
+    rolling(window, min_periods) does.
+    """
+
+    def __init__(self, log_returns, shift=None):
+        """
+        :param log_returns: 1D array of log returns, aligned with the price bars
+        :param shift: value subtracted before summing; defaults to the mean of the first valid returns
+        """
+        log_returns = np.asarray(log_returns, dtype=np.float64)
+        valid = ~np.isnan(log_returns)
+        if shift is None:
+            head = log_returns[valid][:1000]
+            shift = head.mean() if head.size else 0.0
+        self.shift = shift
+
+        self._size = log_returns.size
+        capacity = max(2 * self._size, 16)
+        self._count = np.zeros(capacity + 1, dtype=np.int64)
+        self._sum = np.zeros(capacity + 1)
+        self._sum_sq = np.zeros(capacity + 1)
+        centered = np.where(valid, log_returns - shift, 0.0)
+        np.cumsum(valid, out=self._count[1:self._size + 1])
+        np.cumsum(centered, out=self._sum[1:self._size + 1])
+        np.cumsum(centered * centered, out=self._sum_sq[1:self._size + 1])
+
+    @classmethod
+    def from_prefix_sums(cls, count, total, total_sq, shift):
+        """
+        Wrap existing prefix sums (see prefix_sums) without copying them, e.g. read-only arrays shared between
+        processes: the first append copies them into growable arrays.
+        """
+        stats = cls.__new__(cls)
+        stats.shift = shift
+        stats._size = count.size - 1
+        stats._count, stats._sum, stats._sum_sq = count, total, total_sq
+        return stats
+
+    def prefix_sums(self):
+        """
+        :return: (count, sum, sum of squares) prefix sums of the valid centered returns, of len(self) + 1
+        """
+        n = self._size + 1
+        return self._count[:n], self._sum[:n], self._sum_sq[:n]
+
+    @classmethod
+    def from_prices(cls, close):
+        close = np.asarray(close, dtype=np.float64)
+        return cls(np.r_[np.nan, np.diff(np.log(close))])
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        capacity = max(2 * (self._count.size - 1), 16)
+        for name in ("_count", "_sum", "_sum_sq"):
+            old = getattr(self, name)
+            new = np.zeros(capacity + 1, dtype=old.dtype)
+            new[:old.size] = old
+            setattr(self, name, new)
+
+    def append(self, log_return):
+        """
+        Append the log return of a new bar in O(1) (amortized over the occasional capacity doubling).
+        """
+        if self._size + 1 >= self._count.size:
+            self._grow()
+        n = self._size
+        valid = not np.isnan(log_return)
+        x = log_return - self.shift if valid else 0.0
+        self._count[n + 1] = self._count[n] + valid
+        self._sum[n + 1] = self._sum[n] + x
+        self._sum_sq[n + 1] = self._sum_sq[n] + x * x
+        self._size += 1
+
+    def volatility(self, window, min_periods=None, annualization=1.0):
+        """
+        Rolling sample standard deviation (ddof=1) of the log returns, aligned with the bars.
+
+        :param window: window length in bars
+        :param min_periods: minimum number of valid returns in a window, NaN below (pandas default: window)
+        :param annualization: factor multiplying the result, e.g. sqrt(365) for daily bars
+        :return: 1D array of len(self)
+        """
+        return self.volatilities([window], min_periods, annualization)[0]
+
+    def volatilities(self, windows, min_periods=None, annualization=1.0):
+        """
+        Rolling volatilities for several windows at once. All windows share the same prefix sums, so each extra
+        window only costs a few vectorized passes over the bars.
+
+        :return: 2D array of shape (len(windows), len(self))
+        """
+        windows = np.asarray(windows, dtype=np.int64)
+        if min_periods is None:
+            min_periods = windows
+        min_periods = np.maximum(np.minimum(min_periods, windows), 2)
+
+        size = self._size
+        count, total, total_sq = self._count[:size + 1], self._sum[:size + 1], self._sum_sq[:size + 1]
+        result = np.empty((windows.size, size))
+        n = np.empty(size)  # valid returns per window, a scratch buffer shared by all the windows
+        for row, window, periods in zip(result, windows, np.broadcast_to(min_periods, windows.shape)):
+            # the variance is accumulated in the output row: no other full-length temporary
+            self._window_diff(count, window, out=n)
+            self._window_diff(total, window, out=row)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                row *= row
+                row /= n
+                self._window_diff(total_sq, window, out=row, subtract_from=True)
+                n -= 1
+                row /= n
+            np.maximum(row, 0.0, out=row)  # rounding can push constant windows slightly below zero
+            np.sqrt(row, out=row)
+            row *= annualization
+            row[n < periods - 1] = np.nan
+        return result
+
+    @staticmethod
+    def _window_diff(prefix, window, out, subtract_from=False):
+        """
+        Sum over the last `window` bars (or fewer, at the start) ending at every bar, from a prefix sum, written to out
+        or, with subtract_from, as out = sum - out.
+        """
+        size = prefix.size - 1
+        window = min(window, size)
+        if subtract_from:
+            np.subtract(prefix[1:window + 1], out[:window], out=out[:window])
+            np.subtract(prefix[window + 1:], out[window:], out=out[window:])
+            np.subtract(out[window:], prefix[1:size - window + 1], out=out[window:])
+        else:
+            out[:window] = prefix[1:window + 1]
+            np.subtract(prefix[window + 1:], prefix[1:size - window + 1], out=out[window:])
+        return out
@@ -0,0 +1,106 @@
+"""
+Immutable view of a price history for the figure builders of components/tools.py.
+
+A SeriesContext holds NumPy views of the dates and close prices of a (memory-mapped) frame, and the arrays derived
+from them, computed on first use and memoized read-only: the builders share them instead of copying columns into
+new full-length frames, and only the downsampled points they plot are materialized.
+"""
+# Standard library imports
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Local package imports
+from components.analytics_cache import derived_series, fingerprint, online_stats
+from components.downsampling import line_indices
+
+CONTEXTS_KEPT = 4  # dataset versions whose contexts are kept, the least recently used is dropped
+
+_contexts = OrderedDict()
+_lock = threading.Lock()
+
+
+def _read_only(values):
+    view = values.view()
+    view.flags.writeable = False
+    return view
+
+
+class SeriesContext:
+    """
+    Dates, close and log-close prices of a price history as read-only arrays, with its derived series. Attributes
+    cannot be set: derived arrays are cached properties, computed once.
+    """
+
+    def __init__(self, price_db, key=None):
+        """
+        :param price_db: price frame with Date and Close columns, not copied
+        :param key: fingerprint of the frame, if already known
+        """
+        key = key or fingerprint(price_db)
+        dates = _read_only(price_db["Date"].to_numpy())
+        close = _read_only(price_db["Close"].to_numpy(np.float64))
+        # a frame over the same arrays, tagged with its fingerprint so the analytics caches do not hash it again
+        frame = pd.DataFrame({"Date": dates, "Close": close}, copy=False)
+        frame.attrs.update(fingerprint=key, length=close.size)
+        object.__setattr__(self, "frame", frame)
+        object.__setattr__(self, "key", key)
+        object.__setattr__(self, "dates", dates)
+        object.__setattr__(self, "close", close)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __len__(self):
+        return self.close.size
+
+    @cached_property
+    def log_close(self):
+        return _read_only(np.log(self.close))
+
+    @cached_property
+    def derived(self):
+        """DerivedSeries of the history (see components.analytics_cache), shared between processes when possible."""
+        return derived_series(self.frame)
+
+    @property
+    def log_returns(self):
+        return self.derived.log_returns
+
+    @property
+    def periods_per_year(self):
+        return self.derived.periods_per_year
+
+    @cached_property
+    def moments(self):
+        return online_stats(self.frame).moments
+
+    def shown(self, y, max_points):
+        """
+        Indices of the points of a line of y against the dates to plot, all of them if max_points is None.
+        """
+        if max_points is None:
+            return np.arange(len(self))
+        return line_indices(self.dates, y, max_points)
+
+
+def series_context(price_db):
+    """
+    Context of a price frame, shared by all the builders rendering the same dataset version.
+    """
+    key = fingerprint(price_db)
+    with _lock:
+        context = _contexts.get(key)
+        if context is not None:
+            _contexts.move_to_end(key)
+            return context
+    context = SeriesContext(price_db, key)
+    with _lock:
+        context = _contexts.setdefault(key, context)
+        while len(_contexts) > CONTEXTS_KEPT:
+            _contexts.popitem(last=False)
+    return context
@@ -0,0 +1,156 @@
+"""
+Read-only datasets shared by the server worker processes through memory-mapped segments.
+
+A segment is one file, in /dev/shm when available (RAM backed, never written back to disk): a fixed header (magic,
+format, dataset version and section lengths), a JSON table of the arrays (name, dtype, shape, offset), a pickled meta
+object, then the arrays, 64-byte aligned. Workers map it read-only and the arrays are views of the mapping: every
+process reads the same physical pages, so memory stays flat as workers are added.
+
+Publishing writes the new version to a temporary file next to the current one and renames it over it. The swap is
+atomic: attaching processes map either version entirely, and processes still reading the old version keep their
+mapping, the OS only frees the replaced file with its last mapping. A segment has one publisher at a time; a
+concurrent publisher may reuse a version number, never corrupt the segment.
+"""
+# Standard library imports
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+
+# Third party imports
+import numpy as np
+
+SHARED_DIR = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "btcdashboard")
+MAGIC = b"BTCDSEG\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQQQ")  # magic, format, reserved, dataset version, table bytes, meta bytes
+ALIGNMENT = 64
+
+_attached = {}  # path -> Segment mapped by this process
+_lock = threading.Lock()
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def segment_path(name, directory=None):
+    return os.path.join(directory or SHARED_DIR, f"{name}.seg")
+
+
+class Segment:
+    """
+    One mapped version of a shared dataset: its version number, meta object and read-only arrays.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, file_format, _, self.version, table_size, meta_size = HEADER.unpack_from(self._map)
+        if magic != MAGIC or file_format != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a shared dataset segment of format {FORMAT_VERSION}")
+        table = json.loads(self._map[HEADER.size:HEADER.size + table_size])
+        self.meta = pickle.loads(self._map[HEADER.size + table_size:HEADER.size + table_size + meta_size])
+        data = _align(HEADER.size + table_size + meta_size)
+        self.arrays = {}
+        for entry in table:
+            dtype = np.dtype(entry["dtype"])
+            count = int(np.prod(entry["shape"]))
+            values = np.frombuffer(self._map, dtype=dtype, count=count, offset=data + entry["offset"])
+            self.arrays[entry["name"]] = values.reshape(entry["shape"])
+
+    @property
+    def nbytes(self):
+        return len(self._map)
+
+
+def publish(name, arrays, meta=None, directory=None):
+    """
+    Publish a new version of a shared dataset, atomically replacing the current one.
+
+    :param name: file-safe name of the dataset
+    :param arrays: mapping name -> numpy array of a fixed-size dtype (datetime64 included)
+    :param meta: picklable object published with the arrays, e.g. scalar statistics
+    :param directory: directory of the segments, defaults to SHARED_DIR
+    :return: version number of the published segment
+    """
+    path = segment_path(name, directory)
+    try:
+        with open(path, "rb") as f:
+            version = HEADER.unpack(f.read(HEADER.size))[3] + 1
+    except (OSError, struct.error):
+        version = 1
+
+    table, offset = [], 0
+    arrays = {key: np.ascontiguousarray(values) for key, values in arrays.items()}
+    for key, values in arrays.items():
+        if values.dtype.hasobject:
+            raise TypeError(f"Array {key} of dtype object cannot be shared")
+        table.append({"name": key, "dtype": values.dtype.str, "shape": list(values.shape), "offset": offset})
+        offset = _align(offset + values.nbytes)
+    table = json.dumps(table).encode()
+    meta = pickle.dumps(meta, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, version, len(table), len(meta)))
+            f.write(table)
+            f.write(meta)
+            start = _align(f.tell())
+            for entry, values in zip(json.loads(table), arrays.values()):
+                f.seek(start + entry["offset"])
+                f.write(values.view(np.uint8).data if values.size else b"")
+            f.truncate(start + offset)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return version
+
+
+def attach(name, directory=None):
+    """
+    Map the current version of a shared dataset, read-only. The mapping is reused while the segment is unchanged, and
+    replaced by the new version once it has been published; arrays of the old one stay valid.
+
+    :return: Segment, or None if the dataset has not been published
+    """
+    path = segment_path(name, directory)
+    try:
+        inode = os.stat(path).st_ino
+    except OSError:
+        return None
+    segment = _attached.get(path)
+    if segment is not None and segment.inode == inode:
+        return segment
+    with _lock:
+        try:
+            segment = _attached[path] = Segment(path)
+        except (OSError, ValueError, struct.error, pickle.UnpicklingError):
+            return None
+    return segment
+
+
+def remove(name, directory=None):
+    """
+    Unlink a shared dataset: processes that mapped it keep reading it, new ones will not find it.
+    """
+    _attached.pop(segment_path(name, directory), None)
+    try:
+        os.remove(segment_path(name, directory))
+    except FileNotFoundError:
+        pass
+
+
+if __name__ == "__main__":
+    version = publish("example", {"x": np.arange(10.0), "dates": np.arange(3).astype("datetime64[D]")}, {"n": 10})
+    segment = attach("example")
+    print(version, segment.version, segment.meta, segment.arrays, segment.arrays["x"].flags.writeable)
+    remove("example")
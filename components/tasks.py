@@ -0,0 +1,54 @@
+"""
+Computations run as background jobs by the pages (see components.jobs): each one is called in a worker process with
+the values of the callback inputs, loads the data it needs there and returns what the callback output displays.
+"""
+# Third party imports
+from dash import html
+
+# Local package imports
+from components.data import daily_prices, get_prices
+from components.jobs import report_progress
+
+WINDOW_UNITS = {"1m": "minutes", "5m": "5-minute bars", "1h": "hours", "1d": "days"}
+BARRIER_LEVEL = 1.5  # up-and-out barrier, relative to the strike price
+PAYOFFS = {"european": "European", "asian": "Asian", "barrier": f"Up-and-out barrier ({BARRIER_LEVEL:g}x strike)"}
+
+
+def prices_version(resolution="1d"):
+    """Fingerprint of the price history at a resolution, which changes with every bar appended to its store."""
+    from components.analytics_cache import fingerprint
+    return fingerprint(get_prices(resolution))
+
+
+def daily_prices_version():
+    """Fingerprint of the daily history read by the volatility forecast."""
+    from components.analytics_cache import fingerprint
+    return fingerprint(daily_prices())
+
+
+def rolling_volatility_figure(window, resolution="1d"):
+    from components.tools import rolling_volatility_plot
+    figure = rolling_volatility_plot(get_prices(resolution), window=int(window), unit=WINDOW_UNITS[resolution])
+    return figure.to_dict()
+
+
+def volatility_forecast_figure(model="gjr"):
+    from components.tools import volatility_forecast_plot
+    from components.volatility_models import INTERACTIVE_MODELS
+    if model not in INTERACTIVE_MODELS:
+        # e.g. EGARCH without numba: its fit would hold a job for tens of seconds
+        raise ValueError(f"model must be one of {INTERACTIVE_MODELS}")
+    return volatility_forecast_plot(daily_prices(), model).to_dict()
+
+
+def monte_carlo_price(S, X, T, r, v, payoff="european", simulations=1_000_000):
+    """
+    Monte Carlo price of a call option, with its 95% confidence interval. The chunks are simulated in the job process
+    itself: parallelism comes from the job pool.
+    """
+    from components.option_pricing.monte_carlo import AsianPayoff, BarrierPayoff, EuropeanPayoff, MonteCarloModel
+    payoffs = {"european": EuropeanPayoff, "asian": AsianPayoff,
+               "barrier": lambda: BarrierPayoff(BARRIER_LEVEL * X, "up-and-out")}
+    model = MonteCarloModel(S, X, T, r, v, int(simulations), payoff=payoffs[payoff](), seed=0, workers=1)
+    result = model.simulate(progress=report_progress)
+    return html.H5(f"{result.price:.2f} ± {1.96 * result.standard_error:.2f}")
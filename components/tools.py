@@ -1,82 +1,105 @@
+# Standard library imports
+from functools import lru_cache
+
 # Third party imports
 import pandas as pd
 import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 from scipy.stats import norm, t
 
-from components.option_pricing.black_scholes import BlackScholesModel, OptionType
+from components.instrumentation import register_cache, timed
+from components.option_pricing.black_scholes import black_scholes_greeks
+from components.downsampling import line_points
+from components.analytics_cache import online_stats, rolling_stats, volatility_calibration, volatility_fit
+from components.projection import log_moments, project
+from components.series_context import series_context
+from components.volatility_models import simulate_exp_ou, simulate_heston
+
+PDF_HORIZONS = (50, 100, 200, 500)  # days of the densities of the lognormal evolution plot
+FAN_POINTS = 200  # horizons of a projection fan chart at most
 
 
 def log_returns(price_db):
-    df = price_db.copy()
-    df["LogReturns"] = np.log(df["Close"]).diff()
-    return df
+    """Price frame with the cached log returns, as a new frame over the same columns (no copy of the prices)."""
+    columns = {name: price_db[name] for name in price_db.columns}
+    columns["LogReturns"] = series_context(price_db).log_returns
+    return pd.DataFrame(columns, copy=False)
+
 
+def _line_frame(context, name, y, max_points, shown=None):
+    """Frame of the dates and y values to plot, built only at the downsampled points."""
+    shown = context.shown(y, max_points) if shown is None else shown
+    return pd.DataFrame({"Date": context.dates[shown], name: y[shown]})
 
-def log_return_plot(price_db):
-    price_db = log_returns(price_db)
-    fig = px.line(price_db, x='Date', y='LogReturns', title='BTC Log-Returns')
+
+@timed("tools.log_return_plot")
+def log_return_plot(price_db, max_points=line_points()):
+    context = series_context(price_db)
+    df = _line_frame(context, 'LogReturns', context.log_returns, max_points)
+    fig = px.line(df, x='Date', y='LogReturns', title='BTC Log-Returns')
     fig.update_traces(line=dict(color="red"))
     return fig
 
 
-def instaneous_volatility_plot(price_db):
-    price_db = log_returns(price_db)
-    price_db["Volatility"] = price_db["LogReturns"].abs() * np.sqrt(365)
-    fig = px.line(price_db, x='Date', y='Volatility', title='Instantaneous Volatility')
+@timed("tools.instaneous_volatility_plot")
+def instaneous_volatility_plot(price_db, max_points=line_points()):
+    context = series_context(price_db)
+    # the scaling does not move the downsampled points: only the shown ones are scaled
+    absolute = np.abs(context.log_returns)
+    df = _line_frame(context, 'Volatility', absolute, max_points)
+    del absolute
+    df['Volatility'] *= np.sqrt(context.periods_per_year)
+    fig = px.line(df, x='Date', y='Volatility', title='Instantaneous Volatility')
     fig.update_traces(line=dict(color="black"))
     return fig
 
 
-def log_price_plot(price_db):
-    df = price_db.copy()
-    df["Close"] = np.log(df["Close"])
+@timed("tools.log_price_plot")
+def log_price_plot(price_db, max_points=line_points()):
+    context = series_context(price_db)
+    moments = context.moments
+    shown = context.shown(context.log_close, max_points)
+    df = _line_frame(context, 'Close', context.log_close, max_points, shown)
     fig = px.line(df, x='Date', y=['Close'], title='BTC Price - Log scale')
     fig.update_yaxes(title_text="Log(Price)")
     fig.update_layout(legend=dict(orientation="v", yanchor="top", y=.98, xanchor="left", x=0.02, title=None))
 
     # Fit a normal distribution on the log returns
-    log_returns = df['Close'].diff().dropna()
-    mu, sigma = np.mean(log_returns), np.std(log_returns)
-
-    # Expected value and variance of the geometric brownian motion
-    S0 = df['Close'].iloc[0]  # The first closing price
-    N = df.index.size  # The number of time steps
-    t = np.arange(0, N)  # The time grid
+    mu, sigma = moments.mean, moments.std
 
-    E_S_t = S0 + (mu * t)
-    Var_S_t = (sigma ** 2 * t)
+    # Expected value and standard deviation of the log price of the GBM started from the first closing price, at the
+    # shown time steps only
+    E_S_t, std_S_t = log_moments(context.log_close[0], mu, sigma, shown)
 
     # plots
-    fig.add_scatter(x=df['Date'].iloc[-N - 1:], y=E_S_t, mode='lines', name='Expected value')
-    fig.add_scatter(x=df['Date'].iloc[-N - 1:], y=E_S_t + np.sqrt(Var_S_t), mode='lines', name='Upper std bound',
+    dates = df['Date']
+    fig.add_scatter(x=dates, y=E_S_t, mode='lines', name='Expected value')
+    fig.add_scatter(x=dates, y=E_S_t + std_S_t, mode='lines', name='Upper std bound',
                     fill=None)
-    fig.add_scatter(x=df['Date'].iloc[-N - 1:], y=E_S_t - np.sqrt(Var_S_t), mode='lines', name='Lower std bound',
+    fig.add_scatter(x=dates, y=E_S_t - std_S_t, mode='lines', name='Lower std bound',
                     fill='tonexty', fillcolor='rgba(255,165,0,0.1)')
     return fig
 
 
-def price_plot(price_db):
-    fig = px.line(price_db, x='Date', y=['Close'], title='BTC Price')
+@timed("tools.price_plot")
+def price_plot(price_db, max_points=line_points()):
+    context = series_context(price_db)
+    df = _line_frame(context, 'Close', context.close, max_points)
+    fig = px.line(df, x='Date', y=['Close'], title='BTC Price')
     fig.update_yaxes(title_text="Price [USD]")
     fig.update_layout(showlegend=False)
     return fig
 
 
-def lognormal_evolution_plot(price_db):
-    df = price_db.copy()
-    df["Close"] = np.log(df["Close"])
-    log_returns = df['Close'].diff().dropna()
-    mu, sigma = np.mean(log_returns), np.std(log_returns)
-    S0 = price_db["Close"][0]
-    t = np.array([50, 100, 200, 500])
-    S = np.linspace(1e-3, 5000, 1000)
-
-    def lognormal(S_, S0, mu, sigma, t):
-        S = S_[:, np.newaxis]
-        return (1 / (S * sigma * np.sqrt(2 * np.pi * t))) * np.exp(- np.power((np.log(S/S0) - (mu * t)), 2) / (2 * np.power(sigma, 2) * t))
-
-    pdf = pd.DataFrame(lognormal(S, S0, mu, sigma, t), columns=t, index=S)
+@timed("tools.lognormal_evolution_plot")
+def lognormal_evolution_plot(price_db, horizons=PDF_HORIZONS):
+    """
+    GBM price densities at a few horizons from the last closing price, on a grid adapted to the price and volatility.
+    """
+    S0, mu, sigma = gbm_parameters(price_db)
+    projection = project(S0, mu, sigma, horizons)
+    pdf = pd.DataFrame(projection.density.T, columns=list(horizons), index=projection.prices)
     fig = px.line(pdf, title='GBM pdf time evolution')
     fig.update_layout(xaxis_title="Price", yaxis_title="pdf")
     fig.add_vline(x=S0, name="0", line_dash="dot", showlegend=True, legendrank=1)
@@ -84,36 +107,132 @@ def lognormal_evolution_plot(price_db):
     return fig
 
 
-def rolling_volatility_plot(price_db, window=30):
-    price_db = log_returns(price_db)
-    price_db[f"Rolling: {window} days"] = price_db["LogReturns"].rolling(window, min_periods=np.minimum(10, window)).std() * np.sqrt(365)
-    price_db["Instantaneous"] = price_db["LogReturns"].abs()*np.sqrt(365)
-    fig = px.line(price_db, x='Date', y=[f"Rolling: {window} days"],
+def gbm_parameters(price_db):
+    """Last closing price, mean and standard deviation of the log returns per bar: the GBM fitted on a history."""
+    context = series_context(price_db)
+    return float(context.close[-1]), float(context.moments.mean), float(context.moments.std)
+
+
+@timed("tools.projection_figures")
+@register_cache("tools.projection")
+@lru_cache(maxsize=256)
+def projection_figures(S0, mu, sigma, horizon, fan_points=FAN_POINTS):
+    """
+    Fan chart of the GBM price quantiles from now to the horizon, and the price density and exceedance probability at
+    the horizon, all from one projection over the horizons of the fan.
+
+    :param horizon: horizon in bars (days for the daily history)
+    :return: (fan figure, density figure), as figure dicts
+    """
+    horizons = np.unique(np.linspace(0, horizon, min(horizon, fan_points) + 1).round())
+    projection = project(S0, mu, sigma, horizons)
+    quantiles = dict(zip(projection.levels, projection.quantiles))
+
+    fan = go.Figure(layout=dict(title=f"GBM projection over {horizon} days", xaxis_title="Days ahead",
+                                yaxis_title="Price [USD]"))
+    for low, high in ((0.05, 0.95), (0.25, 0.75)):
+        fan.add_scatter(x=horizons, y=quantiles[high], mode="lines", line=dict(width=0, color="orange"),
+                        showlegend=False, hoverinfo="skip")
+        fan.add_scatter(x=horizons, y=quantiles[low], mode="lines", line=dict(width=0, color="orange"), fill="tonexty",
+                        fillcolor="rgba(255,165,0,0.2)", name=f"{low:.0%}-{high:.0%}")
+    fan.add_scatter(x=horizons, y=quantiles[0.5], mode="lines", line=dict(color="orange"), name="Median")
+    fan.add_hline(y=S0, line_dash="dot", name="Spot price", showlegend=True)
+    fan.update_layout(legend=dict(orientation="v", yanchor="top", y=.98, xanchor="left", x=0.02, title=None))
+
+    density = go.Figure(layout=dict(title=f"Price distribution in {horizon} days", xaxis_title="Price [USD]",
+                                    yaxis_title="pdf", yaxis2=dict(title="P(price exceeded)", overlaying="y",
+                                                                   side="right", range=[0, 1])))
+    density.add_scatter(x=projection.prices, y=projection.density[-1], mode="lines", line=dict(color="black"),
+                        name="pdf")
+    density.add_scatter(x=projection.prices, y=projection.exceedance[-1], mode="lines", yaxis="y2",
+                        line=dict(color="red", dash="dash"), name="Exceedance probability")
+    density.add_vline(x=S0, line_dash="dot", name="Spot price", showlegend=True)
+    density.update_layout(legend=dict(orientation="v", yanchor="top", y=.98, xanchor="right", x=0.9, title=None))
+    return fan.to_dict(), density.to_dict()
+
+
+@timed("tools.rolling_volatility_plot")
+def rolling_volatility_plot(price_db, window=30, unit="days", max_points=line_points()):
+    context = series_context(price_db)
+    annualization = np.sqrt(context.periods_per_year)
+    volatility = rolling_stats(context.frame).volatility(window, min_periods=np.minimum(10, window),
+                                                    annualization=annualization)
+    all_time = context.moments.sample_std * annualization
+    df = _line_frame(context, f"Rolling: {window} {unit}", volatility, max_points)
+    del volatility
+    fig = px.line(df, x='Date', y=[f"Rolling: {window} {unit}"],
                   title=f"Historical volatility")
     ymin = 0
-    ymax = price_db[f"Rolling: {window} days"].max()
+    ymax = df[f"Rolling: {window} {unit}"].max()
     fig.update_yaxes(range=[ymin, ymax * 1.1], title_text="Volatility")
     fig.update_traces(line=dict(color="black"))
     # historical volatility
-    fig.add_hline(y=price_db["LogReturns"].std()*np.sqrt(365), line_dash="dash", line_color="red",
+    fig.add_hline(y=all_time, line_dash="dash", line_color="red",
                   name="All time",  showlegend=True)
     fig.update_layout(legend=dict(orientation="v", yanchor="top", y=.98, xanchor="right", x=0.99, title=None))
     return fig
 
 
+def _band(fig, x, paths, name, color):
+    low, median, high = np.percentile(paths, [5, 50, 95], axis=1)
+    fig.add_scatter(x=x, y=high, mode="lines", line=dict(width=0, color=color), showlegend=False, hoverinfo="skip")
+    fig.add_scatter(x=x, y=low, mode="lines", line=dict(width=0, color=color), fill="tonexty",
+                    fillcolor=color.replace("rgb", "rgba").replace(")", ", 0.15)"), name=f"{name} 5-95%")
+    fig.add_scatter(x=x, y=median, mode="lines", line=dict(color=color), name=f"{name} median")
+
+
+@timed("tools.volatility_forecast_plot")
+def volatility_forecast_plot(price_db, model="gjr", horizon=180, history=365, paths=2000):
+    """
+    Conditional volatility of a GARCH-family fit over the last bars, its expected path over the horizon, and the
+    5-95% bands of the volatility simulated by Heston and exp-OU models calibrated on the GJR fit.
+    """
+    context = series_context(price_db)
+    derived = context.derived
+    year = derived.periods_per_year
+    fit = volatility_fit(context.frame, model)
+    calibration = volatility_calibration(context.frame)
+    dates = context.dates
+    spacing = np.median(np.diff(dates[-history:]))
+    future = dates[-1] + spacing * np.arange(horizon + 1)
+    # the fitted returns start from the second bar
+    past = np.sqrt(fit.conditional_variance[-history:] * year)
+    expected = np.sqrt(np.r_[fit.conditional_variance[-1], fit.forecast(horizon)] * year)
+
+    S0 = context.close[-1]
+    simulation = dict(horizon=horizon / year, steps=horizon, paths=paths, seed=0)
+    _, heston = simulate_heston(S0, **calibration["heston"], **simulation)
+    _, exp_ou = simulate_exp_ou(S0, **calibration["exp_ou"], **simulation)
+
+    fig = go.Figure(layout=dict(title=f"Volatility forecast ({model.upper()})", yaxis_title="Volatility"))
+    fig.add_scatter(x=dates[-past.size:], y=past, mode="lines", line=dict(color="black"), name="Conditional")
+    _band(fig, future, np.sqrt(heston), "Heston", "rgb(31, 119, 180)")
+    _band(fig, future, exp_ou, "exp-OU", "rgb(44, 160, 44)")
+    fig.add_scatter(x=future, y=expected, mode="lines", line=dict(color="red", dash="dash"), name="Expected")
+    fig.update_layout(legend=dict(orientation="v", yanchor="top", y=.98, xanchor="left", x=0.01))
+    return fig
+
+
+@timed("tools.log_return_histogram")
 def log_return_histogram(price_db):
-    price_db = log_returns(price_db)
-    fig = px.histogram(price_db, x="LogReturns", nbins=100, title="BTC Log-Returns distribution",
-                       histnorm='probability density')
-    fig.data[0].name = "Empirical distribution"
-
-    # Scipy fit
-    mu, std = norm.fit(price_db.LogReturns.dropna())
-    x = np.linspace(price_db.LogReturns.min(), price_db.LogReturns.max(), 100)
+    """
+    Density of the log returns as a bar trace of the fixed bins accumulated by the online statistics (updated in O(1)
+    per new bar), so the figure size does not depend on the number of returns; with the normal and Student's t fits.
+    """
+    context = series_context(price_db)
+    derived = context.derived
+    histogram = online_stats(context.frame).histogram
+    fig = go.Figure(layout=dict(title="BTC Log-Returns distribution", xaxis_title="LogReturns",
+                                yaxis_title="probability density", bargap=0))
+    fig.add_bar(x=histogram.centers, y=histogram.density, width=histogram.width, name="Empirical distribution")
+
+    # Scipy fit (cached per dataset version)
+    mu, std = derived.norm_fit
+    x = np.linspace(histogram.low, histogram.high, 100)
     p = norm.pdf(x, mu, std)
 
     # Student's t fit
-    dof, mu_t, std_t = t.fit(price_db.LogReturns.dropna())
+    dof, mu_t, std_t = derived.t_fit
     p_t = t.pdf(x, dof, mu_t, std_t)
 
     fig.add_scatter(x=x, y=p_t, mode='lines', name="Student's t fit", line=dict(color='green', width=2))
@@ -122,41 +241,100 @@ def log_return_histogram(price_db):
     return fig
 
 
+@timed("tools.log_log_return_histogram")
 def log_log_return_histogram(price_db):
     fig = log_return_histogram(price_db)
     fig.update_yaxes(type="log", range=[-2, 1.6])
     return fig
 
 
-def call_spot_curve(S, X, T, r, v):
+@timed("tools.log_return_tails_power_law")
+def log_return_tails_power_law(price_db, max_points=500):
+    """
+    Survival functions of the left (losses) and right tails of the log returns in log-log scale, with their power-law
+    fits (cached per dataset version), straight lines of slope 1 - alpha beyond x_min. A tail of fewer than two
+    returns is left out, and so is the fit of a tail too short to be fitted (short or coarse histories).
+    """
+    derived = series_context(price_db).derived
+    # sorted once: both tails are views of it, in decreasing order of magnitude
+    returns = np.sort(derived.log_returns[1:])
+    total = returns.size
+    losses, gains = np.searchsorted(returns, 0.0, "left"), np.searchsorted(returns, 0.0, "right")
+    end = np.searchsorted(returns, np.inf, "right")  # NaNs are sorted last
+    fig = go.Figure(layout=dict(title="BTC Log-Returns tails", xaxis_title="|Log-Return|",
+                                yaxis_title="P(|Log-Return| > x)"))
+    for name, values, sign, fit, color in (("Left tail", returns[:losses], -1, derived.left_tail, "red"),
+                                           ("Right tail", returns[gains:end][::-1], 1, derived.right_tail, "green")):
+        if values.size < 2:
+            continue
+        # log-spaced ranks keep the extreme values, where the tail shows
+        ranks = np.unique(np.geomspace(1, values.size, max_points).astype(np.int64)) - 1
+        fig.add_scatter(x=sign * values[ranks], y=(ranks + 1) / total, mode="markers",
+                        marker=dict(color=color, size=4), name=name)
+        if fit is None:
+            continue
+        x = np.geomspace(fit.x_min, sign * values[0], 50)
+        fig.add_scatter(x=x, y=fit.tail_size / total * (x / fit.x_min) ** (1 - fit.alpha), mode="lines",
+                        line=dict(color=color, dash="dash"), name=f"Power law, {chr(945)} = {fit.alpha:.2f}")
+    fig.update_xaxes(type="log")
+    fig.update_yaxes(type="log")
+    fig.update_layout(legend=dict(orientation="v", yanchor="bottom", y=0.02, xanchor="left", x=0.01))
+    return fig
+
+
+@timed("tools.option_curves")
+@register_cache("options.curves")
+@lru_cache(maxsize=64)
+def option_curves(X, T, r, v):
+    """
+    Call price and delta hedging curves over spot prices in [0, 2X], computed together from a single Black-Scholes
+    evaluation. They do not depend on the spot price, whose marker is added by with_spot_line.
+
+    :return: (call price figure, delta hedging figure), as figure dicts
+    """
     spot_prices = np.linspace(0, 2*X, 1000)
-    call_prices = BlackScholesModel(spot_prices, X, T, r, v).option_price(OptionType.CALL_OPTION)
+    greeks = black_scholes_greeks(spot_prices, X, T, r, v)
+
     df = pd.DataFrame(index=spot_prices)
     df.index.name = "Spot price"
-    df["C(S,X,T,r,v)"] = call_prices
+    df["C(S,X,T,r,v)"] = greeks.call_price
     df["Payoff"] = np.maximum(0, spot_prices - X)
+    call_fig = px.line(df, x=df.index, y=df.columns, title='Call option')
+    call_fig.update_yaxes(title_text="Option price")
+    call_fig.add_vline(x=X, name="Strike price", line_color="green", line_dash="dot", showlegend=True)
 
-    fig = px.line(df, x=df.index, y=df.columns, title='Call option')
-    fig.update_yaxes(title_text="Option price")
-    fig.add_vline(x=X, name="Strike price", line_color="green", line_dash="dot", showlegend=True)
-    fig.add_vline(x=S, name="Spot price", line_color="orange", line_dash="dash", showlegend=True)
-    return fig
+    df = pd.DataFrame(index=spot_prices)
+    df[f"{chr(916)}(S,X,T,r,v)"] = greeks.call_delta
+    delta_fig = px.line(df, x=df.index, y=df.columns, title='Delta hedging')
+    delta_fig.update_yaxes(title_text="Underlying held fraction")
+    delta_fig.update_xaxes(title_text="Underlying (spot) price")
+    delta_fig.add_vline(x=X, name="Strike price", line_color="green", line_dash="dot", showlegend=True)
+    return call_fig.to_dict(), delta_fig.to_dict()
+
+
+def with_spot_line(figure, S):
+    """
+    Shallow copy of a figure dict with the spot price marker appended to its shapes; the cached traces are shared.
+    """
+    # the shape add_vline would add, built directly: validating a new go.Figure costs more than the whole update
+    spot_line = {"type": "line", "name": "Spot price", "showlegend": True, "line": {"color": "orange", "dash": "dash"},
+                 "x0": S, "x1": S, "xref": "x", "y0": 0, "y1": 1, "yref": "y domain"}
+    layout = dict(figure["layout"])
+    layout["shapes"] = [*layout.get("shapes", ()), spot_line]
+    return {**figure, "layout": layout}
+
+
+@timed("tools.call_spot_curve")
+def call_spot_curve(S, X, T, r, v):
+    return go.Figure(with_spot_line(option_curves(X, T, r, v)[0], S))
 
 
+@timed("tools.delta_hedging_curve")
 def delta_hedging_curve(S, X, T, r, v):
-    spot_prices = np.linspace(0, 2*X, 1000)
-    delta_hedges = BlackScholesModel(spot_prices, X, T, r, v).delta_hedging(OptionType.CALL_OPTION)
-    df = pd.DataFrame(index=spot_prices)
-    df[f"{chr(916)}(S,X,T,r,v)"] = delta_hedges
-    fig = px.line(df, x=df.index, y=df.columns, title='Delta hedging')
-    fig.update_yaxes(title_text="Underlying held fraction")
-    fig.update_xaxes(title_text="Underlying (spot) price")
-    fig.add_vline(x=X, name="Strike price", line_color="green", line_dash="dot", showlegend=True)
-    fig.add_vline(x=S, name="Spot price", line_color="orange", line_dash="dash", showlegend=True)
-    return fig
+    return go.Figure(with_spot_line(option_curves(X, T, r, v)[1], S))
 
 
 if __name__ == "__main__":
-    data = pd.read_csv("../database/BTC-USD.csv")
+    data = pd.read_csv("../database/BTC-USD.csv", parse_dates=["Date"])
     fig = log_return_tails_power_law(data)
     fig.show()
\ No newline at end of file
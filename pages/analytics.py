@@ -1,17 +1,33 @@
 # Third party imports
 import dash
-from dash import html, dcc, Input, Output, callback
+from dash import html, dcc, callback, Input, Output
 # import dash_latex as dl
-import plotly.express as px
 import dash_bootstrap_components as dbc
 
 # Local package imports
-from components.tools import log_return_plot, rolling_volatility_plot, log_return_histogram, log_log_return_histogram, \
-    price_plot, log_price_plot, instaneous_volatility_plot, lognormal_evolution_plot
-from components.data import BTCprice as data
+from components.data import daily_prices, resolution_options
+from components.figure_cache import lazy_graph, register_figure
+from components.instrumentation import timed
+from components.jobs import background_callback, job_controls
+from components.lazy_loading import memoized_layout
+from components.tasks import daily_prices_version, prices_version
 
 dash.register_page(__name__)
 
+# figures that only depend on the daily history: served pre-serialized and loaded when scrolled into view
+STATIC_FIGURES = {
+    "analytics-price": "price_plot",
+    "analytics-log-price": "log_price_plot",
+    "analytics-log-returns": "log_return_plot",
+    "analytics-lognormal-evolution": "lognormal_evolution_plot",
+    "analytics-instantaneous-volatility": "instaneous_volatility_plot",
+    "analytics-histogram": "log_return_histogram",
+    "analytics-log-histogram": "log_log_return_histogram",
+    "analytics-tails": "log_return_tails_power_law",
+}
+for name, builder in STATIC_FIGURES.items():
+    register_figure(name, f"components.tools:{builder}", daily_prices)
+
 
 def latex_gbm():
     intro = dcc.Markdown(r'''
@@ -168,6 +184,14 @@ def latex_beyond_GBM():
             All these models can be used in finance for the Monte Carlo pricing not only of plain vanilla (European) but also other exotic options (American, ...).
             ''', dangerously_allow_html=False, mathjax=True))
     ])
+    garch = dcc.Markdown(r'''
+        In discrete time, the clustering of volatility is captured by GARCH models, where the variance of each
+        Log-Return depends on the previous return and variance:
+        $\sigma^2_t = \omega + (\alpha + \gamma \mathbb{1}_{r_{t-1}<0}) r^2_{t-1} + \beta \sigma^2_{t-1}$
+        (GJR-GARCH, $\gamma=0$ for GARCH), or $\log \sigma^2_t$ for EGARCH. Fitted by maximum likelihood, their
+        diffusion limit calibrates the Heston and exp-OU models, whose simulated volatility bands are shown next to
+        the GARCH forecast.
+    ''', dangerously_allow_html=False, mathjax=True)
     beyond_GBM_2 = dcc.Markdown(r'''
         In the end, the efficient market hypothesis result, instead, verified after a really short time (usually minutes).
         Moreover, the market will continue to improve its efficiency in the following years with automated trading.
@@ -175,67 +199,105 @@ def latex_beyond_GBM():
         reliable dataset with this kind of data.
 
             ''', dangerously_allow_html=False, mathjax=True)
-    return [html.H3("Beyond GBM"), beyond_GBM, stochastic_volatility, html.Br(), beyond_GBM_2]
-
-
-layout = dbc.Container([
-    html.Br(),
-    html.H2('Geometric Brownian Motion'),
-    dbc.Row([
-        dbc.Col(latex_gbm(), width=5),
-        dbc.Col([
-            dcc.Graph(
-                id='price-chart',
-                figure=price_plot(data)),
-            dcc.Graph(
-                id='log-price-chart',
-                figure=log_price_plot(data)),
-            dcc.Graph(
-                id='log-returns',
-                figure=log_return_plot(data)),
-            dbc.Col(dcc.Graph(
-                figure=lognormal_evolution_plot(data)
-            )),
-        ], align="stretch"),
-    ], className="g-0"),
-    dbc.Row([
-        dbc.Col(latex_volatility(), width=5),
-        dbc.Col([
-            dbc.Row([
-                dbc.Col("Select rolling window size [days]:", width="auto"),
-                dbc.Col(dcc.Input(
-                    id='window-input',
-                    type='number',
-                    min=2,
-                    value=200), )
+    return [html.H3("Beyond GBM"), beyond_GBM, stochastic_volatility, html.Br(), garch, beyond_GBM_2]
+
+
+@memoized_layout
+def layout():
+    from components.volatility_models import INTERACTIVE_MODELS
+    return dbc.Container([
+        html.Br(),
+        html.H2('Geometric Brownian Motion'),
+        dbc.Row([
+            dbc.Col(latex_gbm(), width=5),
+            dbc.Col([
+                lazy_graph('analytics-price', id='price-chart'),
+                lazy_graph('analytics-log-price', id='log-price-chart'),
+                lazy_graph('analytics-log-returns', id='log-returns'),
+                dbc.Col(lazy_graph('analytics-lognormal-evolution')),
+                dbc.Row([
+                    dbc.Col("Projection horizon [days]:", width="auto"),
+                    dbc.Col(dcc.Slider(
+                        id='projection-horizon',
+                        min=1,
+                        max=730,
+                        step=1,
+                        value=180,
+                        marks={i: str(i) for i in range(0, 731, 90)},
+                        updatemode='drag')),
+                ]),
+                dcc.Graph(id='projection-fan'),
+                dcc.Graph(id='projection-density'),
+            ], align="stretch"),
+        ], className="g-0"),
+        dbc.Row([
+            dbc.Col(latex_volatility(), width=5),
+            dbc.Col([
+                dbc.Row([
+                    dbc.Col("Select rolling window size [bars]:", width="auto"),
+                    dbc.Col(dcc.Input(
+                        id='window-input',
+                        type='number',
+                        min=2,
+                        value=200), ),
+                    dbc.Col(dbc.Select(
+                        id='volatility-resolution',
+                        options=[{'label': res, 'value': res} for res in resolution_options()],
+                        value='1d'), width="auto"),
+                ]),
+                job_controls('rolling-volatility'),
+                dcc.Graph(
+                    id='rolling-volatility',
+                    config={'staticPlot': False},
+                ),
+                lazy_graph('analytics-instantaneous-volatility'),
             ]),
-            dcc.Graph(
-                id='rolling-volatility',
-                config={'staticPlot': False},
-                figure=rolling_volatility_plot(data, window=200)
-            ),
-            dcc.Graph(
-                figure=instaneous_volatility_plot(data)
-            ),
         ]),
-    ]),
-    dbc.Row([
-        dbc.Col(latex_beyond_GBM(), width=5),
-        dbc.Col([
-            dbc.Col(dcc.Graph(
-                figure=log_return_histogram(data),
-            )),
-            dbc.Col(dcc.Graph(
-                figure=log_log_return_histogram(data)
-            )),
+        dbc.Row([
+            dbc.Col(latex_beyond_GBM(), width=5),
+            dbc.Col([
+                dbc.Col(lazy_graph('analytics-histogram')),
+                dbc.Col(lazy_graph('analytics-log-histogram')),
+                lazy_graph('analytics-tails'),
+                dbc.Row([
+                    dbc.Col("Volatility model:", width="auto"),
+                    dbc.Col(dbc.Select(
+                        id='volatility-model',
+                        options=[{'label': model.upper(), 'value': model} for model in INTERACTIVE_MODELS],
+                        value='gjr'), width="auto"),
+                ]),
+                job_controls('volatility-forecast'),
+                dcc.Graph(id='volatility-forecast'),
+            ]),
         ]),
-    ]),
-], fluid=True)
+    ], fluid=True)
 
 
-@callback(
+# the fits behind these figures take seconds on long or intraday histories: they run as background jobs
+background_callback(
+    'rolling-volatility',
     Output('rolling-volatility', 'figure'),
-    Input('window-input', 'value')
+    [Input('window-input', 'value'),
+     Input('volatility-resolution', 'value')],
+    "components.tasks:rolling_volatility_figure",
+    version=lambda window, resolution: prices_version(resolution),
+)
+background_callback(
+    'volatility-forecast',
+    Output('volatility-forecast', 'figure'),
+    [Input('volatility-model', 'value')],
+    "components.tasks:volatility_forecast_figure",
+    version=lambda model: daily_prices_version(),
+)
+
+
+@callback(
+    [Output('projection-fan', 'figure'),
+     Output('projection-density', 'figure')],
+    [Input('projection-horizon', 'value')]
 )
-def update_graph(window):
-    return rolling_volatility_plot(data, window=int(window))
+@timed("analytics.projection")
+def update_projection(horizon):
+    # a closed-form projection, cached per horizon: fast enough to follow the slider while it is dragged
+    from components.tools import gbm_parameters, projection_figures
+    return projection_figures(*gbm_parameters(daily_prices()), int(horizon))
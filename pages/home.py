@@ -1,26 +1,36 @@
+# Standard library imports
+import base64
+
 # Third party imports
 import dash
-from dash import html, dcc, Input, Output, callback
+from dash import html, dcc, Input, Output, State, callback, clientside_callback, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import plotly.graph_objects as go
+import numpy as np
+import pandas as pd
 
 # Local package imports
-from components.data import BTCprice as data
+from components import live_feed
+from components.data import daily_prices, get_prices, resolution_options
+from components.date_index import DateIndex
+from components.downsampling import candle_points, downsample_ohlc
+from components.lazy_loading import memoized_layout
 
 dash.register_page(__name__, path='/')
 
+FULL_DETAIL_CANDLES = 20_000  # about 0.6 MB of base64 typed arrays
+LIVE_INTERVAL_MS = 1000
 
-def spot_price(data=data, day=None):
-    if day is None:
-        price = data.iloc[-1]["Close"]
-        prev_price = data.iloc[-2]["Close"]
-    elif data["Date"].isin([day]).any():
-        data = data.set_index("Date")
-        price = data.loc[day, "Close"]
-        prev_price = data.shift(1).loc[day, "Close"]
-    else:
-        price = -1
 
+def spot_price(data=None, day=None):
+    data = daily_prices() if data is None else data
+    spot = DateIndex(data["Date"]).spot(data["Close"].to_numpy(), day)
+    if spot is None:
+        return spot_card(-1)
+    return spot_card(*spot)
+
+
+def spot_card(price, prev_price=None):
     if price == -1:
         percentage_variation = 0
         variation = 0
@@ -43,123 +53,247 @@ def spot_price(data=data, day=None):
     return html_text
 
 
-date_picker = dbc.InputGroup([
-    dbc.InputGroupText("Select day"),
-    dcc.DatePickerSingle(
-        id='my-date-picker-single',
-        min_date_allowed=data.iloc[1]["Date"],
-        max_date_allowed=data.iloc[-1]["Date"],
-        initial_visible_month=data.iloc[-1]["Date"],
-        date=data.iloc[-1]["Date"]
-    ),
-])
-
-col1 = dbc.Col([
-    html.Br(),
-    html.Br(),
-    html.Br(),
-    # html.H5("Spot price"),
-    # html.Br(),
-    dbc.Card([dbc.CardHeader("Spot price"),
-              dbc.CardBody(spot_price(), id="BTC-price-card"),]),
-    html.Br(),
-    date_picker,
-    html.Br(),
-    html.H5("Graph options"),
-    # html.Br(),
-    dbc.InputGroup([
-        dbc.Select(
-            id='y-axis-scale',
-            options=[{'label': 'Linear', 'value': 'linear'},
-                     {'label': 'Logarithmic', 'value': 'log'}],
-            value='linear',
+@memoized_layout
+def layout():
+    data = daily_prices()
+    date_picker = dbc.InputGroup([
+        dbc.InputGroupText("Select day"),
+        dcc.DatePickerSingle(
+            id='my-date-picker-single',
+            min_date_allowed=data.iloc[1]["Date"],
+            max_date_allowed=data.iloc[-1]["Date"],
+            initial_visible_month=data.iloc[-1]["Date"],
+            date=data.iloc[-1]["Date"]
         ),
-        dbc.InputGroupText("Scale", style={"width": 75}),
-    ]),
-    html.Br(),
-    dbc.InputGroup([
-        dbc.Select(
-            id='x-axis-range',
-            options=[
-                {'label': '1 week', 'value': -7},
-                {'label': '1 month', 'value': -30},
-                {'label': '6 months', 'value': -180},
-                {'label': 'YTD', 'value': 'YTD'},
-                {'label': '1 year', 'value': -365},
-                {'label': 'All time', 'value': 'Max'}],
-            value=-30,
+    ])
+
+    col1 = dbc.Col([
+        html.Br(),
+        html.Br(),
+        html.Br(),
+        # html.H5("Spot price"),
+        # html.Br(),
+        dbc.Card([dbc.CardHeader("Spot price"),
+                  dbc.CardBody(spot_price(data), id="BTC-price-card"),]),
+        html.Br(),
+        date_picker,
+        html.Br(),
+        html.H5("Graph options"),
+        # html.Br(),
+        dbc.InputGroup([
+            dbc.Select(
+                id='y-axis-scale',
+                options=[{'label': 'Linear', 'value': 'linear'},
+                         {'label': 'Logarithmic', 'value': 'log'}],
+                value='linear',
+            ),
+            dbc.InputGroupText("Scale", style={"width": 75}),
+        ]),
+        html.Br(),
+        dbc.InputGroup([
+            dbc.Select(
+                id='x-axis-range',
+                options=[
+                    {'label': '1 week', 'value': -7},
+                    {'label': '1 month', 'value': -30},
+                    {'label': '6 months', 'value': -180},
+                    {'label': 'YTD', 'value': 'YTD'},
+                    {'label': '1 year', 'value': -365},
+                    {'label': 'All time', 'value': 'Max'}],
+                value=-30,
+            ),
+            dbc.InputGroupText("Range", style={"width": 75}),
+        ]),
+        html.Br(),
+        dbc.InputGroup([
+            dbc.Select(
+                id='resolution',
+                options=[{'label': res, 'value': res} for res in resolution_options()],
+                value='1d',
+            ),
+            dbc.InputGroupText("Bars", style={"width": 75}),
+        ]),
+    ], width={"size": 3})
+
+    col2 = dbc.Col([
+        html.Br(),
+        html.H1("Historical price", style={"text-align": "right"}),
+        dcc.Graph(
+                    id='candlestick-price-chart',
+                    config={'staticPlot': False},
+                    figure={}
         ),
-        dbc.InputGroupText("Range", style={"width": 75}),
-    ]),
-], width={"size": 3})
-
-col2 = dbc.Col([
-    html.Br(),
-    html.H1("Historical price", style={"text-align": "right"}),
-    dcc.Graph(
-                id='candlestick-price-chart',
-                config={'staticPlot': False},
-                figure={}
-    )
-])
+        dcc.Store(id='candlestick-width'),
+        dcc.Store(id='candles-request'),
+        dcc.Store(id='candlestick-data'),
+        dcc.Store(id='live-bars'),
+        dcc.Interval(id='live-interval', interval=LIVE_INTERVAL_MS, disabled=not live_feed.configured()),
+    ])
 
-layout = dbc.Container([
-    html.Br(),
-    dbc.Row([
-        col1,
-        col2,
-    ]),
-], fluid=False)
+    return dbc.Container([
+        html.Br(),
+        dbc.Row([
+            col1,
+            col2,
+        ]),
+    ], fluid=False)
 
 
 @callback(
     Output("BTC-price-card", "children"),
-    Input("my-date-picker-single", "date")
+    [Input("my-date-picker-single", "date"),
+     Input('live-interval', 'n_intervals')]
 )
-def update_card_body(day):
+def update_card_body(day, n_intervals=None):
+    feed = live_feed.current_feed()
+    # the live price replaces the last close, while the latest day is selected
+    data = daily_prices()
+    if feed is not None and (day is None or pd.Timestamp(day) >= data["Date"].iloc[-1]):
+        price, reference = feed.spot()
+        if price is not None:
+            return spot_card(price, reference if reference is not None else data["Close"].iloc[-1])
     return spot_price(data, day)
 
 
-@callback(
-    Output('candlestick-price-chart', 'figure'),
-    [Input('y-axis-scale', 'value'),
-     Input('x-axis-range', 'value'),
-     Input("my-date-picker-single", "date")]
+# measure the graph once rendered, so that the server sends no more candles than the browser can draw
+clientside_callback(
+    """
+    function(id) {
+        var graph = document.getElementById(id);
+        return graph ? graph.offsetWidth : null;
+    }
+    """,
+    Output('candlestick-width', 'data'),
+    Input('candlestick-price-chart', 'id')
 )
-def update_figure(y_scale, x_range, selected_date):
-    if y_scale == 'log':
-        yaxis_type = 'log'
-    else:
-        yaxis_type = 'linear'
 
+
+def select_range(bars, x_range):
+    """
+    Candles of a range option, as a view of the frame, with the date they are strictly after
+    (assets/home_chart.js:lowerBound mirrors it).
+
+    :return: (candles, lower bound), the bound being None for the whole history
+    """
+    if x_range == 'Max':
+        return bars, None
+    index = DateIndex(bars["Date"])
+    last = index.last_date()
     if x_range == 'YTD':
-        _data = data[data["Date"].dt.year == data.iloc[-1, 0].year]
-    elif x_range == 'Max':
-        _data = data
+        bound = pd.Timestamp(year=last.year, month=1, day=1) - pd.Timedelta(milliseconds=1)
     else:
-        x_range = int(x_range)
-        _data = data[x_range:]
-
-    updated_figure = go.Figure(data=[go.Candlestick(
-        x=_data["Date"],
-        open=_data["Open"],
-        close=_data["Close"],
-        high=_data["High"],
-        low=_data["Low"]
-    )])
-
-    updated_figure.update_layout(
-        xaxis_rangeslider_visible=False,
-        title_text="Candlestick price chart",
-        shapes=[dict(
-            type="rect",
-            yref="paper", y0=0, y1=0.1,
-            xref="x", x0=selected_date, x1=selected_date,
-            line=dict(color="blue", width=5)),
-        ]
+        # ranges are durations in days, whatever the bar resolution
+        bound = last + pd.Timedelta(days=int(x_range))
+    return bars.iloc[index.after(bound)], bound
+
+
+def _typed_array(values, dtype):
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode("ascii")
+
+
+def encode_candles(bars):
+    """
+    Candles as base64 little-endian typed arrays: float64 milliseconds since the epoch for the dates and float64
+    prices: float32 keeps about 7 significant digits, not the cents of prices above 100k.
+    """
+    dates = bars["Date"].to_numpy().astype("datetime64[ms]").view(np.int64)
+    encoded = {"x": _typed_array(dates, "<f8"), "length": len(bars)}
+    for column in ("Open", "High", "Low", "Close"):
+        encoded[column.lower()] = _typed_array(bars[column], "<f8")
+    return encoded
+
+
+@callback(
+    Output('candlestick-data', 'data'),
+    Input('candles-request', 'data'),
+)
+def update_candles(request):
+    """
+    Ship the candles of a resolution once: the whole history if it is small enough, otherwise the requested range,
+    re-aggregated to the graph width if it is still too long. The clientside callbacks only ask again when the
+    shipped candles do not cover a newly selected range.
+    """
+    if request is None:
+        raise PreventUpdate
+    return candles_payload(get_prices(request["resolution"]), request)
+
+
+def candles_payload(bars, request):
+    """
+    Encoded candles of update_candles, for the bars of the requested resolution.
+    """
+    bound = None
+    if len(bars) > FULL_DETAIL_CANDLES:
+        bars, bound = select_range(bars, request["range"])
+    full = len(bars) <= FULL_DETAIL_CANDLES
+    # the last bar date, before re-aggregation moves it to the start of the last bucket
+    end = bars["Date"].iloc[-1].value // 10 ** 6
+    if not full:
+        bars = downsample_ohlc(bars, candle_points(request["width"]))
+
+    candles = encode_candles(bars)
+    candles.update(
+        end=end,
+        resolution=request["resolution"],
+        range=request["range"],
+        width=request["width"],
+        full=full,
+        history=bound is None,
+        bound=None if bound is None else bound.value // 10 ** 6,
     )
+    candles["key"] = "{resolution}/{range}/{width}/{length}/{end}".format(**candles)
+    return candles
+
+
+@callback(
+    Output('live-bars', 'data'),
+    Input('live-interval', 'n_intervals'),
+    [State('candlestick-data', 'data'),
+     State('live-bars', 'data')],
+    prevent_initial_call=True,
+)
+def update_live_bars(n_intervals, candles, live):
+    """
+    Bars completed by the live feed since the last ones the chart has, for the clientside extendData.
+    Only candles shipped at full detail are extended: re-aggregated ones would not line up with the live bars.
+    """
+    feed = live_feed.current_feed()
+    if feed is None or not candles or not candles["full"] or candles["resolution"] not in feed.bars:
+        raise PreventUpdate
+    end = candles["end"]
+    if live and live["key"] == candles["key"]:
+        end = max(end, live["end"])
+    bars = feed.bars[candles["resolution"]].since("Date", end * 10 ** 6)
+    if bars["Date"].size == 0:
+        raise PreventUpdate
 
-    updated_figure.update_xaxes(title_text="Date")
-    updated_figure.update_yaxes(type=yaxis_type, title_text="Price [USD]")
+    bars = pd.DataFrame(bars)
+    bars["Date"] = bars["Date"].view("datetime64[ns]")
+    live_bars = encode_candles(bars)
+    live_bars.update(key=candles["key"], end=bars["Date"].iloc[-1].value // 10 ** 6)
+    return live_bars
 
-    return updated_figure
+
+clientside_callback(
+    ClientsideFunction(namespace='home', function_name='request_candles'),
+    Output('candles-request', 'data'),
+    [Input('resolution', 'value'),
+     Input('x-axis-range', 'value'),
+     Input('candlestick-width', 'data')],
+    State('candlestick-data', 'data'),
+)
+
+clientside_callback(
+    ClientsideFunction(namespace='home', function_name='render_chart'),
+    Output('candlestick-price-chart', 'figure'),
+    [Input('candlestick-data', 'data'),
+     Input('y-axis-scale', 'value'),
+     Input('x-axis-range', 'value'),
+     Input("my-date-picker-single", "date")],
+)
+
+clientside_callback(
+    ClientsideFunction(namespace='home', function_name='extend_chart'),
+    Output('candlestick-price-chart', 'extendData'),
+    Input('live-bars', 'data'),
+)
@@ -1,3 +1,6 @@
+# Standard library imports
+from functools import lru_cache
+
 # Third party imports
 import dash
 from dash import html, Input, Output, callback, dcc
@@ -6,8 +9,10 @@ import numpy as np
 
 # Local package imports
 # from .data import BTCprice as data
-from components.option_pricing.black_scholes import BlackScholesModel, OptionType
-from components.tools import call_spot_curve, delta_hedging_curve
+from components.instrumentation import register_cache, timed
+from components.jobs import background_callback, job_controls
+from components.option_pricing.black_scholes import black_scholes_greeks
+from components.tasks import PAYOFFS
 
 dash.register_page(__name__)
 
@@ -26,6 +31,25 @@ delta = dbc.Card([
     dbc.CardBody(id="delta-hedging-card"),
 ])
 
+monte_carlo = dbc.Card([
+    dbc.CardHeader("Monte Carlo call price (95% interval)"),
+    dbc.CardBody([
+        dbc.Row([
+            dbc.Col(dbc.Select(
+                id="monte-carlo-payoff",
+                options=[{"label": label, "value": value} for value, label in PAYOFFS.items()],
+                value="asian")),
+            dbc.Col(dbc.Select(
+                id="monte-carlo-paths",
+                options=[{"label": f"{paths:,} paths", "value": paths} for paths in (10 ** 5, 10 ** 6, 10 ** 7)],
+                value=10 ** 6), width="auto"),
+        ], className="g-2"),
+        html.Br(),
+        job_controls("monte-carlo"),
+        html.Div(id="monte-carlo-price-card"),
+    ]),
+])
+
 col1 = dbc.Col([
     html.Br(),
     html.H1('Black & Scholes'),
@@ -82,6 +106,8 @@ col1 = dbc.Col([
     # put,
     html.Br(),
     delta,
+    html.Br(),
+    monte_carlo,
 ], width=4, align="stretch")
 
 col2 = dbc.Col(
@@ -100,53 +126,50 @@ layout = dbc.Container([
 ])
 
 
-@callback(
-    Output('call-price-card', 'children'),
-    [Input('input-S', 'value'),
-     Input('input-X', 'value'),
-     Input('input-T', 'value'),
-     Input("input-r", "value"),
-     Input("input-v", "value")]
-)
-def update_call_price(S, X, T, r, v):
-    call_price = BlackScholesModel(S, X, T, r, v).option_price(OptionType.CALL_OPTION)
-    return html.H5(f"{call_price:.2f}")
+@register_cache("options.values")
+@lru_cache(maxsize=1024)
+def option_values(S, X, T, r, v):
+    """
+    Prices and Greeks of the options at one point of the sliders.
+    """
+    return black_scholes_greeks(S, X, T, r, v)
 
 
 @callback(
-    Output('delta-hedging-card', 'children'),
+    [Output('call-price-card', 'children'),
+     Output('delta-hedging-card', 'children'),
+     Output('call-spot-curve', 'figure'),
+     Output('delta-hedging-curve', 'figure')],
     [Input('input-S', 'value'),
      Input('input-X', 'value'),
      Input('input-T', 'value'),
      Input("input-r", "value"),
      Input("input-v", "value")]
 )
-def update_delta_hedging(S, X, T, r, v):
-    delta_hedging = BlackScholesModel(S, X, T, r, v).delta_hedging(OptionType.CALL_OPTION)
-    return html.H5(f"{delta_hedging:.2f}")
-
-
-@callback(
-    Output('call-spot-curve', 'figure'),
-    [
-        Input('input-S', 'value'),
-        Input('input-X', 'value'),
-        Input('input-T', 'value'),
-        Input("input-r", "value"),
-        Input("input-v", "value")]
-)
-def update_call_price_curve(S, X, T, r, v):
-    return call_spot_curve(S, X, T, r, v)
-
-
-@callback(
-    Output('delta-hedging-curve', 'figure'),
-    [
-        Input('input-S', 'value'),
-        Input('input-X', 'value'),
-        Input('input-T', 'value'),
-        Input("input-r", "value"),
-        Input("input-v", "value")]
+@timed("options.update")
+def update_options(S, X, T, r, v):
+    # plotly express and pandas are imported with the first update, not at boot
+    from components.tools import option_curves, with_spot_line
+    values = option_values(S, X, T, r, v)
+    call_curve, delta_curve = option_curves(X, T, r, v)
+    return (
+        html.H5(f"{float(values.call_price):.2f}"),
+        html.H5(f"{float(values.call_delta):.2f}"),
+        with_spot_line(call_curve, S),
+        with_spot_line(delta_curve, S),
+    )
+
+
+# path-dependent payoffs take seconds to simulate: the price runs as a background job, with progress and cancellation
+background_callback(
+    "monte-carlo",
+    Output("monte-carlo-price-card", "children"),
+    [Input("input-S", "value"),
+     Input("input-X", "value"),
+     Input("input-T", "value"),
+     Input("input-r", "value"),
+     Input("input-v", "value"),
+     Input("monte-carlo-payoff", "value"),
+     Input("monte-carlo-paths", "value")],
+    "components.tasks:monte_carlo_price",
 )
-def update_delta_hedging_curve(S, X, T, r, v):
-    return delta_hedging_curve(S, X, T, r, v)